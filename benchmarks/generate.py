@@ -0,0 +1,146 @@
+"""
+Generates reproducible synthetic working trees for the SimpleGit benchmarks.
+
+The same seed and options always produce the same files, byte for byte, so
+results from different runs and machines can be compared.
+
+  python benchmarks/generate.py /tmp/tree --files 10000 --depth 3
+  python benchmarks/generate.py /tmp/tree --edit 0.05 --seed 2
+"""
+import os
+import sys
+import math
+import random
+import argparse
+
+WORDS = (
+    "alpha beta gamma delta value result index buffer commit branch tree "
+    "node file path data error return import class def self None True False "
+    "for while if else try except with open read write print log update"
+).split()
+
+def _dir_names(file_count, depth, files_per_dir):
+  """Returns the relative folder paths the files are spread over."""
+  dir_count = max(1, math.ceil(file_count / files_per_dir))
+  if depth <= 0:
+      return [""]
+  fan_out = max(2, math.ceil(dir_count ** (1 / depth)))
+  names = []
+  for number in range(dir_count):
+      parts = []
+      for _ in range(depth):
+          number, digit = divmod(number, fan_out)
+          parts.append(f"d{digit:03d}")
+      names.append("/".join(reversed(parts)))
+  return names
+
+def _file_size(rng, median_size, sigma, max_size):
+  return max(0, min(max_size, int(rng.lognormvariate(math.log(median_size), sigma))))
+
+def _text(rng, size):
+  """Returns about size bytes of source-like text made of short lines."""
+  lines = []
+  total = 0
+  while total < size:
+      line = " " * (4 * rng.randrange(4)) + " ".join(rng.choice(WORDS) for _ in range(rng.randrange(2, 10)))
+      lines.append(line)
+      total += len(line) + 1
+  return ("\n".join(lines) + "\n").encode()[:size]
+
+def file_contents(rng, size, binary):
+  """Returns the contents of one generated file."""
+  if binary:
+      return rng.randbytes(size)
+  return _text(rng, size)
+
+def generate_tree(root, files=1000, depth=3, files_per_dir=100, median_size=4096, size_sigma=1.5,
+                  max_size=64 * 1024 * 1024, binary_share=0.1, seed=1):
+  """Writes a synthetic working tree into root and returns the number of bytes written.
+
+  File sizes follow a log-normal distribution around median_size, clipped
+  to max_size. binary_share of the files hold random bytes, the rest hold
+  text lines, so both the text diff and the binary paths get exercised.
+  """
+  rng = random.Random(seed)
+  dirs = _dir_names(files, depth, files_per_dir)
+  written = 0
+  for number in range(files):
+      rel_dir = dirs[number // files_per_dir]
+      binary = rng.random() < binary_share
+      name = f"f{number:07d}.{'bin' if binary else 'txt'}"
+      dir_path = os.path.join(root, rel_dir)
+      os.makedirs(dir_path, exist_ok=True)
+      data = file_contents(rng, _file_size(rng, median_size, size_sigma, max_size), binary)
+      with open(os.path.join(dir_path, name), 'wb') as f:
+          f.write(data)
+      written += len(data)
+  return written
+
+def list_files(root):
+  """Returns the generated files under root, sorted, skipping the repository folder."""
+  paths = []
+  for dir_path, dir_names, file_names in os.walk(root):
+      dir_names[:] = sorted(name for name in dir_names if name != ".simplegit")
+      paths.extend(os.path.join(dir_path, name) for name in sorted(file_names))
+  return paths
+
+def edit_tree(root, edit_rate=0.05, seed=2):
+  """Changes a share of the files under root the way a day of work would.
+
+  Of the files picked, most get a few lines changed or appended, and a few
+  are deleted or have a new file added next to them. Returns the number of
+  files touched.
+  """
+  rng = random.Random(seed)
+  paths = list_files(root)
+  touched = 0
+  for path in paths:
+      if rng.random() >= edit_rate:
+          continue
+      touched += 1
+      roll = rng.random()
+      if roll < 0.05:
+          os.remove(path)
+      elif roll < 0.10:
+          with open(f"{path}.new.txt", 'wb') as f:
+              f.write(_text(rng, 2048))
+      elif path.endswith(".bin"):
+          with open(path, 'r+b') as f:
+              size = os.fstat(f.fileno()).st_size
+              f.seek(rng.randrange(size) if size else 0)
+              f.write(rng.randbytes(64))
+      else:
+          with open(path, 'rb') as f:
+              lines = f.read().split(b"\n")
+          for _ in range(rng.randrange(1, 4)):
+              lines.insert(rng.randrange(len(lines) + 1), _text(rng, 40).rstrip(b"\n"))
+          with open(path, 'wb') as f:
+              f.write(b"\n".join(lines))
+  return touched
+
+def main():
+  parser = argparse.ArgumentParser(description="Generate a synthetic working tree for benchmarking SimpleGit")
+  parser.add_argument('root', help='Folder to write the tree into')
+  parser.add_argument('--files', type=int, default=1000, help='Number of files')
+  parser.add_argument('--depth', type=int, default=3, help='Folder nesting depth')
+  parser.add_argument('--files-per-dir', type=int, default=100, help='Files per folder')
+  parser.add_argument('--median-size', type=int, default=4096, help='Median file size in bytes')
+  parser.add_argument('--size-sigma', type=float, default=1.5, help='Spread of the log-normal size distribution')
+  parser.add_argument('--max-size', type=int, default=64 * 1024 * 1024, help='Largest file size in bytes')
+  parser.add_argument('--binary-share', type=float, default=0.1, help='Share of files with binary contents')
+  parser.add_argument('--edit', type=float, metavar='RATE', help='Edit this share of an existing tree instead of generating one')
+  parser.add_argument('--seed', type=int, default=1, help='Random seed')
+  args = parser.parse_args()
+
+  if args.edit is not None:
+      touched = edit_tree(args.root, args.edit, args.seed)
+      print(f"Edited {touched} files in {args.root}.")
+      return
+  if os.path.exists(args.root) and os.listdir(args.root):
+      sys.exit(f"{args.root} is not empty.")
+  written = generate_tree(args.root, args.files, args.depth, args.files_per_dir, args.median_size,
+                          args.size_sigma, args.max_size, args.binary_share, args.seed)
+  print(f"Wrote {args.files} files ({written / (1024 * 1024):.1f} MB) to {args.root}.")
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,243 @@
+"""
+Times SimpleGit commands on synthetic working trees of several sizes.
+
+Each command runs in its own process, as it would from the command line,
+and reports its wall time, peak RSS and the bytes it read and wrote.
+Results go to a JSON file that a later run can be compared against:
+
+  python benchmarks/run.py --sizes 100,1000,10000 -o bench.json
+  python benchmarks/run.py --sizes 100,1000,10000 --baseline bench.json
+
+With --baseline the run exits with status 1 if any command got slower,
+bigger or did more I/O than the threshold allows.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+
+try:
+  import resource
+except ImportError:
+  resource = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SIMPLEGIT_DIR = os.path.join(os.path.dirname(BENCH_DIR), "simplegit")
+sys.path.insert(0, BENCH_DIR)
+
+from generate import generate_tree, edit_tree, list_files
+
+RESULT_VERSION = 1
+DEFAULT_SIZES = "100,1000,10000"
+BACKUP_LOCATIONS = 3
+# Differences smaller than these are noise, whatever the relative change.
+MIN_DIFFERENCES = {
+    "wall_seconds": 0.05,
+    "peak_rss_kb": 2048,
+    "read_bytes": 256 * 1024,
+    "written_bytes": 256 * 1024
+}
+
+def _read_proc_io():
+  """Returns this process's I/O counters from /proc/self/io, or {} where it does not exist."""
+  try:
+      with open("/proc/self/io") as io_file:
+          return {key: int(value) for key, value in (line.split(": ") for line in io_file.read().splitlines())}
+  except OSError:
+      return {}
+
+def child_main(stats_path, argv):
+  """Runs one SimpleGit command in this process and writes its resource usage to stats_path.
+
+  /proc/self/io already includes the worker processes the command started
+  and waited for, and RUSAGE_CHILDREN covers their peak RSS.
+  """
+  sys.path.insert(0, SIMPLEGIT_DIR)
+  import simplegit
+  sys.argv = ["simplegit"] + argv
+  exit_code = 0
+  try:
+      simplegit.main()
+  except SystemExit as e:
+      exit_code = e.code if isinstance(e.code, int) else 1
+  finally:
+      sys.stdout.flush()
+      io = _read_proc_io()
+      stats = {"exit_code": exit_code}
+      if resource is not None:
+          own = resource.getrusage(resource.RUSAGE_SELF)
+          children = resource.getrusage(resource.RUSAGE_CHILDREN)
+          scale = 1 if sys.platform.startswith("linux") else 1 / 1024
+          stats["peak_rss_kb"] = int(max(own.ru_maxrss, children.ru_maxrss) * scale)
+      if io:
+          stats["read_bytes"] = io["rchar"]
+          stats["written_bytes"] = io["wchar"]
+          stats["disk_read_bytes"] = io["read_bytes"]
+          stats["disk_written_bytes"] = io["write_bytes"]
+      with open(stats_path, 'w') as stats_file:
+          json.dump(stats, stats_file)
+  sys.exit(exit_code)
+
+def run_command(root, argv, stdin=None):
+  """Runs a SimpleGit command in root in a fresh process and returns its measurements."""
+  fd, stats_path = tempfile.mkstemp(prefix="simplegit-bench-", suffix=".json")
+  os.close(fd)
+  try:
+      start = time.perf_counter()
+      result = subprocess.run(
+          [sys.executable, os.path.abspath(__file__), "--child", stats_path, "--"] + argv,
+          cwd=root, input=stdin, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+      )
+      wall = time.perf_counter() - start
+      with open(stats_path) as stats_file:
+          stats = json.load(stats_file) if os.path.getsize(stats_path) else {"exit_code": result.returncode}
+  finally:
+      os.remove(stats_path)
+  stats["wall_seconds"] = round(wall, 4)
+  if stats["exit_code"] != 0:
+      print(f"  '{' '.join(argv)}' failed with exit code {stats['exit_code']}: {result.stderr.strip()[-500:]}")
+  return stats
+
+def commit_ids(root):
+  """Returns the ids of the commits in a repository, oldest first."""
+  db = sqlite3.connect(os.path.join(root, ".simplegit", "commits.db"))
+  try:
+      return [row[0] for row in db.execute("SELECT id FROM commits ORDER BY seq")]
+  finally:
+      db.close()
+
+def benchmark_size(workdir, files, args):
+  """Runs every benchmarked command against one generated tree. Returns {command: measurements}."""
+  root = os.path.join(workdir, f"tree-{files}")
+  results = {}
+
+  def measure(name, argv, stdin=None):
+      results[name] = run_command(root, argv, stdin)
+      print(f"  {name:<16} {results[name]['wall_seconds']:>9.3f}s  {results[name].get('peak_rss_kb', 0) / 1024:>8.1f} MB RSS")
+
+  start = time.perf_counter()
+  generate_tree(root, files, args.depth, args.files_per_dir, args.median_size, args.size_sigma,
+                args.max_size, args.binary_share, args.seed)
+  print(f"Generated {files} files in {time.perf_counter() - start:.1f}s")
+
+  measure("init", ["init"])
+  measure("commit_initial", ["commit", "-m", "initial", "-j", str(args.jobs)])
+  measure("status_clean", ["status"])
+  edit_tree(root, args.edit_rate, args.seed + 1)
+  measure("status_dirty", ["status"])
+  measure("commit_edit", ["commit", "-m", "edit", "-j", str(args.jobs)])
+  measure("log", ["log"])
+  paths = list_files(root)
+  sample_path = os.path.relpath(paths[len(paths) // 2], root).replace(os.sep, "/")
+  measure("log_path", ["log", "--", sample_path])
+  first, second = commit_ids(root)[:2]
+  measure("diff", ["diff", first, second])
+  measure("diff_stat", ["diff", "--stat", first, second])
+
+  # Both branches change files after the fork, so the merge is a real
+  # three-way merge rather than a fast-forward.
+  run_command(root, ["branch", "create", "feature"])
+  run_command(root, ["branch", "switch", "feature"])
+  edit_tree(root, args.edit_rate, args.seed + 2)
+  run_command(root, ["commit", "-m", "feature work"])
+  run_command(root, ["branch", "switch", "main"])
+  run_command(root, ["pull", "-c", second], stdin="y\n")
+  edit_tree(root, args.edit_rate, args.seed + 3)
+  run_command(root, ["commit", "-m", "main work"])
+  measure("branch_merge", ["branch", "merge", "feature"])
+  measure("pull", ["pull", "-c", first], stdin="y\n")
+  measure("pull_path", ["pull", "-c", second, "--", sample_path], stdin="y\n")
+
+  for number in range(BACKUP_LOCATIONS):
+      run_command(root, ["backup-loc", "add", os.path.join(workdir, f"backup-{files}-{number}")])
+  measure("backup_fan_out", ["backup-loc", "sync"])
+  if not args.keep:
+      shutil.rmtree(root)
+      for number in range(BACKUP_LOCATIONS):
+          shutil.rmtree(os.path.join(workdir, f"backup-{files}-{number}"), ignore_errors=True)
+  return results
+
+def compare_results(baseline, current, threshold):
+  """Prints how current compares with baseline and returns the list of regressions."""
+  regressions = []
+  for size, commands in current["results"].items():
+      for command, stats in commands.items():
+          old = baseline.get("results", {}).get(size, {}).get(command)
+          if old is None:
+              continue
+          for metric, min_difference in MIN_DIFFERENCES.items():
+              if metric not in stats or metric not in old:
+                  continue
+              before, after = old[metric], stats[metric]
+              if after - before > max(min_difference, before * threshold):
+                  change = f"+{(after / before - 1) * 100:.0f}%" if before else "new"
+                  regressions.append(f"{size} files, {command}: {metric} {before} -> {after} ({change})")
+  if regressions:
+      print(f"\n{len(regressions)} regression(s) against the baseline:")
+      for regression in regressions:
+          print(f"  {regression}")
+  else:
+      print("\nNo regressions against the baseline.")
+  return regressions
+
+def main():
+  if len(sys.argv) > 2 and sys.argv[1] == "--child":
+      child_main(sys.argv[2], sys.argv[4:])
+
+  parser = argparse.ArgumentParser(description="Benchmark SimpleGit commands on synthetic repositories")
+  parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f'Comma-separated file counts to test (default: {DEFAULT_SIZES})')
+  parser.add_argument('--depth', type=int, default=3, help='Folder nesting depth')
+  parser.add_argument('--files-per-dir', type=int, default=100, help='Files per folder')
+  parser.add_argument('--median-size', type=int, default=4096, help='Median file size in bytes')
+  parser.add_argument('--size-sigma', type=float, default=1.5, help='Spread of the log-normal size distribution')
+  parser.add_argument('--max-size', type=int, default=16 * 1024 * 1024, help='Largest file size in bytes')
+  parser.add_argument('--binary-share', type=float, default=0.1, help='Share of files with binary contents')
+  parser.add_argument('--edit-rate', type=float, default=0.05, help='Share of files changed between commits')
+  parser.add_argument('--seed', type=int, default=1, help='Random seed for the generated trees')
+  parser.add_argument('-j', '--jobs', type=int, default=1, help='Jobs passed to commit')
+  parser.add_argument('-o', '--output', default="bench_output.json", help='Where to write the results')
+  parser.add_argument('--baseline', help='Results file to compare against')
+  parser.add_argument('--threshold', type=float, default=0.2, help='Allowed relative slowdown before a regression is reported')
+  parser.add_argument('--workdir', help='Folder to generate trees in (default: a temp folder)')
+  parser.add_argument('--keep', action='store_true', help='Keep the generated trees')
+  args = parser.parse_args()
+
+  sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+  workdir = args.workdir or tempfile.mkdtemp(prefix="simplegit-bench-")
+  os.makedirs(workdir, exist_ok=True)
+  current = {
+      "version": RESULT_VERSION,
+      "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+      "python": platform.python_version(),
+      "platform": platform.platform(),
+      "options": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "workdir", "keep")},
+      "results": {}
+  }
+  try:
+      for size in sizes:
+          print(f"\n=== {size} files ===")
+          current["results"][str(size)] = benchmark_size(workdir, size, args)
+  finally:
+      if not args.workdir and not args.keep:
+          shutil.rmtree(workdir, ignore_errors=True)
+  with open(args.output, 'w') as output_file:
+      json.dump(current, output_file, indent=2)
+  print(f"\nWrote results to {args.output}")
+
+  if args.baseline:
+      with open(args.baseline) as baseline_file:
+          baseline = json.load(baseline_file)
+      if baseline.get("options", {}).get("seed") != args.seed:
+          print("Warning: the baseline was generated with a different seed.")
+      if compare_results(baseline, current, args.threshold):
+          sys.exit(1)
+
+if __name__ == "__main__":
+  main()
@@ -1,689 +1,4676 @@
-import os
-import sys
-import argparse
-import shutil
-import json
-import time
-from datetime import datetime
-import filecmp
-import difflib
-from pathlib import Path
-
-try:
-  import readline 
-except ImportError:
-  pass 
-
-REPO_DIR = ".simplegit"
-LOGS_DIR = "logs"
-CONFIG_FILE = "config.json"
-BRANCHES_DIR = "branches"
-TAGS_DIR = "tags"
-MASTER_BRANCH = "main"
-
-def log(message):
-  """Logs messages to a log file within the repository."""
-  repo_path = get_repo_path()
-  log_file = os.path.join(repo_path, "simplegit.log")
-  timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-  with open(log_file, "a") as lf:
-      lf.write(f"[{timestamp}] {message}\n")
-
-def get_repo_path():
-  """Returns the absolute path to the repository directory."""
-  return os.path.join(os.getcwd(), REPO_DIR)
-
-def get_logs_path():
-  """Returns the absolute path to the logs directory."""
-  return os.path.join(get_repo_path(), LOGS_DIR)
-
-def get_config_path():
-  """Returns the absolute path to the config file."""
-  return os.path.join(get_repo_path(), CONFIG_FILE)
-
-def get_branches_path():
-  """Returns the absolute path to the branches directory."""
-  return os.path.join(get_repo_path(), BRANCHES_DIR)
-
-def get_tags_path():
-  """Returns the absolute path to the tags directory."""
-  return os.path.join(get_repo_path(), TAGS_DIR)
-
-def init_repository(args):
-  """Initializes a new local repository."""
-  repo_path = get_repo_path()
-  if os.path.exists(repo_path):
-      print("Repository already initialized.")
-      return
-  os.makedirs(get_logs_path())
-  os.makedirs(get_branches_path())
-  os.makedirs(get_tags_path())
-  config = {
-      "logs_directory": get_logs_path(),
-      "backup_locations": [],  
-      "current_branch": MASTER_BRANCH,
-      "branches": {
-          MASTER_BRANCH: []  
-      },
-      "tags": {} 
-  }
-  with open(get_config_path(), 'w') as config_file:
-      json.dump(config, config_file, indent=4)
-  with open(os.path.join(get_branches_path(), MASTER_BRANCH + ".json"), 'w') as branch_file:
-      json.dump([], branch_file, indent=4)
-  log("Initialized a new SimpleGit repository.")
-  print(f"Initialized empty SimpleGit repository in {repo_path}")
-
-def load_config():
-  """Loads the repository configuration."""
-  config_path = get_config_path()
-  if not os.path.exists(config_path):
-      print("Configuration not found. Have you initialized the repository?")
-      sys.exit(1)
-  with open(config_path, 'r') as config_file:
-      return json.load(config_file)
-
-def save_config(config):
-  """Saves the repository configuration."""
-  with open(get_config_path(), 'w') as config_file:
-      json.dump(config, config_file, indent=4)
-
-def commit_changes(args):
-  """Commits the current state of the repository."""
-  config = load_config()
-  logs_dir = config.get("logs_directory", get_logs_path())
-  current_branch = config.get("current_branch", MASTER_BRANCH)
-  branches = config.get("branches", {MASTER_BRANCH: []})
-
-  if not os.path.exists(get_repo_path()):
-      print("Repository not initialized. Please run 'init' first.")
-      sys.exit(1)
-
-  if not has_changes(logs_dir, current_branch):
-      print("No changes detected since the last commit.")
-      return
-
-  timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-  unique_id = timestamp  
-  commit_title = args.title.replace(' ', '_')
-  commit_dir_name = f"{unique_id}_{commit_title}"
-  commit_path = os.path.join(logs_dir, commit_dir_name)
-  os.makedirs(commit_path)
-
-  for item in os.listdir(os.getcwd()):
-      if item == REPO_DIR:
-          continue
-      s = os.path.join(os.getcwd(), item)
-      d = os.path.join(commit_path, item)
-      try:
-          if os.path.isdir(s):
-              shutil.copytree(s, d, symlinks=True)
-          else:
-              shutil.copy2(s, d)
-      except Exception as e:
-          print(f"Failed to copy {s} to {d}: {e}")
-          log(f"Error copying {s} to {d}: {e}")
-
-  commit_info = {
-      "id": unique_id,
-      "title": args.title,
-      "timestamp": timestamp,
-      "description": args.description if args.description else "",
-      "branch": current_branch
-  }
-  with open(os.path.join(commit_path, "commit_info.json"), 'w') as info_file:
-      json.dump(commit_info, info_file, indent=4)
-
-  branches[current_branch].append(unique_id)
-  config["branches"] = branches
-  save_config(config)
-  log(f"Committed changes: {commit_dir_name} on branch {current_branch}")
-  handle_backups(config, commit_path)
-  print(f"Committed changes as '{args.title}' with ID {unique_id} on branch '{current_branch}'.")
-
-def has_changes(logs_dir, current_branch):
-  """Checks if there are changes to commit."""
-  if not os.path.exists(logs_dir):
-      return True 
-  branch_commits = get_branch_commits(current_branch)
-  if not branch_commits:
-      return True  
-  latest_commit = os.path.join(logs_dir, f"{branch_commits[-1]}_*")
-  commits = sorted([c for c in os.listdir(logs_dir) if c.startswith(branch_commits[-1])], reverse=True)
-  if not commits:
-      return True
-  latest_commit_path = os.path.join(logs_dir, commits[0])
-  for item in os.listdir(os.getcwd()):
-      if item == REPO_DIR:
-          continue
-      current_path = os.path.join(os.getcwd(), item)
-      commit_path = os.path.join(latest_commit_path, item)
-      if not os.path.exists(commit_path):
-          return True 
-      if os.path.isdir(current_path):
-          if not filecmp.dircmp(current_path, commit_path).left_only and not filecmp.dircmp(current_path, commit_path).right_only:
-              continue  
-          else:
-              return True
-      else:
-          if not filecmp.cmp(current_path, commit_path, shallow=False):
-              return True  
-  return False 
-
-def handle_backups(config, commit_path):
-  """Handles backing up the commit to additional locations."""
-  backup_locations = config.get("backup_locations", [])
-  if not backup_locations:
-      return  
-  for backup_dir in backup_locations:
-      if not os.path.exists(backup_dir):
-          try:
-              os.makedirs(backup_dir)
-              log(f"Created backup directory: {backup_dir}")
-          except Exception as e:
-              print(f"Failed to create backup directory {backup_dir}: {e}")
-              log(f"Error creating backup directory {backup_dir}: {e}")
-              continue
-      destination = os.path.join(backup_dir, os.path.basename(commit_path))
-      try:
-          if os.path.exists(destination):
-              shutil.rmtree(destination)
-          shutil.copytree(commit_path, destination, symlinks=True)
-          log(f"Backed up commit to {destination}")
-      except Exception as e:
-          print(f"Failed to backup to {backup_dir}: {e}")
-          log(f"Error backing up to {backup_dir}: {e}")
-
-def view_logs(args):
-  """Displays the commit logs."""
-  config = load_config()
-  logs_dir = config.get("logs_directory", get_logs_path())
-  current_branch = config.get("current_branch", MASTER_BRANCH)
-
-  if not os.path.exists(logs_dir):
-      print("No commits found.")
-      return
-
-  branch_commits = get_branch_commits(current_branch)
-  if not branch_commits:
-      print("No commits found on the current branch.")
-      return
-
-  print(f"--- Commit Logs for Branch '{current_branch}' ---\n")
-  for commit_id in reversed(branch_commits):
-      commit_dirs = [d for d in os.listdir(logs_dir) if d.startswith(commit_id)]
-      if not commit_dirs:
-          continue
-      commit_dir = commit_dirs[0]
-      commit_path = os.path.join(logs_dir, commit_dir)
-      info_path = os.path.join(commit_path, "commit_info.json")
-      if not os.path.exists(info_path):
-          continue
-      with open(info_path, 'r') as info_file:
-          commit_info = json.load(info_file)
-      timestamp = datetime.strptime(commit_info["timestamp"], "%Y%m%d%H%M%S")
-      readable_time = timestamp.strftime("%Y-%m-%d %H:%M:%S")
-      print(f"Commit ID : {commit_info['id']}")
-      print(f"Title     : {commit_info['title']}")
-      print(f"Date      : {readable_time}")
-      print(f"Description: {commit_info['description']}\n")
-
-def get_branch_commits(branch):
-  """Retrieves the list of commit IDs for a given branch."""
-  config = load_config()
-  branches = config.get("branches", {})
-  return branches.get(branch, [])
-
-def check_status(args):
-  """Checks the status of the repository."""
-  config = load_config()
-  logs_dir = config.get("logs_directory", get_logs_path())
-  current_branch = config.get("current_branch", MASTER_BRANCH)
-
-  if not os.path.exists(logs_dir):
-      print("No commits to compare with.")
-      return
-
-  branch_commits = get_branch_commits(current_branch)
-  if not branch_commits:
-      print("No commits on the current branch.")
-      return
-  latest_commit_id = branch_commits[-1]
-  commit_dirs = [d for d in os.listdir(logs_dir) if d.startswith(latest_commit_id)]
-  if not commit_dirs:
-      print("Latest commit data missing.")
-      return
-  latest_commit_path = os.path.join(logs_dir, commit_dirs[0])
-
-  changes = []
-  for item in os.listdir(os.getcwd()):
-      if item == REPO_DIR:
-          continue
-      current_path = os.path.join(os.getcwd(), item)
-      commit_path = os.path.join(latest_commit_path, item)
-      if not os.path.exists(commit_path):
-          changes.append(f"Added: {item}")
-      elif os.path.isdir(current_path):
-          if len(os.listdir(current_path)) != len(os.listdir(commit_path)):
-              changes.append(f"Modified: {item}/")
-      else:
-          if not filecmp.cmp(current_path, commit_path, shallow=False):
-              changes.append(f"Modified: {item}")
-
-  if changes:
-      print("Changes since last commit:")
-      for change in changes:
-          print(f"  {change}")
-  else:
-      print("No changes since the last commit.")
-
-def pull_commit(args):
-  """Pulls code from a specific commit."""
-  config = load_config()
-  logs_dir = config.get("logs_directory", get_logs_path())
-  current_branch = config.get("current_branch", MASTER_BRANCH)
-
-  if not os.path.exists(logs_dir):
-      print("No commits found.")
-      return
-
-  commits = get_branch_commits(current_branch)
-  if args.commit not in commits:
-      print(f"No commit found with ID '{args.commit}' on branch '{current_branch}'.")
-      return
-
-  commit_id = args.commit
-  commit_dirs = [d for d in os.listdir(logs_dir) if d.startswith(commit_id)]
-  if not commit_dirs:
-      print(f"Commit data missing for ID '{commit_id}'.")
-      return
-
-  commit_path = os.path.join(logs_dir, commit_dirs[0])
-  print(f"Pulling code from commit '{commit_id}'...")
-  
-  confirmation = input("This will overwrite existing files in the working directory. Proceed? (y/n): ")
-  if confirmation.lower() != 'y':
-      print("Pull aborted.")
-      return
-
-  for item in os.listdir(commit_path):
-      if item == "commit_info.json":
-          continue
-      s = os.path.join(commit_path, item)
-      d = os.path.join(os.getcwd(), item)
-      try:
-          if os.path.isdir(s):
-              if os.path.exists(d):
-                  shutil.rmtree(d)
-              shutil.copytree(s, d, symlinks=True)
-          else:
-              shutil.copy2(s, d)
-      except Exception as e:
-          print(f"Failed to copy {s} to {d}: {e}")
-          log(f"Error copying {s} to {d}: {e}")
-
-  log(f"Pulled commit '{commit_id}' to working directory.")
-  print("Pull complete. Your working directory has been updated.")
-
-def backup_changes(args):
-  """Automatically commits changes every x amount of time."""
-  interval = args.time
-  print(f"Starting automatic backup every {interval} seconds. Press Ctrl+C to stop.")
-  try:
-      while True:
-          if has_changes(load_config()['logs_directory'], load_config()['current_branch']):
-              commit_args = argparse.Namespace(
-                  title=f"{args.title} {datetime.now().strftime('%Y-%m-%d %H_%M_%S')}",
-                  description="Automatic backup"
-              )
-              commit_changes(commit_args)
-          else:
-              print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] No changes detected. Skipping backup.")
-          time.sleep(interval)
-  except KeyboardInterrupt:
-      print("\nBackup stopped by user.")
-      log("Automatic backup process terminated by user.")
-
-def add_backup_location(args):
-  """Adds a new backup location."""
-  config = load_config()
-  backup_dir = os.path.abspath(args.location)
-  if not os.path.exists(backup_dir):
-      try:
-          os.makedirs(backup_dir)
-          print(f"Created backup directory at {backup_dir}")
-          log(f"Created backup directory at {backup_dir}")
-      except Exception as e:
-          print(f"Failed to create backup directory {backup_dir}: {e}")
-          log(f"Error creating backup directory {backup_dir}: {e}")
-          return
-  if backup_dir in config.get("backup_locations", []):
-      print("Backup location already exists.")
-      return
-  config.setdefault("backup_locations", []).append(backup_dir)
-  save_config(config)
-  print(f"Added backup location: {backup_dir}")
-  log(f"Added backup location: {backup_dir}")
-
-def remove_backup_location(args):
-  """Removes an existing backup location."""
-  config = load_config()
-  backup_dir = os.path.abspath(args.location)
-  if backup_dir not in config.get("backup_locations", []):
-      print("Backup location not found in configuration.")
-      return
-  config["backup_locations"].remove(backup_dir)
-  save_config(config)
-  print(f"Removed backup location: {backup_dir}")
-  log(f"Removed backup location: {backup_dir}")
-
-def list_backup_locations(args):
-  """Lists all configured backup locations."""
-  config = load_config()
-  backup_locations = config.get("backup_locations", [])
-  if not backup_locations:
-      print("No backup locations configured.")
-      return
-  print("--- Backup Locations ---")
-  for idx, loc in enumerate(backup_locations, start=1):
-      print(f"{idx}. {loc}")
-
-def branch_init(args):
-  """Creates a new branch."""
-  config = load_config()
-  branch_name = args.name
-  branches = config.get("branches", {})
-  if branch_name in branches:
-      print(f"Branch '{branch_name}' already exists.")
-      return
-  branches[branch_name] = []
-  config["branches"] = branches
-  with open(os.path.join(get_branches_path(), branch_name + ".json"), 'w') as branch_file:
-      json.dump([], branch_file, indent=4)
-  save_config(config)
-  print(f"Created new branch '{branch_name}'.")
-  log(f"Created new branch '{branch_name}'.")
-
-def branch_switch(args):
-  """Switches to an existing branch."""
-  config = load_config()
-  branch_name = args.name
-  branches = config.get("branches", {})
-  if branch_name not in branches:
-      print(f"Branch '{branch_name}' does not exist.")
-      return
-  config["current_branch"] = branch_name
-  save_config(config)
-  print(f"Switched to branch '{branch_name}'.")
-  log(f"Switched to branch '{branch_name}'.")
-
-def view_branches(args):
-  """Lists all branches."""
-  config = load_config()
-  current_branch = config.get("current_branch", MASTER_BRANCH)
-  branches = config.get("branches", {})
-  print("--- Branches ---")
-  for branch in branches:
-      if branch == current_branch:
-          print(f"* {branch}")
-      else:
-          print(f"  {branch}")
-
-def diff_commits(args):
-  """Shows differences between two commits."""
-  config = load_config()
-  logs_dir = config.get("logs_directory", get_logs_path())
-  commit1 = args.commit1
-  commit2 = args.commit2
-
-  commit_dirs1 = [d for d in os.listdir(logs_dir) if d.startswith(commit1)]
-  commit_dirs2 = [d for d in os.listdir(logs_dir) if d.startswith(commit2)]
-  if not commit_dirs1:
-      print(f"No commit found with ID '{commit1}'.")
-      return
-  if not commit_dirs2:
-      print(f"No commit found with ID '{commit2}'.")
-      return
-
-  path1 = os.path.join(logs_dir, commit_dirs1[0])
-  path2 = os.path.join(logs_dir, commit_dirs2[0])
-
-  for root, dirs, files in os.walk(path1):
-      rel_path = os.path.relpath(root, path1)
-      path2_root = os.path.join(path2, rel_path)
-      for file in files:
-          file1 = os.path.join(root, file)
-          file2 = os.path.join(path2_root, file)
-          if os.path.exists(file2):
-              with open(file1, 'r', errors='ignore') as f1, open(file2, 'r', errors='ignore') as f2:
-                  diff = difflib.unified_diff(
-                      f1.readlines(),
-                      f2.readlines(),
-                      fromfile=f"{commit1}/{rel_path}/{file}",
-                      tofile=f"{commit2}/{rel_path}/{file}",
-                      lineterm=''
-                  )
-                  for line in diff:
-                      print(line)
-          else:
-              print(f"File '{file}' removed in commit '{commit2}'.")
-
-def tag_commit(args):
-  """Tags a specific commit."""
-  config = load_config()
-  logs_dir = config.get("logs_directory", get_logs_path())
-  commit_id = args.commit
-  tag_name = args.tag
-
-  commit_dirs = [d for d in os.listdir(logs_dir) if d.startswith(commit_id)]
-  if not commit_dirs:
-      print(f"No commit found with ID '{commit_id}'.")
-      return
-
-  tags = config.get("tags", {})
-  if tag_name in tags:
-      print(f"Tag '{tag_name}' already exists.")
-      return
-
-  tags[tag_name] = commit_id
-  config["tags"] = tags
-  save_config(config)
-
-  with open(os.path.join(get_tags_path(), f"{tag_name}.json"), 'w') as tag_file:
-      json.dump({"commit_id": commit_id}, tag_file, indent=4)
-
-  print(f"Tagged commit '{commit_id}' as '{tag_name}'.")
-  log(f"Tagged commit '{commit_id}' as '{tag_name}'.")
-
-def list_tags(args):
-  """Lists all tags."""
-  config = load_config()
-  tags = config.get("tags", {})
-  if not tags:
-      print("No tags have been created.")
-      return
-  print("--- Tags ---")
-  for tag, commit in tags.items():
-      print(f"{tag}: {commit}")
-
-def branch_merge(args):
-  """Merges a specified branch into the current branch."""
-  config = load_config()
-  current_branch = config.get("current_branch", MASTER_BRANCH)
-  target_branch = args.name
-  branches = config.get("branches", {})
-
-  if target_branch not in branches:
-      print(f"Branch '{target_branch}' does not exist.")
-      return
-  if target_branch == current_branch:
-      print("Cannot merge a branch into itself.")
-      return
-
-  current_commits = branches[current_branch]
-  target_commits = branches[target_branch]
-  if not target_commits:
-      print(f"Branch '{target_branch}' has no commits to merge.")
-      return
-  latest_target_commit_id = target_commits[-1]
-  logs_dir = config.get("logs_directory", get_logs_path())
-  commit_dirs = [d for d in os.listdir(logs_dir) if d.startswith(latest_target_commit_id)]
-  if not commit_dirs:
-      print(f"Commit data missing for ID '{latest_target_commit_id}'.")
-      return
-  target_commit_path = os.path.join(logs_dir, commit_dirs[0])
-
-  print(f"Merging branch '{target_branch}' into '{current_branch}'...")
-  for item in os.listdir(target_commit_path):
-      if item == "commit_info.json":
-          continue
-      s = os.path.join(target_commit_path, item)
-      d = os.path.join(os.getcwd(), item)
-      try:
-          if os.path.isdir(s):
-              if os.path.exists(d):
-                  shutil.rmtree(d)
-              shutil.copytree(s, d, symlinks=True)
-          else:
-              shutil.copy2(s, d)
-      except Exception as e:
-          print(f"Failed to merge {s} to {d}: {e}")
-          log(f"Error merging {s} to {d}: {e}")
-
-  merge_commit_title = f"Merge branch '{target_branch}' into '{current_branch}'"
-  merge_commit_args = argparse.Namespace(
-      title=merge_commit_title,
-      description=f"Merged branch '{target_branch}' into '{current_branch}'"
-  )
-  commit_changes(merge_commit_args)
-  print(f"Successfully merged '{target_branch}' into '{current_branch}'.")
-  log(f"Merged branch '{target_branch}' into '{current_branch}'.")
-
-def main():
-  parser = argparse.ArgumentParser(
-      description="SimpleGit: An Advanced Beginner-Friendly Local Version Control System",
-      formatter_class=argparse.RawTextHelpFormatter
-  )
-  """
-  The below is just evil, i dont apologise
-  """
-  subparsers = parser.add_subparsers(title="Commands", dest="command")
-  parser_init = subparsers.add_parser('init', aliases=['i'], help='Initialize a new repository')
-  parser_commit = subparsers.add_parser('commit', aliases=['c'], help='Commit current changes')
-  parser_commit.add_argument('-m', '--title', required=True, help='Commit title')
-  parser_commit.add_argument('-d', '--description', help='Commit description')
-  parser_log = subparsers.add_parser('log', aliases=['lg'], help='Show commit logs')
-  parser_status = subparsers.add_parser('status', aliases=['st'], help='Show status of repository')
-  parser_pull = subparsers.add_parser('pull', aliases=['p'], help='Pull code from a specific commit')
-  parser_pull.add_argument('-c', '--commit', required=True, help='Commit ID to pull from')
-  parser_backup = subparsers.add_parser('backup', aliases=['b'], help='Automatically commit changes every x seconds')
-  parser_backup.add_argument('-t', '--time', type=int, required=True, help='Time interval in seconds between backups')
-  parser_backup.add_argument('-m', '--title', default="Auto backup", help='Commit title for backups')
-  backup_loc = subparsers.add_parser('backup-loc', help='Manage backup locations')
-  backup_loc_sub = backup_loc.add_subparsers(title="Backup Location Commands", dest="backup_command")
-  backup_add = backup_loc_sub.add_parser('add', help='Add a new backup location')
-  backup_add.add_argument('location', help='Path to the backup directory')
-  backup_remove = backup_loc_sub.add_parser('remove', help='Remove an existing backup location')
-  backup_remove.add_argument('location', help='Path to the backup directory to remove')
-  backup_list = backup_loc_sub.add_parser('list', help='List all backup locations')
-  branch = subparsers.add_parser('branch', help='Manage branches')
-  branch_sub = branch.add_subparsers(title="Branch Commands", dest="branch_command")
-  branch_create = branch_sub.add_parser('create', help='Create a new branch')
-  branch_create.add_argument('name', help='Name of the new branch')
-  branch_switch_cmd = branch_sub.add_parser('switch', help='Switch to an existing branch')
-  branch_switch_cmd.add_argument('name', help='Name of the branch to switch to')
-  branch_list = branch_sub.add_parser('list', help='List all branches')
-  branch_merge_cmd = branch_sub.add_parser('merge', help='Merge a branch into the current branch')
-  branch_merge_cmd.add_argument('name', help='Name of the branch to merge into the current branch')
-  parser_diff = subparsers.add_parser('diff', help='Show differences between two commits')
-  parser_diff.add_argument('commit1', help='First commit ID')
-  parser_diff.add_argument('commit2', help='Second commit ID')
-  tag = subparsers.add_parser('tag', help='Manage tags')
-  tag_sub = tag.add_subparsers(title="Tag Commands", dest="tag_command")
-  tag_add = tag_sub.add_parser('add', help='Tag a specific commit')
-  tag_add.add_argument('commit', help='Commit ID to tag')
-  tag_add.add_argument('tag', help='Tag name')
-  tag_list = tag_sub.add_parser('list', help='List all tags')
-  parser_merge = subparsers.add_parser('merge', help='Merge a branch into the current branch')
-  parser_merge.add_argument('name', help='Name of the branch to merge into the current branch')
-  args = parser.parse_args()
-
-  if args.command in ['init', 'i']:
-      init_repository(args)
-  elif args.command in ['commit', 'c']:
-      commit_changes(args)
-  elif args.command in ['log', 'lg']:
-      view_logs(args)
-  elif args.command in ['status', 'st']:
-      check_status(args)
-  elif args.command in ['pull', 'p']:
-      pull_commit(args)
-  elif args.command == 'backup':
-      backup_changes(args)
-  elif args.command == ['backup-loc', 'bl']:
-      if args.backup_command == 'add':
-          add_backup_location(args)
-      elif args.backup_command == 'remove':
-          remove_backup_location(args)
-      elif args.backup_command == 'list':
-          list_backup_locations(args)
-      else:
-          print_help_backup_loc()
-  elif args.command == 'branch':
-      if args.branch_command == 'create':
-          branch_init(args)
-      elif args.branch_command == 'switch':
-          branch_switch(args)
-      elif args.branch_command == 'list':
-          view_branches(args)
-      elif args.branch_command == 'merge':
-          branch_merge(args)
-      else:
-          print_help_branch()
-  elif args.command == 'diff':
-      diff_commits(args)
-  elif args.command == 'tag':
-      if args.tag_command == 'add':
-          tag_commit(args)
-      elif args.tag_command == 'list':
-          list_tags(args)
-      else:
-          print_help_tag()
-  else:
-      parser.print_help()
-
-def print_help_backup_loc():
-  """Prints help for backup location management."""
-  help_text = """
-Backup Location Management Commands:
-
-backup-loc add <location>        Add a new backup location.
-backup-loc remove <location>     Remove an existing backup location.
-backup-loc list                  List all configured backup locations.
-"""
-  print(help_text)
-
-def print_help_branch():
-  """Prints help for branch management."""
-  help_text = """
-Branch Management Commands:
-
-branch create <name>             Create a new branch.
-branch switch <name>             Switch to an existing branch.
-branch list                      List all branches.
-branch merge <name>              Merge a branch into the current branch.
-"""
-  print(help_text)
-
-def print_help_tag():
-  """Prints help for tag management."""
-  help_text = """
-Tag Management Commands:
-
-tag add <commit> <tag>           Tag a specific commit.
-tag list                         List all tags.
-"""
-  print(help_text)
-
-if __name__ == "__main__":
-  main()
+import os
+import sys
+import json
+import re
+import time
+import hashlib
+import stat
+import errno
+import io
+import atexit
+import _thread
+from collections import Counter
+from itertools import chain, repeat
+from contextlib import contextmanager
+
+try:
+  import fcntl
+except ImportError:
+  fcntl = None
+  import msvcrt
+
+REPO_DIR = ".simplegit"
+LOGS_DIR = "logs"
+CONFIG_FILE = "config.json"
+BRANCHES_DIR = "branches"
+TAGS_DIR = "tags"
+OBJECTS_DIR = "objects"
+PACKS_DIR = "packs"
+MASTER_BRANCH = "main"
+COMMIT_INFO_FILE = "commit_info.json"
+INDEX_FILE = "index.json"
+MERGE_FILE = "merge.json"
+CONFLICT_MARKER_SIZE = 7
+LOG_FILE = "simplegit.log"
+LOG_BUFFER_RECORDS = 256
+LOG_BUFFER_SECONDS = 2.0
+IGNORE_FILE = ".simplegitignore"
+COMMIT_DB_FILE = "commits.db"
+LOCK_FILE = "lock"
+BACKUP_LOCK_FILE = "backup.lock"
+BACKUP_MANIFEST_FILE = "manifest.jsonl"
+BACKUP_STATE_FILE = "backup_state.json"
+DEFAULT_BACKUP_JOBS = 4
+BACKUP_DEBOUNCE_SECONDS = 2
+POLL_SECONDS = 5
+SERVE_SOCKET = "serve.sock"
+SERVE_IDLE_SECONDS = 1.0
+SERVE_REQUEST_TIMEOUT = 10
+# Commands 'serve' answers. The rest always run in their own process.
+SERVED_COMMANDS = {"status", "st", "log", "lg", "diff", "commit", "c"}
+DIFF_CONTEXT_LINES = 3
+DIFF_MAX_EDIT_COST = 1000
+DIFF_BINARY_PROBE = 8000
+DIFF_POOL_MIN_FILES = 16
+# A deleted and an added file at least this similar (in percent of lines) are reported as a rename.
+RENAME_THRESHOLD = 50
+# Similar renames are only searched for when at most this many files were deleted and added.
+RENAME_LIMIT = 1000
+PACK_MAGIC = b"SGPACK1\n"
+PACK_INDEX_MAGIC = b"SGIDX1\n\0"
+# struct formats of pack and bundle records.
+PACK_RECORD = ">BB32sQQ"
+PACK_INDEX_RECORD = ">32sQ"
+PACK_CODECS = {"none": 0, "zlib": 1, "lzma": 2, "zstd": 3}
+DEFAULT_PACK_COMPRESSION = "zlib"
+DELTA_MAX_DEPTH = 10
+DELTA_MAX_SIZE = 8 * 1024 * 1024
+GC_GRACE_SECONDS = 3600
+GC_LATENCY_SAMPLE = 200
+VERIFY_BATCH_FILES = 256
+BUNDLE_MAGIC = b"SGBUNDLE1\n"
+BUNDLE_RECORD = ">c32sQ"
+BUNDLE_CODECS = {"none": 0, "zlib": 1, "lzma": 2}
+BUNDLE_BLOCK_SIZE = 1024 * 1024
+VERIFY_BATCH_BYTES = 64 * 1024 * 1024
+AUTOMATIC_BACKUP_DESCRIPTION = "Automatic backup"
+HASH_CHUNK_SIZE = 1024 * 1024
+COPY_STRATEGIES = ("hardlink", "reflink", "copy_file_range", "sendfile", "copy")
+FICLONE = 0x40049409
+# Errors meaning "this strategy does not work for these files", after which
+# the next strategy is tried instead of failing the copy.
+COPY_FALLBACK_ERRNOS = {
+    errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.ENOSYS,
+    errno.EBADF, errno.EPERM, errno.EMLINK, getattr(errno, "ENOTSOCK", errno.EINVAL)
+}
+CHUNKED_FILE_SIZE = 16 * 1024 * 1024
+CHUNK_MIN_SIZE = 256 * 1024
+CHUNK_MAX_SIZE = 4 * 1024 * 1024
+CHUNK_SCAN_SIZE = 256 * 1024
+CHUNK_READ_SIZE = 16 * 1024 * 1024
+# A chunk ends after CHUNK_ANCHOR_BITS bytes in a row that this table maps
+# to "1", which happens about once every 2**CHUNK_ANCHOR_BITS bytes (~1 MB
+# past the minimum). The table must never change, or unchanged files would
+# be cut at new places and stop deduplicating against older commits.
+CHUNK_ANCHOR_BITS = 20
+CHUNK_ANCHOR = b"1" * CHUNK_ANCHOR_BITS
+_chunk_table = None
+
+def get_chunk_table():
+  """Returns the bytes.translate table for chunk boundaries, building it on first use."""
+  global _chunk_table
+  if _chunk_table is None:
+      _chunk_table = bytes.maketrans(
+          bytes(range(256)),
+          bytes(b"01"[hashlib.sha256(bytes([value])).digest()[0] & 1] for value in range(256))
+      )
+  return _chunk_table
+
+_log_records = []
+# _thread locks, so importing the module does not load threading.
+_log_lock = _thread.allocate_lock()
+_log_flushed_at = time.monotonic()
+
+def log(message, **fields):
+  """Logs a message, with optional structured fields, to the repository's log file."""
+  record = (os.path.join(get_repo_path(), LOG_FILE), time.strftime("%Y-%m-%d %H:%M:%S"), message, fields)
+  with _log_lock:
+      _log_records.append(record)
+      due = len(_log_records) >= LOG_BUFFER_RECORDS or time.monotonic() - _log_flushed_at >= LOG_BUFFER_SECONDS
+  if due:
+      flush_log()
+
+def flush_log():
+  """Writes out buffered log records, opening each log file once."""
+  global _log_flushed_at
+  with _log_lock:
+      records = _log_records[:]
+      _log_records.clear()
+      _log_flushed_at = time.monotonic()
+  lines = {}
+  for log_path, timestamp, message, fields in records:
+      extra = "".join(f" {key}={json.dumps(value, default=str)}" for key, value in fields.items())
+      lines.setdefault(log_path, []).append(f"[{timestamp}] {message}{extra}\n")
+  for log_path, log_lines in lines.items():
+      try:
+          with open(log_path, "a") as lf:
+              lf.writelines(log_lines)
+      except OSError:
+          pass
+
+atexit.register(flush_log)
+
+class Metrics:
+  """Timing spans and file and byte counts per phase, for --profile and --metrics-json."""
+
+  def __init__(self):
+      self.enabled = False
+      self.phases = {}
+      self._lock = _thread.allocate_lock()
+
+  @contextmanager
+  def span(self, name):
+      """Times the block as one call of a phase."""
+      if not self.enabled:
+          yield
+          return
+      start = time.perf_counter()
+      try:
+          yield
+      finally:
+          self.add(name, time.perf_counter() - start, 1)
+
+  def add(self, name, seconds=0.0, calls=0, files=0, size=0):
+      """Adds time, calls, files and bytes to a phase."""
+      if not self.enabled:
+          return
+      with self._lock:
+          phase = self.phases.setdefault(name, {"seconds": 0.0, "calls": 0, "files": 0, "bytes": 0})
+          phase["seconds"] += seconds
+          phase["calls"] += calls
+          phase["files"] += files
+          phase["bytes"] += size
+
+  def summary(self):
+      """Returns the phases, in the order they first ran, with rounded times."""
+      with self._lock:
+          return {name: dict(phase, seconds=round(phase["seconds"], 6)) for name, phase in self.phases.items()}
+
+metrics = Metrics()
+
+def report_metrics(args):
+  """Prints the --profile table to stderr and the --metrics-json summary to stdout."""
+  phases = metrics.summary()
+  if args.profile or args.profile_out:
+      print(f"{'Phase':<10} {'Seconds':>10} {'Calls':>8} {'Files':>9} {'MB':>10}", file=sys.stderr)
+      for name, phase in phases.items():
+          print(f"{name:<10} {phase['seconds']:>10.4f} {phase['calls']:>8} {phase['files']:>9} "
+                f"{phase['bytes'] / (1024 * 1024):>10.2f}", file=sys.stderr)
+      if args.profile_out:
+          print(f"cProfile stats written to {args.profile_out} (read them with python -m pstats)", file=sys.stderr)
+  if args.metrics_json:
+      summary = {"command": args.command, "phases": phases}
+      try:
+          import resource
+          summary["peak_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+      except ImportError:
+          pass
+      print(json.dumps(summary))
+
+class SimpleGitError(Exception):
+  """Raised when a repository operation cannot be carried out."""
+
+def make_temp_file(directory, prefix=".tmp_"):
+  """Creates a temp file in directory and returns (fd, path)."""
+  import tempfile
+  return tempfile.mkstemp(dir=directory, prefix=prefix)
+
+def write_json_atomic(path, data, indent=4):
+  """Writes JSON through a temp file, fsync and rename, so readers never see a partial file."""
+  directory = os.path.dirname(path)
+  fd, tmp_path = make_temp_file(directory)
+  try:
+      with os.fdopen(fd, 'w') as tmp_file:
+          json.dump(data, tmp_file, indent=indent)
+          tmp_file.flush()
+          os.fsync(tmp_file.fileno())
+      os.replace(tmp_path, path)
+  except BaseException:
+      if os.path.exists(tmp_path):
+          os.remove(tmp_path)
+      raise
+  if hasattr(os, "O_DIRECTORY"):
+      dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+      try:
+          os.fsync(dir_fd)
+      finally:
+          os.close(dir_fd)
+
+def _lock_file_handle(lock_file):
+  """Blocks until an exclusive advisory lock on an open file is held."""
+  if fcntl is not None:
+      fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+      return
+  lock_file.seek(0)
+  while True:
+      try:
+          msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+          return
+      except OSError:
+          time.sleep(0.05)
+
+def _unlock_file_handle(lock_file):
+  """Releases a lock taken by _lock_file_handle."""
+  if fcntl is not None:
+      fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+  else:
+      lock_file.seek(0)
+      msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+class Repository:
+  """A SimpleGit repository, opened once per command or library session."""
+
+  def __init__(self, root=None):
+      self.root = os.path.abspath(root or os.getcwd())
+      self.repo_path = os.path.join(self.root, REPO_DIR)
+      self._config = None
+      self._lock_file = None
+      self._lock_depth = 0
+      self.working_state = None
+
+  def __enter__(self):
+      _repository_stack.append(self)
+      return self
+
+  def __exit__(self, *exc_info):
+      _repository_stack.remove(self)
+      if not _repository_stack:
+          flush_log()
+
+  @property
+  def config(self):
+      """The repository configuration, read from disk on first access."""
+      if self._config is None:
+          with metrics.span("config"):
+              self._config = self.read_config()
+              if "branches" in self._config or "tags" in self._config:
+                  self._migrate_legacy_refs()
+      return self._config
+
+  def read_config(self):
+      """Reads config.json from disk."""
+      config_path = os.path.join(self.repo_path, CONFIG_FILE)
+      if not os.path.exists(config_path):
+          raise SimpleGitError("Configuration not found. Have you initialized the repository?")
+      with open(config_path, 'r') as config_file:
+          return json.load(config_file)
+
+  def _migrate_legacy_refs(self):
+      """Moves branch commit lists and tags out of config.json into ref files."""
+      with self, self.lock():
+          config = self.read_config()
+          for branch, commit_ids in config.pop("branches", {}).items():
+              parent = None
+              for commit_id in commit_ids:
+                  set_commit_parent(commit_id, parent)
+                  parent = commit_id
+              write_branch_head(branch, parent)
+          for tag_name, commit_id in config.pop("tags", {}).items():
+              # Older versions stored the id as typed, which could be a prefix, in both places.
+              commit_id = read_tag(tag_name) or commit_id
+              try:
+                  commit = find_commit(commit_id)
+              except SimpleGitError:
+                  # The prefix was unique when the tag was made, so it names the oldest commit it matches.
+                  commit = open_commit_db().execute(
+                      "SELECT * FROM commits WHERE id > ? AND id < ? ORDER BY seq LIMIT 1",
+                      (commit_id, commit_id + "\uffff")
+                  ).fetchone()
+              write_tag(tag_name, commit["id"] if commit is not None else commit_id)
+          self._config = config
+          self.save_config()
+          log("Moved branch and tag refs out of config.json.")
+
+  def reload(self):
+      """Drops the cached configuration so the next access reads it again."""
+      self._config = None
+
+  def save_config(self, config=None):
+      """Atomically writes the configuration back to config.json."""
+      if config is not None:
+          self._config = config
+      write_json_atomic(os.path.join(self.repo_path, CONFIG_FILE), self.config)
+
+  @contextmanager
+  def lock(self):
+      """Holds the repository's advisory lock. Re-entrant within one Repository."""
+      if self._lock_depth == 0:
+          if not os.path.isdir(self.repo_path):
+              raise SimpleGitError("Repository not initialized. Please run 'init' first.")
+          self._lock_file = open(os.path.join(self.repo_path, LOCK_FILE), 'a+')
+          _lock_file_handle(self._lock_file)
+      self._lock_depth += 1
+      try:
+          yield
+      finally:
+          self._lock_depth -= 1
+          if self._lock_depth == 0:
+              _unlock_file_handle(self._lock_file)
+              self._lock_file.close()
+              self._lock_file = None
+
+  @contextmanager
+  def transaction(self):
+      """Locks the repository and yields a fresh config, saving it afterwards if it changed."""
+      with self.lock():
+          if self._lock_depth == 1:
+              self.reload()
+          before = json.dumps(self.config, sort_keys=True)
+          try:
+              yield self.config
+          except BaseException:
+              self.reload()
+              raise
+          if json.dumps(self.config, sort_keys=True) != before:
+              self.save_config()
+
+  def commit(self, title, description="", jobs=1):
+      """Commits the working tree. Returns the new commit's info, or None if nothing changed."""
+      with self:
+          commit_info, _ = create_commit(title, description, jobs)
+          if commit_info is not None:
+              handle_backups(self.config, commit_info["id"])
+          return commit_info
+
+  def status(self):
+      """Returns (change, path) pairs for everything that differs from the latest commit."""
+      with self:
+          return working_changes()
+
+  def has_changes(self):
+      """Checks whether the working tree differs from the latest commit."""
+      with self:
+          return has_changes(self.config.get("logs_directory", get_logs_path()), self.current_branch)
+
+  def log(self, branch=None, limit=None, since=None, until=None, grep=None):
+      """Returns a branch's commits newest first as dicts."""
+      with self:
+          return [dict(row) for row in query_commits(branch or self.current_branch, limit, since, until, grep)]
+
+  def checkout(self, commit_id):
+      """Makes the working tree match a commit. Returns the counts of paths touched."""
+      with self, self.lock():
+          commit = find_commit(commit_id, exact=True)
+          if commit is None:
+              raise SimpleGitError(f"No commit found with ID '{commit_id}'.")
+          return checkout_working_tree(get_commit_tree(os.path.join(get_logs_path(), commit["dir"])))
+
+  @property
+  def current_branch(self):
+      """The name of the checked out branch."""
+      return self.config.get("current_branch", MASTER_BRANCH)
+
+_repository_stack = []
+_default_repository = None
+
+def current_repository():
+  """Returns the repository commands operate on."""
+  global _default_repository
+  if _repository_stack:
+      return _repository_stack[-1]
+  if _default_repository is None or _default_repository.root != os.path.abspath(os.getcwd()):
+      _default_repository = Repository()
+  return _default_repository
+
+def get_work_path():
+  """Returns the absolute path to the working tree."""
+  return current_repository().root
+
+def get_repo_path():
+  """Returns the absolute path to the repository directory."""
+  return current_repository().repo_path
+
+def get_logs_path():
+  """Returns the absolute path to the logs directory."""
+  return os.path.join(get_repo_path(), LOGS_DIR)
+
+def get_config_path():
+  """Returns the absolute path to the config file."""
+  return os.path.join(get_repo_path(), CONFIG_FILE)
+
+def get_branches_path():
+  """Returns the absolute path to the branches directory."""
+  return os.path.join(get_repo_path(), BRANCHES_DIR)
+
+def get_tags_path():
+  """Returns the absolute path to the tags directory."""
+  return os.path.join(get_repo_path(), TAGS_DIR)
+
+def get_branch_ref_path(branch):
+  """Returns the path of the file holding a branch's head commit."""
+  return os.path.join(get_branches_path(), branch + ".json")
+
+def branch_exists(branch):
+  """Checks whether a branch has been created."""
+  return os.path.exists(get_branch_ref_path(branch))
+
+def read_branch_head(branch):
+  """Returns the id of a branch's latest commit, or None if it has no commits."""
+  try:
+      with open(get_branch_ref_path(branch), 'r') as ref_file:
+          ref = json.load(ref_file)
+  except (OSError, ValueError):
+      return None
+  if isinstance(ref, list):
+      return ref[-1] if ref else None
+  return ref.get("head")
+
+def write_branch_head(branch, commit_id):
+  """Points a branch at a commit, creating the branch if needed."""
+  write_json_atomic(get_branch_ref_path(branch), {"head": commit_id})
+
+def list_branches():
+  """Returns the names of all branches, sorted."""
+  return sorted(name[:-len(".json")] for name in os.listdir(get_branches_path()) if name.endswith(".json"))
+
+def read_tag(tag_name):
+  """Returns the commit id a tag points at, or None if there is no such tag."""
+  try:
+      with open(os.path.join(get_tags_path(), f"{tag_name}.json"), 'r') as tag_file:
+          return json.load(tag_file)["commit_id"]
+  except (OSError, ValueError, KeyError):
+      return None
+
+def write_tag(tag_name, commit_id):
+  """Creates or moves a tag."""
+  write_json_atomic(os.path.join(get_tags_path(), f"{tag_name}.json"), {"commit_id": commit_id})
+
+def list_tag_refs():
+  """Returns (tag, commit id) pairs for all tags, sorted by tag name."""
+  tags = []
+  for name in sorted(os.listdir(get_tags_path())):
+      if name.endswith(".json"):
+          commit_id = read_tag(name[:-len(".json")])
+          if commit_id is not None:
+              tags.append((name[:-len(".json")], commit_id))
+  return tags
+
+def get_objects_path():
+  """Returns the absolute path to the object store."""
+  return os.path.join(get_repo_path(), OBJECTS_DIR)
+
+def get_object_path(obj_hash):
+  """Returns the path of a stored object, fanned out by its hash prefix."""
+  return os.path.join(get_objects_path(), obj_hash[:2], obj_hash[2:])
+
+def hash_file(path):
+  """Returns the sha256 hex digest of a file's contents."""
+  with open(path, 'rb') as f:
+      if hasattr(hashlib, "file_digest"):
+          return hashlib.file_digest(f, "sha256").hexdigest()
+      digest = hashlib.sha256()
+      for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+          digest.update(block)
+      return digest.hexdigest()
+
+def _copy_reflink(src_fd, dst_fd, size):
+  if fcntl is None:
+      raise OSError(errno.ENOSYS, "reflinks are not supported on this platform")
+  fcntl.ioctl(dst_fd, FICLONE, src_fd)
+
+def _copy_file_range(src_fd, dst_fd, size):
+  copied = 0
+  while copied < size:
+      sent = os.copy_file_range(src_fd, dst_fd, size - copied)
+      if sent == 0:
+          break
+      copied += sent
+
+def _copy_sendfile(src_fd, dst_fd, size):
+  copied = 0
+  while copied < size:
+      sent = os.sendfile(dst_fd, src_fd, copied, size - copied)
+      if sent == 0:
+          break
+      copied += sent
+
+def _copy_plain(src_fd, dst_fd, size):
+  for block in iter(lambda: os.read(src_fd, HASH_CHUNK_SIZE), b''):
+      view = memoryview(block)
+      while view:
+          view = view[os.write(dst_fd, view):]
+
+_copy_functions = {
+    "reflink": _copy_reflink,
+    "copy_file_range": _copy_file_range if hasattr(os, "copy_file_range") else None,
+    "sendfile": _copy_sendfile if hasattr(os, "sendfile") else None,
+    "copy": _copy_plain
+}
+_unsupported_copies = set()
+_copy_lock = _thread.allocate_lock()
+copy_counts = {}
+
+def copy_strategies(immutable=False):
+  """Returns the copy strategies to try, in order."""
+  preferred = current_repository().config.get("copy_strategy", "auto")
+  strategies = [strategy for strategy in COPY_STRATEGIES
+                if strategy != "hardlink" or (immutable and preferred == "hardlink")]
+  if preferred in strategies:
+      strategies.remove(preferred)
+      strategies.insert(0, preferred)
+  return strategies
+
+def _record_copy(strategy):
+  with _copy_lock:
+      copy_counts[strategy] = copy_counts.get(strategy, 0) + 1
+
+def copy_file_data(src_path, dst_fd, immutable=False):
+  """Copies a file's contents into an open, empty file. Returns the strategy used."""
+  with open(src_path, 'rb') as src, metrics.span("copy"):
+      src_st = os.fstat(src.fileno())
+      metrics.add("copy", files=1, size=src_st.st_size)
+      devices = (src_st.st_dev, os.fstat(dst_fd).st_dev)
+      for strategy in copy_strategies(immutable):
+          function = _copy_functions.get(strategy)
+          if function is None or (strategy, devices) in _unsupported_copies:
+              continue
+          try:
+              function(src.fileno(), dst_fd, src_st.st_size)
+          except OSError as e:
+              if e.errno not in COPY_FALLBACK_ERRNOS or strategy == "copy":
+                  raise
+              _unsupported_copies.add((strategy, devices))
+              os.ftruncate(dst_fd, 0)
+              os.lseek(dst_fd, 0, os.SEEK_SET)
+              os.lseek(src.fileno(), 0, os.SEEK_SET)
+              continue
+          _record_copy(strategy)
+          return strategy
+  raise OSError(errno.EIO, f"Could not copy {src_path}")
+
+def link_or_copy_object(src_path, dest):
+  """Puts a copy of an immutable object at dest, hardlinking it if copy_strategy asks for that."""
+  if copy_strategies(immutable=True)[0] == "hardlink":
+      devices = (os.stat(src_path).st_dev, os.stat(os.path.dirname(dest)).st_dev)
+      if ("hardlink", devices) not in _unsupported_copies:
+          try:
+              os.link(src_path, dest)
+              _record_copy("hardlink")
+              return "hardlink"
+          except FileExistsError:
+              return "hardlink"
+          except OSError as e:
+              if e.errno not in COPY_FALLBACK_ERRNOS:
+                  raise
+              _unsupported_copies.add(("hardlink", devices))
+  fd, tmp_path = make_temp_file(os.path.dirname(dest))
+  try:
+      try:
+          strategy = copy_file_data(src_path, fd, immutable=True)
+      finally:
+          os.close(fd)
+      os.replace(tmp_path, dest)
+  except BaseException:
+      if os.path.exists(tmp_path):
+          os.remove(tmp_path)
+      raise
+  return strategy
+
+def log_copy_strategies(action):
+  """Logs how many files each copy strategy handled since the last call."""
+  with _copy_lock:
+      counts = dict(copy_counts)
+      copy_counts.clear()
+  if counts:
+      summary = ", ".join(f"{count} with {strategy}" for strategy, count in sorted(counts.items()))
+      log(f"{action}: copied files {summary}")
+
+def _new_object_temp(obj_hash):
+  """Creates a temp file next to where an object will live and returns (fd, path)."""
+  obj_dir = os.path.dirname(get_object_path(obj_hash))
+  os.makedirs(obj_dir, exist_ok=True)
+  return make_temp_file(obj_dir)
+
+def store_bytes(data):
+  """Stores raw bytes in the object store and returns their hash."""
+  obj_hash = hashlib.sha256(data).hexdigest()
+  obj_path = get_object_path(obj_hash)
+  if not has_object(obj_hash):
+      fd, tmp_path = _new_object_temp(obj_hash)
+      with os.fdopen(fd, 'wb') as tmp_file:
+          tmp_file.write(data)
+      os.replace(tmp_path, obj_path)
+  return obj_hash
+
+def store_file(path):
+  """Stores a file in the object store and returns its hash."""
+  obj_hash = hash_file(path)
+  if has_object(obj_hash):
+      return obj_hash
+  fd, tmp_path = _new_object_temp(obj_hash)
+  try:
+      try:
+          copy_file_data(path, fd)
+      finally:
+          os.close(fd)
+      obj_hash = hash_file(tmp_path)
+      obj_path = get_object_path(obj_hash)
+      os.makedirs(os.path.dirname(obj_path), exist_ok=True)
+      os.replace(tmp_path, obj_path)
+  except BaseException:
+      if os.path.exists(tmp_path):
+          os.remove(tmp_path)
+      raise
+  return obj_hash
+
+def read_object(obj_hash):
+  """Reads a stored object's bytes, from a loose file or from a pack."""
+  try:
+      with open(get_object_path(obj_hash), 'rb') as obj_file:
+          return obj_file.read()
+  except FileNotFoundError:
+      data = read_packed_object(obj_hash)
+      if data is None:
+          raise
+      return data
+
+def has_object(obj_hash):
+  """Checks whether an object is stored, loose or packed."""
+  return os.path.exists(get_object_path(obj_hash)) or find_packed_object(obj_hash) is not None
+
+def get_packs_path():
+  """Returns the absolute path to the folder holding pack files."""
+  return os.path.join(get_repo_path(), PACKS_DIR)
+
+class Pack:
+  """A pack file and its offset index, opened for random access."""
+
+  def __init__(self, index_path):
+      import struct
+      with open(index_path, 'rb') as index_file:
+          data = index_file.read()
+      if not data.startswith(PACK_INDEX_MAGIC):
+          raise SimpleGitError(f"{index_path} is not a SimpleGit pack index.")
+      self.index_path = index_path
+      self.pack_path = index_path[:-len(".idx")] + ".pack"
+      self.count = int.from_bytes(data[len(PACK_INDEX_MAGIC):len(PACK_INDEX_MAGIC) + 8], "big")
+      self._record = struct.Struct(PACK_RECORD)
+      self._index_record = struct.Struct(PACK_INDEX_RECORD)
+      self._index = memoryview(data)[len(PACK_INDEX_MAGIC) + 8:]
+      self._fd = os.open(self.pack_path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+      self._lock = _thread.allocate_lock()
+
+  def close(self):
+      if self._fd is not None:
+          os.close(self._fd)
+          self._fd = None
+
+  def __del__(self):
+      if getattr(self, "_fd", None) is not None:
+          self.close()
+
+  def _pread(self, size, offset):
+      if hasattr(os, "pread"):
+          return os.pread(self._fd, size, offset)
+      with self._lock:
+          os.lseek(self._fd, offset, os.SEEK_SET)
+          return os.read(self._fd, size)
+
+  def _key(self, position):
+      start = position * self._index_record.size
+      return bytes(self._index[start:start + 32])
+
+  def find(self, obj_hash):
+      """Returns the offset of an object's record, or None if this pack lacks it."""
+      key = bytes.fromhex(obj_hash)
+      lo, hi = 0, self.count
+      while lo < hi:
+          mid = (lo + hi) // 2
+          if self._key(mid) < key:
+              lo = mid + 1
+          else:
+              hi = mid
+      if lo < self.count and self._key(lo) == key:
+          return self._index_record.unpack_from(self._index, lo * self._index_record.size)[1]
+      return None
+
+  def hashes(self):
+      """Yields the hashes of every object in the pack."""
+      for position in range(self.count):
+          yield self._key(position).hex()
+
+  def read_record(self, offset):
+      """Returns (kind, base hash or None, raw bytes or delta) for the record at offset."""
+      kind, codec, base, _, payload_size = self._record.unpack(self._pread(self._record.size, offset))
+      payload = self._pread(payload_size, offset + self._record.size)
+      return kind, base.hex() if kind else None, decompress_payload(payload, codec)
+
+_packs = {}
+
+def list_packs():
+  """Returns the open packs of the current repository, re-listing them when the packs folder changes."""
+  packs_dir = get_packs_path()
+  try:
+      mtime_ns = os.stat(packs_dir).st_mtime_ns
+  except FileNotFoundError:
+      return []
+  cached = _packs.get(packs_dir)
+  if cached is None or cached[0] != mtime_ns:
+      packs = [Pack(os.path.join(packs_dir, name)) for name in sorted(os.listdir(packs_dir)) if name.endswith(".idx")]
+      cached = _packs[packs_dir] = (mtime_ns, packs)
+  return cached[1]
+
+def find_packed_object(obj_hash):
+  """Returns (pack, offset) for a packed object, or None."""
+  for pack in list_packs():
+      offset = pack.find(obj_hash)
+      if offset is not None:
+          return pack, offset
+  return None
+
+_delta_bases = {}
+_delta_lock = _thread.allocate_lock()
+
+def read_packed_object(obj_hash):
+  """Reads an object from the packs, applying its delta chain. Returns None if it is not packed."""
+  found = find_packed_object(obj_hash)
+  if found is None:
+      return None
+  kind, base, data = found[0].read_record(found[1])
+  if kind:
+      base_data = _delta_bases.get(base)
+      if base_data is None:
+          base_data = read_object(base)
+      data = apply_delta(base_data, data)
+      if len(data) <= DELTA_MAX_SIZE:
+          with _delta_lock:
+              if len(_delta_bases) >= 64:
+                  _delta_bases.pop(next(iter(_delta_bases)))
+              _delta_bases[obj_hash] = data
+  return data
+
+def compress_payload(data, compression):
+  """Compresses a pack record. Returns (codec id, payload), keeping data as is when that is smaller."""
+  codec = PACK_CODECS[compression]
+  if codec == 1:
+      import zlib
+      payload = zlib.compress(data, 6)
+  elif codec == 2:
+      import lzma
+      payload = lzma.compress(data, preset=6)
+  elif codec == 3:
+      payload = _zstd_module().compress(data)
+  else:
+      return 0, data
+  if len(payload) >= len(data):
+      return 0, data
+  return codec, payload
+
+def decompress_payload(payload, codec):
+  """Undoes compress_payload."""
+  if codec == 1:
+      import zlib
+      return zlib.decompress(payload)
+  if codec == 2:
+      import lzma
+      return lzma.decompress(payload)
+  if codec == 3:
+      return _zstd_module().decompress(payload)
+  return payload
+
+def _zstd_module():
+  """Returns a module with zstd compress/decompress functions, if one is installed."""
+  try:
+      from compression import zstd
+      return zstd
+  except ImportError:
+      pass
+  try:
+      import zstandard
+  except ImportError:
+      raise SimpleGitError("zstd compression needs Python 3.14 or the 'zstandard' package.")
+  return zstandard
+
+def make_delta(base, data):
+  """Encodes data as line-level copy and insert instructions against base."""
+  if is_binary(base) or is_binary(data):
+      return None
+  import struct
+  a = base.splitlines(keepends=True)
+  b = data.splitlines(keepends=True)
+  offsets = [0]
+  for line in a:
+      offsets.append(offsets[-1] + len(line))
+  delta = bytearray()
+  for tag, i1, i2, j1, j2 in diff_lines(a, b):
+      if tag == "equal":
+          delta += b"C" + struct.pack(">QQ", offsets[i1], offsets[i2] - offsets[i1])
+      elif j1 < j2:
+          inserted = b"".join(b[j1:j2])
+          delta += b"I" + struct.pack(">Q", len(inserted)) + inserted
+  return bytes(delta)
+
+def apply_delta(base, delta):
+  """Rebuilds an object from its base and a delta made by make_delta."""
+  import struct
+  out = bytearray()
+  pos = 0
+  while pos < len(delta):
+      if delta[pos:pos + 1] == b"C":
+          offset, length = struct.unpack_from(">QQ", delta, pos + 1)
+          out += base[offset:offset + length]
+          pos += 17
+      else:
+          length = struct.unpack_from(">Q", delta, pos + 1)[0]
+          out += delta[pos + 9:pos + 9 + length]
+          pos += 9 + length
+  return bytes(out)
+
+def is_chunked_size(size):
+  """Checks whether a file of this size is stored as content-defined chunks."""
+  return size >= CHUNKED_FILE_SIZE
+
+def _find_chunk_end(buf, start, at_eof):
+  """Returns where the chunk starting at buf[start] ends, or None if more data is needed."""
+  table = get_chunk_table()
+  lo = start + CHUNK_MIN_SIZE
+  hi = min(start + CHUNK_MAX_SIZE, len(buf))
+  pos = lo
+  while pos < hi:
+      window_start = max(lo, pos - CHUNK_ANCHOR_BITS + 1)
+      window_end = min(pos + CHUNK_SCAN_SIZE, hi)
+      hit = buf[window_start:window_end].translate(table).find(CHUNK_ANCHOR)
+      if hit >= 0:
+          return window_start + hit + CHUNK_ANCHOR_BITS
+      pos = window_end
+  if start + CHUNK_MAX_SIZE <= len(buf) or (at_eof and start < len(buf)):
+      return hi
+  return None
+
+def iter_file_chunks(path):
+  """Yields a file's contents split into content-defined chunks."""
+  with open(path, 'rb') as f:
+      buf = b""
+      while True:
+          data = f.read(CHUNK_READ_SIZE)
+          buf = buf + data if buf else data
+          view = memoryview(buf)
+          start = 0
+          while True:
+              end = _find_chunk_end(buf, start, not data)
+              if end is None:
+                  break
+              yield view[start:end]
+              start = end
+          view.release()
+          buf = buf[start:]
+          if not data:
+              return
+
+def store_chunked_file(path, dry_run=False):
+  """Stores a large file as deduplicated chunks and returns the hash of its chunk list."""
+  chunks = []
+  size = 0
+  for chunk in iter_file_chunks(path):
+      chunk_hash = hashlib.sha256(chunk).hexdigest() if dry_run else store_bytes(chunk)
+      chunks.append([chunk_hash, len(chunk)])
+      size += len(chunk)
+  data = json.dumps({"size": size, "chunks": chunks}, separators=(',', ':')).encode()
+  return hashlib.sha256(data).hexdigest() if dry_run else store_bytes(data)
+
+def store_working_file(path, st, dry_run=False):
+  """Hashes and, unless dry_run, stores a working file, chunking it if it is large."""
+  if is_chunked_size(st.st_size):
+      return store_chunked_file(path, dry_run)
+  return hash_file(path) if dry_run else store_file(path)
+
+def read_chunk_list(obj_hash):
+  """Returns the [hash, length] pairs of a chunked file."""
+  return json.loads(read_object(obj_hash))["chunks"]
+
+def iter_blob(entry):
+  """Yields the contents of a blob entry in blocks, reassembling chunked files."""
+  if entry.get("chunked"):
+      for chunk_hash, _ in read_chunk_list(entry["hash"]):
+          yield read_object(chunk_hash)
+      return
+  try:
+      obj_file = open(get_object_path(entry["hash"]), 'rb')
+  except FileNotFoundError:
+      yield read_object(entry["hash"])
+      return
+  with obj_file:
+      yield from iter(lambda: obj_file.read(HASH_CHUNK_SIZE), b'')
+
+def read_blob(entry):
+  """Reads the whole contents of a blob entry."""
+  if not entry.get("chunked"):
+      return read_object(entry["hash"])
+  return b"".join(iter_blob(entry))
+
+def write_blob(entry, dest):
+  """Writes a blob entry's contents to dest, streaming chunked files chunk by chunk."""
+  if not entry.get("chunked") and os.path.exists(get_object_path(entry["hash"])):
+      with open(dest, 'wb') as dest_file:
+          copy_file_data(get_object_path(entry["hash"]), dest_file.fileno())
+      return
+  with open(dest, 'wb') as dest_file:
+      for block in iter_blob(entry):
+          dest_file.write(block)
+
+def store_tree(entries, dry_run=False, trees=None):
+  """Serializes tree entries and returns the tree hash, storing it unless dry_run."""
+  data = json.dumps(entries, sort_keys=True, separators=(',', ':')).encode()
+  if dry_run:
+      tree_hash = hashlib.sha256(data).hexdigest()
+      if trees is not None:
+          trees[tree_hash] = entries
+      return tree_hash
+  return store_bytes(data)
+
+_tree_cache = {}
+
+def read_tree(tree_hash, trees=None):
+  """Returns the entries of a tree, looking in the unsaved trees dict first."""
+  if trees and tree_hash in trees:
+      return trees[tree_hash]
+  if tree_hash not in _tree_cache:
+      _tree_cache[tree_hash] = json.loads(read_object(tree_hash))
+  return _tree_cache[tree_hash]
+
+def get_index_path():
+  """Returns the absolute path to the stat-cache index."""
+  return os.path.join(get_repo_path(), INDEX_FILE)
+
+def load_index():
+  """Loads the stat-cache index of working tree files."""
+  index = {"entries": {}, "mtime_ns": 0, "changed": False, "seen": set()}
+  index_path = get_index_path()
+  try:
+      with open(index_path, 'r') as index_file:
+          index["entries"] = json.load(index_file).get("entries", {})
+      index["mtime_ns"] = os.stat(index_path).st_mtime_ns
+  except (OSError, ValueError):
+      pass
+  return index
+
+def save_index(index, prune=False):
+  """Writes the index back if it changed. With prune, only paths seen in this run are kept."""
+  if prune:
+      entries = {path: index["entries"][path] for path in index["seen"] if path in index["entries"]}
+      index["changed"] = index["changed"] or len(entries) != len(index["entries"])
+      index["entries"] = entries
+  if not index["changed"]:
+      return
+  repo_path = get_repo_path()
+  fd, tmp_path = make_temp_file(repo_path, ".tmp_index_")
+  with os.fdopen(fd, 'w') as index_file:
+      # dumps goes through the C encoder; dump streams through the pure Python one.
+      index_file.write(json.dumps({"version": 1, "entries": index["entries"]}, separators=(',', ':')))
+  os.replace(tmp_path, get_index_path())
+  index["mtime_ns"] = os.stat(get_index_path()).st_mtime_ns
+  index["changed"] = False
+
+def lookup_index(index, rel_path, st):
+  """Returns the cached hash of a file if its stat data is unchanged, else None."""
+  index["seen"].add(rel_path)
+  cached = index["entries"].get(rel_path)
+  if cached is None and st.st_ino:
+      if "by_stat" not in index:
+          index["by_stat"] = {tuple(entry[:4]): entry[4] for entry in index["entries"].values()}
+      obj_hash = index["by_stat"].get((st.st_size, st.st_mtime_ns, st.st_ino, st.st_mode))
+      if obj_hash is not None and st.st_mtime_ns < index["mtime_ns"]:
+          update_index(index, rel_path, st, obj_hash)
+          return obj_hash
+      return None
+  if (cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns
+          and cached[2] == st.st_ino and cached[3] == st.st_mode
+          and st.st_mtime_ns < index["mtime_ns"]):
+      return cached[4]
+  return None
+
+def update_index(index, rel_path, st, obj_hash):
+  """Records the hash of a file along with the stat data it was read at."""
+  index["entries"][rel_path] = [st.st_size, st.st_mtime_ns, st.st_ino, st.st_mode, obj_hash]
+  index["changed"] = True
+
+def cached_hash_file(path, index=None, rel_path=None, st=None):
+  """Hashes a working file, skipping the read when the index has it cached."""
+  if index is None:
+      return hash_file(path)
+  st = st or os.stat(path)
+  obj_hash = lookup_index(index, rel_path, st)
+  if obj_hash is None:
+      obj_hash = hash_file(path)
+      update_index(index, rel_path, st, obj_hash)
+  return obj_hash
+
+def _translate_ignore_pattern(pattern):
+  """Turns one gitignore-style glob into a regular expression for paths relative to its file's folder."""
+  anchored = "/" in pattern
+  pattern = pattern.lstrip("/")
+  out = []
+  i = 0
+  while i < len(pattern):
+      if pattern.startswith("**/", i):
+          out.append("(?:.*/)?")
+          i += 3
+      elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+          out.append("/.*")
+          i += 3
+      elif pattern.startswith("**", i):
+          out.append(".*")
+          i += 2
+      elif pattern[i] == "*":
+          out.append("[^/]*")
+          i += 1
+      elif pattern[i] == "?":
+          out.append("[^/]")
+          i += 1
+      elif pattern[i] == "[" and "]" in pattern[i + 2:]:
+          end = pattern.index("]", i + 2)
+          body = pattern[i + 1:end]
+          if body.startswith("!"):
+              body = "^" + body[1:]
+          out.append("[" + body.replace("\\", "\\\\") + "]")
+          i = end + 1
+      elif pattern[i] == "\\" and i + 1 < len(pattern):
+          out.append(re.escape(pattern[i + 1]))
+          i += 2
+      else:
+          out.append(re.escape(pattern[i]))
+          i += 1
+  return ("" if anchored else "(?:.*/)?") + "".join(out)
+
+_ignore_file_cache = {}
+
+def compile_ignore_file(path):
+  """Compiles a .simplegitignore file. Returns None if it has no patterns."""
+  try:
+      st = os.stat(path)
+  except OSError:
+      return None
+  key = (path, st.st_mtime_ns, st.st_size)
+  if key in _ignore_file_cache:
+      return _ignore_file_cache[key]
+  rules = []
+  try:
+      with open(path, 'r', encoding='utf-8', errors='replace') as ignore_file:
+          lines = ignore_file.read().splitlines()
+  except OSError:
+      lines = []
+  for line in lines:
+      if not line.endswith("\\ "):
+          line = line.rstrip(" ")
+      if not line or line.startswith("#"):
+          continue
+      negated = line.startswith("!")
+      if negated:
+          line = line[1:]
+      elif line.startswith("\\!") or line.startswith("\\#"):
+          line = line[1:]
+      dir_only = line.endswith("/")
+      line = line.rstrip("/")
+      if line:
+          rules.append((_translate_ignore_pattern(line), negated, dir_only))
+  compiled = None
+  if rules:
+      combined = re.compile("(?:" + "|".join(f"(?:{regex})" for regex, _, _ in rules) + ")$")
+      compiled = (combined, [(re.compile(regex + "$"), negated, dir_only) for regex, negated, dir_only in rules])
+  _ignore_file_cache[key] = compiled
+  return compiled
+
+class IgnoreRules:
+  """The .simplegitignore files of a working tree, applied while walking it."""
+
+  def __init__(self, root):
+      self.root = root
+      self._rules = {}
+      self._loaded = set()
+
+  def load(self, rel_dir):
+      """Reads the ignore file of a folder, if it has one, unless that was done already."""
+      if rel_dir in self._loaded:
+          return
+      self._loaded.add(rel_dir)
+      compiled = compile_ignore_file(os.path.join(self.root, rel_dir, IGNORE_FILE))
+      if compiled is not None:
+          self._rules[rel_dir] = compiled
+
+  def is_ignored(self, rel_path, is_dir):
+      """Checks a path whose parent folders are known not to be ignored and have been loaded."""
+      if not self._rules:
+          return False
+      rel_dir = rel_path
+      while rel_dir:
+          rel_dir = rel_dir.rpartition("/")[0]
+          compiled = self._rules.get(rel_dir)
+          if compiled is None:
+              continue
+          sub_path = rel_path[len(rel_dir) + 1:] if rel_dir else rel_path
+          if not compiled[0].match(sub_path):
+              continue
+          for regex, negated, dir_only in reversed(compiled[1]):
+              if (is_dir or not dir_only) and regex.match(sub_path):
+                  return not negated
+      return False
+
+  def is_path_ignored(self, rel_path, is_dir=False):
+      """Checks a path and every folder above it, loading ignore files on the way down."""
+      self.load("")
+      parts = rel_path.split("/")
+      for depth in range(1, len(parts) + 1):
+          sub_path = "/".join(parts[:depth])
+          if self.is_ignored(sub_path, is_dir if depth == len(parts) else True):
+              return True
+          if depth < len(parts):
+              self.load(sub_path)
+      return False
+
+def _walk_dir(dir_path, skip, index, prefix, dry_run, pending, stats, ignore=None):
+  """Walks a directory once, building its entries."""
+  entries = []
+  with os.scandir(dir_path) as it:
+      items = sorted(it, key=lambda e: e.name)
+  if ignore is not None:
+      ignore.load(prefix)
+  for item in items:
+      if item.name in skip:
+          continue
+      rel_path = f"{prefix}/{item.name}" if prefix else item.name
+      try:
+          st = item.stat(follow_symlinks=False)
+          if ignore is not None and ignore.is_ignored(rel_path, stat.S_ISDIR(st.st_mode)):
+              continue
+          if stat.S_ISLNK(st.st_mode):
+              entries.append({"name": item.name, "type": "link", "target": os.readlink(item.path)})
+          elif stat.S_ISDIR(st.st_mode):
+              entries.append({
+                  "name": item.name,
+                  "type": "tree",
+                  "children": _walk_dir(item.path, (), index, rel_path, dry_run, pending, stats, ignore),
+                  "mode": stat.S_IMODE(st.st_mode)
+              })
+          elif stat.S_ISREG(st.st_mode):
+              stats["walked"] += 1
+              entry = {
+                  "name": item.name,
+                  "type": "blob",
+                  "hash": None,
+                  "mode": stat.S_IMODE(st.st_mode),
+                  "size": st.st_size
+              }
+              if is_chunked_size(st.st_size):
+                  entry["chunked"] = True
+              if index is not None:
+                  obj_hash = lookup_index(index, rel_path, st)
+                  if obj_hash is not None and (dry_run or has_object(obj_hash)):
+                      entry["hash"] = obj_hash
+              if entry["hash"] is None:
+                  pending.append((entry, item.path, rel_path, st))
+              entries.append(entry)
+      except OSError as e:
+          stats["errors"].append((item.path, e))
+  return entries
+
+def _hash_pending_file(job, index, dry_run):
+  """Hashes one queued file and, unless dry_run, stores it. Runs on a worker thread."""
+  entry, path, rel_path, st = job
+  obj_hash = store_working_file(path, st, dry_run)
+  if index is not None:
+      update_index(index, rel_path, st, obj_hash)
+  return obj_hash
+
+def _finish_tree(entries, dry_run, trees):
+  """Hashes a walked directory bottom-up and returns its tree hash."""
+  finished = []
+  for entry in entries:
+      if entry["type"] == "tree":
+          entry["hash"] = _finish_tree(entry.pop("children"), dry_run, trees)
+      elif entry["type"] == "blob" and entry["hash"] is None:
+          continue
+      finished.append(entry)
+  return store_tree(finished, dry_run, trees)
+
+def write_tree(dir_path, skip=(), dry_run=False, index=None, trees=None, jobs=1, stats=None, prefix="", ignore=None):
+  """Stores a directory recursively and returns the hash of its tree."""
+  stats = stats if stats is not None else {}
+  stats.update({"files": 0, "bytes": 0, "errors": [], "walked": 0})
+  pending = []
+  with metrics.span("walk"):
+      root = _walk_dir(dir_path, skip, index, prefix, dry_run, pending, stats, ignore)
+  metrics.add("walk", files=stats["walked"])
+  hash_start = time.perf_counter()
+  if jobs > 1 and len(pending) > 1:
+      from concurrent.futures import ThreadPoolExecutor
+      with ThreadPoolExecutor(max_workers=jobs) as pool:
+          futures = [pool.submit(_hash_pending_file, job, index, dry_run) for job in pending]
+          results = []
+          for future in futures:
+              try:
+                  results.append(future.result())
+              except OSError as e:
+                  results.append(e)
+  else:
+      results = []
+      for job in pending:
+          try:
+              results.append(_hash_pending_file(job, index, dry_run))
+          except OSError as e:
+              results.append(e)
+  for (entry, path, rel_path, st), result in zip(pending, results):
+      if isinstance(result, OSError):
+          stats["errors"].append((path, result))
+      else:
+          entry["hash"] = result
+          stats["files"] += 1
+          stats["bytes"] += st.st_size
+  metrics.add("hash", time.perf_counter() - hash_start, 1, stats["files"], stats["bytes"])
+  for path, e in stats["errors"]:
+      print(f"Failed to store {path}: {e}")
+      log(f"Error storing {path}: {e}")
+  return _finish_tree(root, dry_run, trees)
+
+def scan_working_tree(index):
+  """Hashes the working tree without storing anything."""
+  trees = {}
+  tree_hash = write_tree(get_work_path(), skip={REPO_DIR}, dry_run=True, index=index, trees=trees,
+                         ignore=IgnoreRules(get_work_path()))
+  return tree_hash, trees
+
+def _entry_from_disk(path, name, rel_path, index, stats, ignore, dry_run=False, trees=None):
+  """Builds the tree entry for one path as it is on disk now, or None if it is gone."""
+  try:
+      st = os.stat(path, follow_symlinks=False)
+  except FileNotFoundError:
+      return None
+  if stat.S_ISLNK(st.st_mode):
+      return {"name": name, "type": "link", "target": os.readlink(path)}
+  if stat.S_ISDIR(st.st_mode):
+      sub_stats = {}
+      tree_hash = write_tree(path, dry_run=dry_run, index=index, trees=trees, stats=sub_stats, prefix=rel_path, ignore=ignore)
+      for key in stats:
+          stats[key] += sub_stats[key]
+      return {"name": name, "type": "tree", "hash": tree_hash, "mode": stat.S_IMODE(st.st_mode)}
+  if stat.S_ISREG(st.st_mode):
+      obj_hash = lookup_index(index, rel_path, st)
+      if obj_hash is None or not (dry_run or has_object(obj_hash)):
+          obj_hash = store_working_file(path, st, dry_run)
+          update_index(index, rel_path, st, obj_hash)
+          stats["files"] += 1
+          stats["bytes"] += st.st_size
+      entry = {"name": name, "type": "blob", "hash": obj_hash, "mode": stat.S_IMODE(st.st_mode), "size": st.st_size}
+      if is_chunked_size(st.st_size):
+          entry["chunked"] = True
+      return entry
+  return None
+
+def update_tree(tree_hash, paths, index, stats=None, dry_run=False, trees=None):
+  """Stores a new tree that is tree_hash with only the given paths re-read from disk."""
+  stats = stats if stats is not None else {"files": 0, "bytes": 0, "errors": []}
+  changes = {}
+  for path in sorted(paths, key=lambda p: p.count("/")):
+      node = changes
+      parts = path.split("/")
+      for part in parts[:-1]:
+          node = node.setdefault(part, {})
+          if node is None:
+              break
+      else:
+          node[parts[-1]] = None
+  ignore = IgnoreRules(get_work_path())
+  return _apply_tree_changes(tree_hash, changes, get_work_path(), "", index, stats, ignore, dry_run, trees)
+
+def _apply_tree_changes(tree_hash, changes, dir_path, prefix, index, stats, ignore, dry_run=False, trees=None):
+  """Rebuilds one tree level for update_tree. A None change means re-read that path."""
+  entries = {entry["name"]: entry for entry in read_tree(tree_hash, trees)} if tree_hash else {}
+  ignore.load(prefix)
+  for name, sub_changes in changes.items():
+      if not prefix and name == REPO_DIR:
+          continue
+      path = os.path.join(dir_path, name)
+      rel_path = f"{prefix}/{name}" if prefix else name
+      is_dir = os.path.isdir(path) and not os.path.islink(path)
+      if ignore.is_ignored(rel_path, is_dir):
+          entry = None
+      elif sub_changes is None:
+          entry = _entry_from_disk(path, name, rel_path, index, stats, ignore, dry_run, trees)
+      elif is_dir:
+          old_entry = entries.get(name)
+          old_hash = old_entry["hash"] if old_entry and old_entry["type"] == "tree" else None
+          entry = {
+              "name": name,
+              "type": "tree",
+              "hash": _apply_tree_changes(old_hash, sub_changes, path, rel_path, index, stats, ignore, dry_run, trees),
+              "mode": stat.S_IMODE(os.stat(path).st_mode)
+          }
+      else:
+          entry = _entry_from_disk(path, name, rel_path, index, stats, ignore, dry_run, trees)
+      if entry is None:
+          entries.pop(name, None)
+      else:
+          entries[name] = entry
+  return store_tree([entries[name] for name in sorted(entries)], dry_run, trees)
+
+def iter_tree(tree_hash, prefix="", trees=None):
+  """Yields (relative path, entry) for every non-directory entry in a tree."""
+  for entry in read_tree(tree_hash, trees):
+      rel_path = f"{prefix}/{entry['name']}" if prefix else entry["name"]
+      if entry["type"] == "tree":
+          yield from iter_tree(entry["hash"], rel_path, trees)
+      else:
+          yield rel_path, entry
+
+def _clean_pathspec(spec):
+  spec = spec.replace(os.sep, "/").strip("/")
+  while spec.startswith("./"):
+      spec = spec[2:]
+  return "" if spec == "." else spec
+
+def match_pathspec(path, pathspecs):
+  """Checks whether path is named by, or lies under, one of the pathspecs."""
+  if not pathspecs:
+      return True
+  import fnmatch
+  for spec in map(_clean_pathspec, pathspecs):
+      if not spec or path == spec or path.startswith(spec + "/") or fnmatch.fnmatchcase(path, spec):
+          return True
+  return False
+
+def pathspec_may_match_under(dir_path, pathspecs):
+  """Checks whether anything below dir_path could match the pathspecs, so unrelated subtrees can be skipped."""
+  if not pathspecs:
+      return True
+  for spec in map(_clean_pathspec, pathspecs):
+      glob_at = min((spec.find(ch) for ch in "*?[" if ch in spec), default=-1)
+      if glob_at >= 0:
+          spec = spec[:glob_at].rpartition("/")[0]
+      if not spec or spec == dir_path or spec.startswith(dir_path + "/") or dir_path.startswith(spec + "/"):
+          return True
+  return False
+
+def diff_tree_entries(old_hash, new_hash, trees=None, prefix="", pathspecs=None):
+  """Yields (change, path, old entry, new entry) for every file that differs."""
+  if old_hash == new_hash:
+      return
+  old = {entry["name"]: entry for entry in read_tree(old_hash, trees)} if old_hash else {}
+  new = {entry["name"]: entry for entry in read_tree(new_hash, trees)} if new_hash else {}
+  for name in sorted(old.keys() | new.keys()):
+      rel_path = f"{prefix}/{name}" if prefix else name
+      old_entry = old.get(name)
+      new_entry = new.get(name)
+      if old_entry == new_entry:
+          continue
+      old_is_tree = old_entry is not None and old_entry["type"] == "tree"
+      new_is_tree = new_entry is not None and new_entry["type"] == "tree"
+      if old_is_tree or new_is_tree:
+          if pathspec_may_match_under(rel_path, pathspecs):
+              yield from diff_tree_entries(
+                  old_entry["hash"] if old_is_tree else None,
+                  new_entry["hash"] if new_is_tree else None,
+                  trees,
+                  rel_path,
+                  pathspecs
+              )
+          if not match_pathspec(rel_path, pathspecs):
+              continue
+          if old_entry is not None and not old_is_tree:
+              yield "Deleted", rel_path, old_entry, None
+          if new_entry is not None and not new_is_tree:
+              yield "Added", rel_path, None, new_entry
+      elif not match_pathspec(rel_path, pathspecs):
+          continue
+      elif old_entry is None:
+          yield "Added", rel_path, None, new_entry
+      elif new_entry is None:
+          yield "Deleted", rel_path, old_entry, None
+      else:
+          yield "Modified", rel_path, old_entry, new_entry
+
+def diff_trees(old_hash, new_hash, trees=None, prefix="", pathspecs=None):
+  """Yields ("Added"|"Modified"|"Deleted", path) for every file that differs."""
+  for change, rel_path, _, _ in diff_tree_entries(old_hash, new_hash, trees, prefix, pathspecs):
+      yield change, rel_path
+
+def _line_sketch(data):
+  """Returns the hashes of the distinct lines of a text, which is what renamed files are compared by."""
+  return set(map(hash, data.splitlines()))
+
+def _similar_renames(changes, deleted, added, threshold, read_new):
+  """Yields (percent, added position, deleted position) for every pair at least threshold percent alike."""
+  files_with_line = {}
+  line_counts = {}
+  for position in deleted:
+      data = read_blob(changes[position][2])
+      if is_binary(data):
+          continue
+      sketch = _line_sketch(data)
+      line_counts[position] = len(sketch)
+      for line in sketch:
+          files_with_line.setdefault(line, []).append(position)
+  for position in added:
+      _, rel_path, _, new_entry = changes[position]
+      data = read_new(rel_path, new_entry)
+      if data is None or is_binary(data):
+          continue
+      sketch = _line_sketch(data)
+      shared = Counter(chain.from_iterable(map(files_with_line.get, sketch, repeat(()))))
+      for source, common in shared.items():
+          percent = common * 100 // max(len(sketch), line_counts[source])
+          if percent >= threshold:
+              yield percent, position, source
+
+def detect_renames(changes, threshold=RENAME_THRESHOLD, limit=RENAME_LIMIT, read_new=None):
+  """Pairs deleted files with added ones that hold the same or similar contents."""
+  read_new = read_new or (lambda rel_path, entry: read_blob(entry))
+  sources = {}
+  for kind in ("Deleted", "Modified"):
+      for position, (change, _, old_entry, _) in enumerate(changes):
+          if change == kind and old_entry["type"] == "blob" and old_entry.get("size") != 0:
+              sources.setdefault(old_entry["hash"], []).append(position)
+  matches = {}
+  renamed = set()
+  for position, (change, _, _, new_entry) in enumerate(changes):
+      if change != "Added" or new_entry["type"] != "blob" or new_entry["hash"] not in sources:
+          continue
+      candidates = sources[new_entry["hash"]]
+      source = next((source for source in candidates if changes[source][0] == "Deleted" and source not in renamed), None)
+      if source is None:
+          matches[position] = ("Copied", candidates[0], 100)
+      else:
+          matches[position] = ("Renamed", source, 100)
+          renamed.add(source)
+
+  def text_candidate(entry):
+      return entry["type"] == "blob" and not entry.get("chunked") and entry.get("size") != 0
+  deleted = [position for position, (change, _, old_entry, _) in enumerate(changes)
+             if change == "Deleted" and position not in renamed and text_candidate(old_entry)]
+  added = [position for position, (change, _, _, new_entry) in enumerate(changes)
+           if change == "Added" and position not in matches and text_candidate(new_entry)]
+  if threshold < 100 and deleted and added and len(deleted) <= limit and len(added) <= limit:
+      for percent, position, source in sorted(_similar_renames(changes, deleted, added, threshold, read_new), reverse=True):
+          if position not in matches and source not in renamed:
+              matches[position] = ("Renamed", source, percent)
+              renamed.add(source)
+
+  result = []
+  for position, (change, rel_path, old_entry, new_entry) in enumerate(changes):
+      if position in renamed:
+          continue
+      if position in matches:
+          change, source, percent = matches[position]
+          result.append((change, rel_path, changes[source][2], new_entry, (changes[source][1], percent)))
+      else:
+          result.append((change, rel_path, old_entry, new_entry, None))
+  return result
+
+def find_renames(args, changes, read_new=None):
+  """Runs detect_renames with the command's --find-renames and --rename-limit, or adds no sources with --no-renames."""
+  threshold = getattr(args, "find_renames", RENAME_THRESHOLD)
+  if threshold is None:
+      return [change + (None,) for change in changes]
+  return detect_renames(list(changes), threshold, getattr(args, "rename_limit", RENAME_LIMIT), read_new)
+
+def describe_path(rel_path, source):
+  """Returns how a change's path is shown: 'old -> new', with how alike they are when not identical."""
+  if source is None:
+      return rel_path
+  source_path, percent = source
+  return f"{source_path} -> {rel_path}" + (f" ({percent}% alike)" if percent < 100 else "")
+
+def remove_path(path):
+  """Removes a file, symlink or directory if it exists."""
+  if os.path.islink(path) or os.path.isfile(path):
+      os.remove(path)
+  elif os.path.isdir(path):
+      import shutil
+      shutil.rmtree(path)
+
+def checkout_entry(entry, dest):
+  """Writes a single tree entry to dest, replacing whatever is there."""
+  remove_path(dest)
+  if entry["type"] == "tree":
+      checkout_tree(entry["hash"], dest)
+      os.chmod(dest, entry["mode"])
+  elif entry["type"] == "link":
+      os.symlink(entry["target"], dest)
+  else:
+      write_blob(entry, dest)
+      os.chmod(dest, entry["mode"])
+
+def checkout_tree(tree_hash, dest):
+  """Materializes a stored tree into the dest directory."""
+  os.makedirs(dest, exist_ok=True)
+  for entry in read_tree(tree_hash):
+      d = os.path.join(dest, entry["name"])
+      try:
+          checkout_entry(entry, d)
+      except Exception as e:
+          print(f"Failed to write {d}: {e}")
+          log(f"Error writing {d}: {e}")
+
+def _write_entry(entry, dest, rel_path, index, counts):
+  """Writes a tree entry to a path that does not exist yet and indexes what it wrote."""
+  if entry["type"] == "tree":
+      os.makedirs(dest, exist_ok=True)
+      for child in read_tree(entry["hash"]):
+          _write_entry(child, os.path.join(dest, child["name"]), f"{rel_path}/{child['name']}", index, counts)
+      os.chmod(dest, entry["mode"])
+  elif entry["type"] == "link":
+      os.symlink(entry["target"], dest)
+      counts["written"] += 1
+  else:
+      write_blob(entry, dest)
+      os.chmod(dest, entry["mode"])
+      update_index(index, rel_path, os.stat(dest), entry["hash"])
+      counts["written"] += 1
+
+def _remove_tree_files(tree_hash, trees, dest):
+  """Removes the entries of a scanned tree from dest, keeping folders that still hold ignored files."""
+  for entry in read_tree(tree_hash, trees):
+      path = os.path.join(dest, entry["name"])
+      if entry["type"] == "tree":
+          _remove_tree_files(entry["hash"], trees, path)
+          if not os.listdir(path):
+              os.rmdir(path)
+      else:
+          remove_path(path)
+
+def _checkout_diff(old_hash, new_hash, trees, dest_dir, prefix, index, counts, delete_top_level=False):
+  """Applies the difference between two trees to dest_dir."""
+  old = {entry["name"]: entry for entry in read_tree(old_hash, trees)} if old_hash else {}
+  new = {entry["name"]: entry for entry in read_tree(new_hash, trees)} if new_hash else {}
+  for name in sorted(old.keys() | new.keys()):
+      old_entry = old.get(name)
+      new_entry = new.get(name)
+      if old_entry == new_entry:
+          continue
+      rel_path = f"{prefix}/{name}" if prefix else name
+      dest = os.path.join(dest_dir, name)
+      try:
+          if new_entry is None:
+              if prefix or delete_top_level:
+                  if old_entry["type"] == "tree":
+                      _remove_tree_files(old_entry["hash"], trees, dest)
+                      if not os.listdir(dest):
+                          os.rmdir(dest)
+                  else:
+                      remove_path(dest)
+                  counts["deleted"] += 1
+          elif old_entry is not None and old_entry["type"] == new_entry["type"] == "tree":
+              _checkout_diff(old_entry["hash"], new_entry["hash"], trees, dest, rel_path, index, counts)
+              if old_entry["mode"] != new_entry["mode"]:
+                  os.chmod(dest, new_entry["mode"])
+          elif (old_entry is not None and old_entry["type"] == new_entry["type"] == "blob"
+                  and old_entry["hash"] == new_entry["hash"]):
+              os.chmod(dest, new_entry["mode"])
+              update_index(index, rel_path, os.stat(dest), new_entry["hash"])
+              counts["chmod"] += 1
+          else:
+              if old_entry is not None and old_entry["type"] == "tree":
+                  _remove_tree_files(old_entry["hash"], trees, dest)
+              if not os.path.isdir(dest) or os.path.islink(dest):
+                  remove_path(dest)
+              elif new_entry["type"] != "tree":
+                  if os.listdir(dest):
+                      print(f"Kept the folder {dest} instead of restoring '{rel_path}': it holds ignored files.")
+                      log(f"Kept folder {dest} holding ignored files", path=rel_path)
+                      continue
+                  os.rmdir(dest)
+              _write_entry(new_entry, dest, rel_path, index, counts)
+      except Exception as e:
+          print(f"Failed to restore {dest}: {e}")
+          log(f"Error restoring {dest}: {e}")
+
+def checkout_working_tree(tree_hash):
+  """Makes the working tree match a stored tree, touching only paths that differ."""
+  index = load_index()
+  working_tree, trees = scan_working_tree(index)
+  counts = {"written": 0, "deleted": 0, "chmod": 0}
+  with metrics.span("checkout"):
+      _checkout_diff(working_tree, tree_hash, trees, get_work_path(), "", index, counts)
+  metrics.add("checkout", files=counts["written"] + counts["deleted"] + counts["chmod"])
+  save_index(index)
+  return counts
+
+def load_commit_info(commit_path):
+  """Loads the commit_info.json of a commit directory."""
+  with open(os.path.join(commit_path, COMMIT_INFO_FILE), 'r') as info_file:
+      return json.load(info_file)
+
+def get_commit_tree(commit_path):
+  """Returns the tree hash of a commit."""
+  commit_info = load_commit_info(commit_path)
+  if "tree" not in commit_info:
+      commit_info["tree"] = write_tree(commit_path, skip={COMMIT_INFO_FILE})
+      write_json_atomic(os.path.join(commit_path, COMMIT_INFO_FILE), commit_info)
+      db = open_commit_db()
+      db.execute("UPDATE commits SET tree = ? WHERE id = ?", (commit_info["tree"], commit_info["id"]))
+      db.commit()
+      log(f"Moved legacy snapshot {os.path.basename(commit_path)} into the object store.")
+  return commit_info["tree"]
+
+def get_commit_db_path():
+  """Returns the absolute path to the commit metadata index."""
+  return os.path.join(get_repo_path(), COMMIT_DB_FILE)
+
+_commit_dbs = {}
+
+def open_commit_db():
+  """Opens the commit metadata index, building it from the logs folder on first use."""
+  db_path = get_commit_db_path()
+  if db_path in _commit_dbs:
+      return _commit_dbs[db_path]
+  import sqlite3
+  is_new = not os.path.exists(db_path)
+  db = sqlite3.connect(db_path)
+  db.row_factory = sqlite3.Row
+  db.execute("PRAGMA journal_mode=WAL")
+  db.execute("PRAGMA synchronous=NORMAL")
+  db.executescript("""
+      CREATE TABLE IF NOT EXISTS commits (
+          seq INTEGER PRIMARY KEY AUTOINCREMENT,
+          id TEXT NOT NULL UNIQUE,
+          dir TEXT NOT NULL,
+          title TEXT NOT NULL,
+          description TEXT NOT NULL DEFAULT '',
+          timestamp TEXT NOT NULL,
+          branch TEXT NOT NULL,
+          tree TEXT,
+          parent TEXT,
+          merge_parent TEXT,
+          paths_indexed INTEGER NOT NULL DEFAULT 0
+      );
+      CREATE INDEX IF NOT EXISTS commits_branch ON commits (branch, seq);
+      CREATE INDEX IF NOT EXISTS commits_timestamp ON commits (branch, timestamp);
+      CREATE TABLE IF NOT EXISTS path_changes (
+          path TEXT NOT NULL,
+          commit_id TEXT NOT NULL,
+          change TEXT NOT NULL,
+          PRIMARY KEY (path, commit_id)
+      ) WITHOUT ROWID;
+      CREATE INDEX IF NOT EXISTS path_changes_commit ON path_changes (commit_id);
+      CREATE TABLE IF NOT EXISTS verified_objects (
+          location TEXT NOT NULL,
+          hash TEXT NOT NULL,
+          size INTEGER NOT NULL,
+          mtime_ns INTEGER NOT NULL,
+          PRIMARY KEY (location, hash)
+      ) WITHOUT ROWID;
+  """)
+  columns = {row["name"] for row in db.execute("PRAGMA table_info(commits)")}
+  if "parent" not in columns:
+      db.execute("ALTER TABLE commits ADD COLUMN parent TEXT")
+  if "merge_parent" not in columns:
+      db.execute("ALTER TABLE commits ADD COLUMN merge_parent TEXT")
+  if "paths_indexed" not in columns:
+      db.execute("ALTER TABLE commits ADD COLUMN paths_indexed INTEGER NOT NULL DEFAULT 0")
+  _commit_dbs[db_path] = db
+  if is_new:
+      rebuild_commit_db(db)
+  return db
+
+def rebuild_commit_db(db):
+  """Fills the commit index from the commit_info.json files under the logs folder."""
+  logs_dir = get_logs_path()
+  if not os.path.exists(logs_dir):
+      return
+  commits = []
+  for commit_dir in os.listdir(logs_dir):
+      try:
+          commit_info = load_commit_info(os.path.join(logs_dir, commit_dir))
+      except (OSError, ValueError):
+          continue
+      commits.append((commit_info.get("timestamp", commit_info["id"]), len(commit_info["id"]), commit_info["id"], commit_dir, commit_info))
+  for _, _, _, commit_dir, commit_info in sorted(commits, key=lambda c: c[:3]):
+      index_commit(db, commit_info, commit_dir, commit=False)
+  db.commit()
+  log("Rebuilt the commit index from the logs folder.")
+
+def index_commit(db, commit_info, commit_dir, commit=True):
+  """Adds a commit to the metadata index."""
+  db.execute(
+      "INSERT OR IGNORE INTO commits (id, dir, title, description, timestamp, branch, tree, parent, merge_parent) "
+      "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+      (commit_info["id"], commit_dir, commit_info.get("title", ""), commit_info.get("description", ""),
+       commit_info.get("timestamp", commit_info["id"]), commit_info.get("branch", MASTER_BRANCH),
+       commit_info.get("tree"), commit_info.get("parent"), commit_info.get("merge_parent"))
+  )
+  if commit:
+      db.commit()
+
+def record_path_changes(db, commit_id, changes, commit=True):
+  """Stores the (change, path) pairs a commit made relative to its parent."""
+  db.executemany("INSERT OR REPLACE INTO path_changes (path, commit_id, change) VALUES (?, ?, ?)",
+                 ((rel_path, commit_id, change) for change, rel_path in changes))
+  db.execute("UPDATE commits SET paths_indexed = 1 WHERE id = ?", (commit_id,))
+  if commit:
+      db.commit()
+
+def index_path_changes(db):
+  """Records the changed paths of commits made before the path index existed."""
+  pending = db.execute("SELECT * FROM commits WHERE paths_indexed = 0 ORDER BY seq").fetchall()
+  if not pending:
+      return 0
+  logs_dir = get_logs_path()
+  trees = {}
+  def tree_of(commit):
+      if commit["id"] not in trees:
+          trees[commit["id"]] = commit["tree"] or get_commit_tree(os.path.join(logs_dir, commit["dir"]))
+      return trees[commit["id"]]
+  with metrics.span("compare"):
+      for commit in pending:
+          parent = find_commit(commit["parent"], exact=True) if commit["parent"] else None
+          parent_tree = tree_of(parent) if parent is not None else None
+          record_path_changes(db, commit["id"], diff_trees(parent_tree, tree_of(commit)), commit=False)
+  db.commit()
+  log("Indexed changed paths of older commits.", commits=len(pending))
+  return len(pending)
+
+def _path_clause(pathspecs):
+  """Builds the SQL condition that matches path_changes.path against pathspecs, like match_pathspec."""
+  clauses = []
+  params = []
+  for spec in map(_clean_pathspec, pathspecs):
+      if not spec:
+          return "1", []
+      if any(ch in spec for ch in "*?["):
+          glob = spec.replace("[!", "[^")
+          clauses.append("path GLOB ? OR path GLOB ?")
+          params += [glob, glob + "/*"]
+      else:
+          clauses.append("path = ? OR (path > ? AND path < ?)")
+          params += [spec, spec + "/", spec + "0"]
+  return " OR ".join(f"({clause})" for clause in clauses), params
+
+def iter_history(branch, since=None):
+  """Yields the commits reachable from a branch's head, newest first, reading one row at a time."""
+  import heapq
+  db = open_commit_db()
+  seen = set()
+  frontier = []
+  def push(commit_id):
+      if commit_id and commit_id not in seen:
+          seen.add(commit_id)
+          row = db.execute("SELECT * FROM commits WHERE id = ?", (commit_id,)).fetchone()
+          if row is not None:
+              heapq.heappush(frontier, (-row["seq"], row["id"], row))
+  push(read_branch_head(branch))
+  while frontier:
+      row = heapq.heappop(frontier)[2]
+      if since and row["timestamp"] < since:
+          continue
+      yield row
+      push(row["parent"])
+      push(row["merge_parent"])
+
+def in_history(commit, branch):
+  """Checks whether a commit row is reachable from a branch's head."""
+  # Parents are indexed before their children, so the walk can stop once it passes the commit's seq.
+  for row in iter_history(branch):
+      if row["seq"] <= commit["seq"]:
+          return row["seq"] == commit["seq"]
+  return False
+
+def find_commit(commit_id, branch=None, exact=False):
+  """Looks up a commit by id, or unless exact by unique id prefix, optionally only on a branch. Returns a row or None."""
+  db = open_commit_db()
+  row = db.execute("SELECT * FROM commits WHERE id = ?", (commit_id,)).fetchone()
+  if row is None and not exact:
+      rows = db.execute(
+          "SELECT * FROM commits WHERE id > ? AND id < ? ORDER BY id LIMIT 2",
+          (commit_id, commit_id + "\uffff")
+      ).fetchall()
+      if len(rows) > 1:
+          raise SimpleGitError(f"Commit ID '{commit_id}' is ambiguous: it matches {rows[0]['id']}, {rows[1]['id']} and maybe more.")
+      row = rows[0] if rows else None
+  if row is not None and branch and not in_history(row, branch):
+      return None
+  return row
+
+def set_commit_parent(commit_id, parent):
+  """Records a commit's parent in its commit_info.json and in the index, if not set yet."""
+  commit = find_commit(commit_id, exact=True)
+  if commit is None or commit["parent"]:
+      return
+  commit_path = os.path.join(get_logs_path(), commit["dir"])
+  try:
+      commit_info = load_commit_info(commit_path)
+  except (OSError, ValueError):
+      return
+  if commit_info.get("parent") is None and parent is not None:
+      commit_info["parent"] = parent
+      write_json_atomic(os.path.join(commit_path, COMMIT_INFO_FILE), commit_info)
+  db = open_commit_db()
+  db.execute("UPDATE commits SET parent = ? WHERE id = ?", (parent, commit_id))
+  db.commit()
+
+def find_commit_path(logs_dir, commit_id, branch=None):
+  """Returns the snapshot folder of a commit, or None if there is no such commit."""
+  row = find_commit(commit_id, branch)
+  return os.path.join(logs_dir, row["dir"]) if row else None
+
+def query_commits(branch, limit=None, since=None, until=None, grep=None, paths=None):
+  """Returns the commits in a branch's history newest first, filtered by date range, text and the paths they changed."""
+  db = open_commit_db()
+  if paths:
+      index_path_changes(db)
+      clause, clause_params = _path_clause(paths)
+      path_sql = f"SELECT 1 FROM path_changes WHERE commit_id = ? AND ({clause}) LIMIT 1"
+  grep = grep.lower() if grep else None
+  commits = []
+  for row in iter_history(branch, since):
+      if until and row["timestamp"] > until:
+          continue
+      if grep and grep not in row["title"].lower() and grep not in row["description"].lower():
+          continue
+      if paths and db.execute(path_sql, [row["id"]] + clause_params).fetchone() is None:
+          continue
+      commits.append(row)
+      if limit and len(commits) >= limit:
+          break
+  return commits
+
+def parse_log_date(value, end_of_range=False):
+  """Turns a --since/--until value (YYYY-MM-DD[ HH:MM[:SS]] or a commit id) into a timestamp."""
+  # A commit id, including the -N suffix of commits made in the same second, stands for its commit's time.
+  commit = find_commit(value, exact=True) if os.path.isfile(get_commit_db_path()) else None
+  if commit is not None:
+      return commit["timestamp"][:14]
+  digits = "".join(c for c in value if c.isdigit())
+  if len(digits) not in (8, 12, 14):
+      import argparse
+      raise argparse.ArgumentTypeError(f"Invalid date '{value}'. Use YYYY-MM-DD or 'YYYY-MM-DD HH:MM:SS'.")
+  padding = "235959" if end_of_range else "000000"
+  return digits + padding[len(digits) - 8:]
+
+def init_repository(args):
+  """Initializes a new local repository."""
+  repo_path = get_repo_path()
+  if os.path.exists(repo_path):
+      print("Repository already initialized.")
+      return
+  os.makedirs(get_logs_path())
+  os.makedirs(get_branches_path())
+  os.makedirs(get_tags_path())
+  os.makedirs(get_objects_path())
+  config = {
+      "logs_directory": get_logs_path(),
+      "backup_locations": [],  
+      "current_branch": MASTER_BRANCH
+  }
+  write_json_atomic(get_config_path(), config)
+  write_branch_head(MASTER_BRANCH, None)
+  log("Initialized a new SimpleGit repository.")
+  print(f"Initialized empty SimpleGit repository in {repo_path}")
+
+def load_config():
+  """Returns the repository configuration, read once per command."""
+  return current_repository().config
+
+def save_config(config):
+  """Atomically saves the repository configuration."""
+  current_repository().save_config(config)
+
+def create_commit(title, description="", jobs=1, paths=None, merge_parent=None):
+  """Snapshots the working tree as a new commit on the current branch. Returns (commit info or None, stats)."""
+  repo = current_repository()
+  if not os.path.exists(repo.repo_path):
+      raise SimpleGitError("Repository not initialized. Please run 'init' first.")
+
+  with repo.transaction() as config:
+      logs_dir = config.get("logs_directory", get_logs_path())
+      current_branch = config.get("current_branch", MASTER_BRANCH)
+      parent = read_branch_head(current_branch)
+
+      pending_merge = read_pending_merge()
+      if pending_merge is not None and pending_merge["head"] != parent:
+          clear_pending_merge()
+          pending_merge = None
+      if pending_merge is not None and merge_parent is None:
+          unresolved = [path for path in pending_merge["conflicts"] if has_conflict_markers(os.path.join(get_work_path(), path))]
+          if unresolved:
+              raise SimpleGitError("Resolve the merge conflicts in these files before committing:\n  " + "\n  ".join(unresolved))
+          merge_parent = pending_merge["commit"]
+      parent_commit = find_commit(parent, exact=True) if parent else None
+      parent_tree = get_commit_tree(os.path.join(logs_dir, parent_commit["dir"])) if parent_commit else None
+      index = load_index()
+      stats = {"files": 0, "bytes": 0, "errors": []}
+      started = time.perf_counter()
+      if paths is not None and parent_tree and not any(path.rpartition("/")[2] == IGNORE_FILE for path in paths):
+          tree_hash = update_tree(parent_tree, paths, index, stats)
+          save_index(index)
+      else:
+          tree_hash = write_tree(get_work_path(), skip={REPO_DIR}, index=index, jobs=jobs, stats=stats,
+                                 ignore=IgnoreRules(get_work_path()))
+          save_index(index, prune=True)
+      stats["elapsed"] = time.perf_counter() - started
+
+      if parent_tree == tree_hash and merge_parent is None:
+          return None, stats
+
+      timestamp = time.strftime("%Y%m%d%H%M%S")
+      unique_id = timestamp  
+      suffix = 1
+      while find_commit(unique_id, exact=True) is not None:
+          suffix += 1
+          unique_id = f"{timestamp}-{suffix}"
+      commit_title = title.replace(' ', '_')
+      commit_dir_name = f"{unique_id}_{commit_title}"
+      commit_path = os.path.join(logs_dir, commit_dir_name)
+      os.makedirs(commit_path)
+
+      commit_info = {
+          "id": unique_id,
+          "title": title,
+          "timestamp": timestamp,
+          "description": description if description else "",
+          "branch": current_branch,
+          "tree": tree_hash,
+          "parent": parent
+      }
+      if merge_parent is not None:
+          commit_info["merge_parent"] = merge_parent
+      write_json_atomic(os.path.join(commit_path, COMMIT_INFO_FILE), commit_info)
+      db = open_commit_db()
+      index_commit(db, commit_info, commit_dir_name, commit=False)
+      with metrics.span("compare"):
+          record_path_changes(db, unique_id, diff_trees(parent_tree, tree_hash))
+      write_branch_head(current_branch, unique_id)
+      if pending_merge is not None:
+          clear_pending_merge()
+  log(f"Committed changes: {commit_dir_name} on branch {current_branch}")
+  log_copy_strategies(f"Commit {unique_id}")
+  return commit_info, stats
+
+def commit_changes(args):
+  """Commits the current state of the repository."""
+  jobs = getattr(args, "jobs", None) or 1
+  commit_info, stats = create_commit(args.title, args.description, jobs, getattr(args, "paths", None))
+  if commit_info is None:
+      print("No changes detected since the last commit.")
+      return
+
+  print(f"Committed changes as '{args.title}' with ID {commit_info['id']} on branch '{commit_info['branch']}'.")
+  if stats["files"]:
+      megabytes = stats["bytes"] / (1024 * 1024)
+      elapsed = stats["elapsed"]
+      rate = max(elapsed, 1e-9)
+      summary = (f"Read {stats['files']} changed files ({megabytes:.1f} MB) in {elapsed:.2f}s "
+                 f"with {jobs} job(s): {stats['files'] / rate:.0f} files/s, {megabytes / rate:.1f} MB/s")
+      print(summary)
+      log("Commit read changed files", files=stats["files"], bytes=stats["bytes"],
+          seconds=round(elapsed, 3), jobs=jobs)
+  handle_backups(current_repository().config, commit_info["id"])
+
+def get_latest_commit_path(logs_dir, branch):
+  """Returns the snapshot folder of a branch's head commit, or None."""
+  head = read_branch_head(branch)
+  commit = find_commit(head, exact=True) if head else None
+  return os.path.join(logs_dir, commit["dir"]) if commit else None
+
+def has_changes(logs_dir, current_branch):
+  """Checks if there are changes to commit."""
+  latest_commit_path = get_latest_commit_path(logs_dir, current_branch)
+  if latest_commit_path is None:
+      return True
+  index = load_index()
+  working_tree, _ = scan_working_tree(index)
+  save_index(index, prune=True)
+  return working_tree != get_commit_tree(latest_commit_path)
+
+def handle_backups(config, commit_name):
+  """Backs up a new commit to the backup locations, raising SimpleGitError if one could not be updated."""
+  backup_locations = config.get("backup_locations", [])
+  if not backup_locations:
+      return
+  if config.get("async_backups"):
+      start_background_sync()
+      log(f"Started background backup of {commit_name}")
+      return
+  failed = sync_backups(config)
+  if failed:
+      raise SimpleGitError(f"{len(failed)} backup location(s) could not be updated; run 'backup-loc sync' to retry.")
+
+def start_background_sync():
+  """Spawns a detached 'backup-loc sync' that outlives this process."""
+  import subprocess
+  command = [sys.executable, os.path.abspath(__file__), "backup-loc", "sync", "--quiet"]
+  options = {"cwd": get_work_path(), "stdin": subprocess.DEVNULL,
+             "stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+  if os.name == "nt":
+      options["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+  else:
+      options["start_new_session"] = True
+  subprocess.Popen(command, **options)
+
+def sync_backups(config, quiet=False):
+  """Brings every backup location up to date with the local commits."""
+  backup_locations = config.get("backup_locations", [])
+  jobs = config.get("backup_jobs", DEFAULT_BACKUP_JOBS)
+  with open(os.path.join(get_repo_path(), BACKUP_LOCK_FILE), 'a+') as lock_file, metrics.span("backup"):
+      _lock_file_handle(lock_file)
+      try:
+          commits = [dict(row) for row in open_commit_db().execute("SELECT * FROM commits ORDER BY seq")]
+          # Older commits get their tree stored here, on the thread that owns the commit database.
+          for commit in commits:
+              if not commit["tree"]:
+                  commit["tree"] = get_commit_tree(os.path.join(get_logs_path(), commit["dir"]))
+          # jobs is shared between the locations, so a sync never runs more than jobs copies at once.
+          location_jobs = max(1, min(jobs, len(backup_locations)))
+          from concurrent.futures import ThreadPoolExecutor
+          with ThreadPoolExecutor(max_workers=location_jobs) as pool:
+              results = list(pool.map(lambda backup_dir: _sync_location(backup_dir, commits, max(1, jobs // location_jobs)),
+                                      backup_locations))
+      finally:
+          _unlock_file_handle(lock_file)
+  failed = []
+  for backup_dir, (copied, error) in zip(backup_locations, results):
+      if error is not None:
+          print(f"Failed to backup to {backup_dir}: {error}")
+          log(f"Error backing up to {backup_dir}: {error}")
+          failed.append(backup_dir)
+      elif copied and not quiet:
+          print(f"Backed up {copied} commit(s) to {backup_dir}")
+  log_copy_strategies("Backup")
+  return failed
+
+def read_backup_manifest(backup_dir):
+  """Returns {commit id: manifest record} for the commits a location holds."""
+  records = {}
+  try:
+      with open(os.path.join(backup_dir, BACKUP_MANIFEST_FILE), 'r') as manifest:
+          for line in manifest:
+              try:
+                  record = json.loads(line)
+              except ValueError:
+                  continue
+              records[record["id"]] = record
+  except OSError:
+      pass
+  return records
+
+def _list_backup_objects(backup_dir):
+  """Returns the set of object hashes already present at a location."""
+  objects_dir = os.path.join(backup_dir, OBJECTS_DIR)
+  have = set()
+  if not os.path.isdir(objects_dir):
+      return have
+  for prefix in os.listdir(objects_dir):
+      prefix_dir = os.path.join(objects_dir, prefix)
+      if len(prefix) == 2 and os.path.isdir(prefix_dir):
+          have.update(prefix + name for name in os.listdir(prefix_dir) if not name.startswith(".tmp_"))
+  return have
+
+def _collect_missing(tree_hash, have, blobs, trees):
+  """Finds the objects of a tree that a location lacks."""
+  if tree_hash in have:
+      return
+  have.add(tree_hash)
+  for entry in read_tree(tree_hash):
+      if entry["type"] == "tree":
+          _collect_missing(entry["hash"], have, blobs, trees)
+      elif entry["type"] == "blob" and entry["hash"] not in have:
+          have.add(entry["hash"])
+          if entry.get("chunked"):
+              for chunk_hash, _ in read_chunk_list(entry["hash"]):
+                  if chunk_hash not in have:
+                      have.add(chunk_hash)
+                      blobs.append(chunk_hash)
+              trees.append(entry["hash"])
+          else:
+              blobs.append(entry["hash"])
+  trees.append(tree_hash)
+
+def _copy_object_to(backup_dir, obj_hash):
+  """Copies one object to a location, cloning loose objects where the filesystem allows."""
+  dest = os.path.join(backup_dir, OBJECTS_DIR, obj_hash[:2], obj_hash[2:])
+  os.makedirs(os.path.dirname(dest), exist_ok=True)
+  if os.path.exists(get_object_path(obj_hash)):
+      link_or_copy_object(get_object_path(obj_hash), dest)
+      return
+  fd, tmp_path = make_temp_file(os.path.dirname(dest))
+  try:
+      with os.fdopen(fd, 'wb') as tmp_file:
+          tmp_file.write(read_object(obj_hash))
+      os.replace(tmp_path, dest)
+  except BaseException:
+      if os.path.exists(tmp_path):
+          os.remove(tmp_path)
+      raise
+
+def read_backup_state(backup_dir):
+  """Returns a location's sync state: the commit being copied and the commits done since the sync started."""
+  try:
+      with open(os.path.join(backup_dir, BACKUP_STATE_FILE), 'r') as state_file:
+          state = json.load(state_file)
+  except (OSError, ValueError):
+      return {"commit": None, "done": []}
+  state.setdefault("commit", None)
+  state.setdefault("done", [])
+  return state
+
+def _sync_location(backup_dir, commits, jobs):
+  """Copies the commits a location is missing. Returns (commits copied, error or None)."""
+  try:
+      if not os.path.exists(backup_dir):
+          os.makedirs(backup_dir)
+          log(f"Created backup directory: {backup_dir}")
+      state = read_backup_state(backup_dir)
+      if state["commit"] is not None:
+          log(f"Resuming interrupted backup to {backup_dir} at commit {state['commit']}", done=len(state["done"]))
+      else:
+          state["done"] = []
+      backed_up = read_backup_manifest(backup_dir).keys() | set(state["done"])
+      pending = [commit for commit in commits if commit["id"] not in backed_up]
+      if not pending:
+          return 0, None
+      have = _list_backup_objects(backup_dir)
+      state_path = os.path.join(backup_dir, BACKUP_STATE_FILE)
+      import shutil
+      from concurrent.futures import ThreadPoolExecutor
+      with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+          for commit in pending:
+              commit_path = os.path.join(get_logs_path(), commit["dir"])
+              tree_hash = commit["tree"]
+              blobs, trees = [], []
+              _collect_missing(tree_hash, have, blobs, trees)
+              state.update(commit=commit["id"], started=time.strftime("%Y-%m-%d %H:%M:%S"),
+                           objects=len(blobs) + len(trees))
+              write_json_atomic(state_path, state)
+              list(pool.map(lambda obj_hash: _copy_object_to(backup_dir, obj_hash), blobs))
+              for obj_hash in trees:
+                  _copy_object_to(backup_dir, obj_hash)
+              dest_commit = os.path.join(backup_dir, LOGS_DIR, commit["dir"])
+              os.makedirs(dest_commit, exist_ok=True)
+              shutil.copyfile(os.path.join(commit_path, COMMIT_INFO_FILE), os.path.join(dest_commit, COMMIT_INFO_FILE))
+              with open(os.path.join(backup_dir, BACKUP_MANIFEST_FILE), 'a') as manifest:
+                  manifest.write(json.dumps({"id": commit["id"], "dir": commit["dir"], "tree": tree_hash}) + "\n")
+                  manifest.flush()
+                  os.fsync(manifest.fileno())
+              state["done"].append(commit["id"])
+              metrics.add("backup", files=len(blobs) + len(trees))
+              log(f"Backed up commit {commit['id']} to {backup_dir}", objects=len(blobs) + len(trees))
+      write_json_atomic(state_path, {"commit": None, "done": [], "finished": time.strftime("%Y-%m-%d %H:%M:%S")})
+      return len(pending), None
+  except Exception as e:
+      return 0, e
+
+def view_logs(args):
+  """Displays the commit logs."""
+  from datetime import datetime
+  config = load_config()
+  logs_dir = config.get("logs_directory", get_logs_path())
+  current_branch = config.get("current_branch", MASTER_BRANCH)
+
+  if not os.path.exists(logs_dir):
+      print("No commits found.")
+      return
+
+  paths = getattr(args, "paths", None)
+  commits = query_commits(current_branch, args.limit, args.since, args.until, args.grep, paths)
+  if not commits:
+      print("No commits found on the current branch.")
+      return
+  changes = {}
+  if paths:
+      clause, params = _path_clause(paths)
+      marks = ", ".join("?" * len(commits))
+      for row in open_commit_db().execute(
+          f"SELECT commit_id, change, path FROM path_changes WHERE commit_id IN ({marks}) AND ({clause}) ORDER BY path",
+          [commit["id"] for commit in commits] + params
+      ):
+          changes.setdefault(row["commit_id"], []).append(f"{row['change']}: {row['path']}")
+
+  print(f"--- Commit Logs for Branch '{current_branch}' ---\n")
+  for commit_info in commits:
+      timestamp = datetime.strptime(commit_info["timestamp"][:14], "%Y%m%d%H%M%S")
+      readable_time = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+      print(f"Commit ID : {commit_info['id']}")
+      print(f"Title     : {commit_info['title']}")
+      print(f"Date      : {readable_time}")
+      if commit_info["merge_parent"]:
+          print(f"Merge     : {commit_info['parent']} {commit_info['merge_parent']}")
+      print(f"Description: {commit_info['description']}")
+      for change in changes.get(commit_info["id"], []):
+          print(f"  {change}")
+      print()
+
+def find_tree_entry(tree_hash, rel_path):
+  """Returns the entry at rel_path in a tree, reading only the trees along the way, or None."""
+  entry = {"type": "tree", "hash": tree_hash}
+  rel_path = _clean_pathspec(os.path.normpath(rel_path))
+  if not rel_path:
+      return entry
+  for name in rel_path.split("/"):
+      if entry["type"] != "tree":
+          return None
+      entry = next((child for child in read_tree(entry["hash"]) if child["name"] == name), None)
+      if entry is None:
+          return None
+  return entry
+
+def show_file(args):
+  """Prints a file as it was in a commit."""
+  config = load_config()
+  logs_dir = config.get("logs_directory", get_logs_path())
+  if args.commit:
+      commit = find_commit(args.commit)
+      if commit is None:
+          print(f"No commit found with ID '{args.commit}'.")
+          return
+  else:
+      current_branch = config.get("current_branch", MASTER_BRANCH)
+      commits = query_commits(current_branch, limit=1, paths=[os.path.normpath(args.path)])
+      if not commits:
+          print(f"No commit on branch '{current_branch}' changed '{args.path}'.")
+          return
+      commit = commits[0]
+      print(f"Last changed in {commit['id']} ({commit['title']}).", file=sys.stderr)
+  entry = find_tree_entry(get_commit_tree(os.path.join(logs_dir, commit["dir"])), args.path)
+  if entry is None:
+      print(f"'{args.path}' does not exist in commit {commit['id']}.")
+  elif entry["type"] == "tree":
+      for child in read_tree(entry["hash"]):
+          print(child["name"] + ("/" if child["type"] == "tree" else ""))
+  elif entry["type"] == "link":
+      print(entry["target"])
+  else:
+      sys.stdout.flush()
+      sys.stdout.buffer.write(read_blob(entry))
+      sys.stdout.buffer.flush()
+
+def working_trees():
+  """Returns the latest commit's tree, the working tree's and the unsaved trees that describe it."""
+  state = current_repository().working_state
+  if state is not None:
+      state.refresh()
+      return state.head_tree(), state.tree, state.trees
+  config = load_config()
+  logs_dir = config.get("logs_directory", get_logs_path())
+  latest_commit_path = get_latest_commit_path(logs_dir, config.get("current_branch", MASTER_BRANCH))
+  index = load_index()
+  working_tree, trees = scan_working_tree(index)
+  save_index(index, prune=True)
+  commit_tree = get_commit_tree(latest_commit_path) if latest_commit_path else None
+  return commit_tree, working_tree, trees
+
+def working_changes():
+  """Returns (change, path) pairs for everything that differs from the latest commit."""
+  if current_repository().working_state is not None:
+      return current_repository().working_state.working_changes()
+  commit_tree, working_tree, trees = working_trees()
+  with metrics.span("compare"):
+      changes = list(diff_trees(commit_tree, working_tree, trees))
+  metrics.add("compare", files=len(changes))
+  return changes
+
+def read_working_file(rel_path, entry):
+  """Reads a file of the working tree, or returns None if it cannot be read."""
+  try:
+      with open(os.path.join(get_work_path(), *rel_path.split("/")), 'rb') as work_file:
+          return work_file.read()
+  except OSError:
+      return None
+
+def check_status(args):
+  """Checks the status of the repository."""
+  config = load_config()
+  logs_dir = config.get("logs_directory", get_logs_path())
+  current_branch = config.get("current_branch", MASTER_BRANCH)
+
+  if not os.path.exists(logs_dir):
+      print("No commits to compare with.")
+      return
+
+  latest_commit_path = get_latest_commit_path(logs_dir, current_branch)
+  if latest_commit_path is None:
+      print("No commits on the current branch.")
+      return
+  if not os.path.exists(latest_commit_path):
+      print("Latest commit data missing.")
+      return
+
+  commit_tree, working_tree, trees = working_trees()
+  with metrics.span("compare"):
+      changes = find_renames(args, diff_tree_entries(commit_tree, working_tree, trees), read_working_file)
+      changes = [f"{change}: {describe_path(rel_path, source)}" for change, rel_path, _, _, source in changes]
+  metrics.add("compare", files=len(changes))
+
+  pending_merge = read_pending_merge()
+  if pending_merge is not None:
+      unresolved = [path for path in pending_merge["conflicts"] if has_conflict_markers(os.path.join(get_work_path(), path))]
+      print(f"Merging branch '{pending_merge['branch']}'. Commit to finish the merge, or run 'branch merge --abort'.")
+      for path in unresolved:
+          print(f"  Conflict: {path}")
+  if changes:
+      print("Changes since last commit:")
+      for change in changes:
+          print(f"  {change}")
+  else:
+      print("No changes since the last commit.")
+
+def iter_matching_entries(tree_hash, pathspecs, prefix=""):
+  """Yields (path, entry) for the files and links of a tree that match the pathspecs."""
+  for entry in read_tree(tree_hash):
+      rel_path = f"{prefix}/{entry['name']}" if prefix else entry["name"]
+      if entry["type"] == "tree":
+          if pathspec_may_match_under(rel_path, pathspecs):
+              yield from iter_matching_entries(entry["hash"], pathspecs, rel_path)
+      elif match_pathspec(rel_path, pathspecs):
+          yield rel_path, entry
+
+def restore_change(entry, dest):
+  """Returns "Added", "Modified" or "Mode changed" for how dest differs from a stored entry, or None if it matches."""
+  try:
+      st = os.stat(dest, follow_symlinks=False)
+  except (FileNotFoundError, NotADirectoryError):
+      return "Added"
+  if entry["type"] == "link":
+      return None if stat.S_ISLNK(st.st_mode) and os.readlink(dest) == entry["target"] else "Modified"
+  if not stat.S_ISREG(st.st_mode) or entry.get("size", st.st_size) != st.st_size:
+      return "Modified"
+  if store_working_file(dest, st, dry_run=True) != entry["hash"]:
+      return "Modified"
+  return "Mode changed" if stat.S_IMODE(st.st_mode) != entry["mode"] else None
+
+def restore_paths(tree_hash, pathspecs, dest_dir, dry_run=False):
+  """Writes the files of a tree that match the pathspecs into dest_dir."""
+  changes = []
+  with metrics.span("checkout"):
+      for rel_path, entry in iter_matching_entries(tree_hash, pathspecs):
+          dest = os.path.join(dest_dir, *rel_path.split("/"))
+          change = restore_change(entry, dest)
+          if change is None:
+              continue
+          changes.append((change, rel_path))
+          if dry_run:
+              continue
+          try:
+              if change != "Mode changed":
+                  os.makedirs(os.path.dirname(dest), exist_ok=True)
+                  remove_path(dest)
+                  if entry["type"] == "link":
+                      os.symlink(entry["target"], dest)
+                      continue
+                  write_blob(entry, dest)
+              os.chmod(dest, entry["mode"])
+          except Exception as e:
+              print(f"Failed to restore {dest}: {e}")
+              log(f"Error restoring {dest}: {e}")
+  metrics.add("checkout", files=len(changes))
+  return changes
+
+def pull_changes(tree_hash, index):
+  """Returns the (change, path) pairs a full pull of tree_hash would make to the working tree."""
+  working_tree, trees = scan_working_tree(index)
+  # Like _checkout_diff, pull leaves top-level items the commit does not have in place.
+  top_level = {entry["name"] for entry in read_tree(tree_hash)}
+  return [(change, rel_path) for change, rel_path in diff_trees(working_tree, tree_hash, trees)
+          if change != "Deleted" or rel_path.split("/")[0] in top_level]
+
+def pull_paths(commit_id, tree_hash, paths, dest_dir=None, dry_run=False):
+  """Restores the files matching paths from a commit, or lists them with dry_run."""
+  index = load_index() if dry_run and not paths and dest_dir is None else None
+  target = dest_dir or get_work_path()
+  with current_repository().lock():
+      if index is not None:
+          changes = pull_changes(tree_hash, index)
+          save_index(index)
+      else:
+          changes = restore_paths(tree_hash, paths, target, dry_run=True)
+      unmatched = [spec for spec in paths if next(iter_matching_entries(tree_hash, [spec]), None) is None]
+  for spec in unmatched:
+      print(f"No file in commit '{commit_id}' matches '{spec}'.")
+  if dry_run or not changes:
+      for change, rel_path in changes:
+          print(f"  {change}: {rel_path}")
+      if dry_run:
+          print(f"{len(changes)} path(s) would change." if changes else "Nothing would change.")
+      elif not unmatched:
+          print(f"Everything matching is already as it was in commit '{commit_id}'.")
+      return
+
+  if dest_dir is None:
+      try:
+          import readline  # line editing for the prompt below
+      except ImportError:
+          pass
+      confirmation = input(f"This will write {len(changes)} file(s) in the working directory. Proceed? (y/n): ")
+      if confirmation.lower() != 'y':
+          print("Pull aborted.")
+          return
+  with current_repository().lock():
+      os.makedirs(target, exist_ok=True)
+      changes = restore_paths(tree_hash, paths, target)
+  log(f"Pulled {len(changes)} path(s) from commit '{commit_id}' into {target}.")
+  log_copy_strategies(f"Pull {commit_id}")
+  print(f"Pull complete. Restored {len(changes)} file(s) from commit '{commit_id}' into {dest_dir or 'the working directory'}.")
+
+def pull_commit(args):
+  """Pulls code from a specific commit."""
+  config = load_config()
+  logs_dir = config.get("logs_directory", get_logs_path())
+  current_branch = config.get("current_branch", MASTER_BRANCH)
+
+  if not os.path.exists(logs_dir):
+      print("No commits found.")
+      return
+
+  commit = find_commit(args.commit, current_branch)
+  if commit is None:
+      print(f"No commit found with ID '{args.commit}' on branch '{current_branch}'.")
+      return
+
+  commit_id = commit["id"]
+  commit_path = os.path.join(logs_dir, commit["dir"])
+  if not os.path.exists(commit_path):
+      print(f"Commit data missing for ID '{commit_id}'.")
+      return
+
+  tree_hash = get_commit_tree(commit_path)
+  paths = getattr(args, "paths", None) or []
+  dest_dir = os.path.abspath(args.to) if getattr(args, "to", None) else None
+  if paths or dest_dir or getattr(args, "dry_run", False):
+      pull_paths(commit_id, tree_hash, paths, dest_dir, getattr(args, "dry_run", False))
+      return
+
+  print(f"Pulling code from commit '{commit_id}'...")
+  
+  try:
+      import readline  # line editing for the prompt below
+  except ImportError:
+      pass
+  confirmation = input("This will overwrite existing files in the working directory. Proceed? (y/n): ")
+  if confirmation.lower() != 'y':
+      print("Pull aborted.")
+      return
+
+  with current_repository().lock():
+      counts = checkout_working_tree(tree_hash)
+
+  log(f"Pulled commit '{commit_id}' to working directory.")
+  log_copy_strategies(f"Pull {commit_id}")
+  print(f"Pull complete. Your working directory has been updated "
+        f"({counts['written']} written, {counts['deleted']} removed, {counts['chmod']} mode changes).")
+
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ONLYDIR = 0x1000000
+IN_DONT_FOLLOW = 0x2000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_ONLYDIR | IN_DONT_FOLLOW)
+FULL_RESCAN = None
+
+class InotifyWatcher:
+  """Reports changed paths in the working tree using Linux inotify."""
+
+  def __init__(self, root):
+      import ctypes
+      import ctypes.util
+      self.root = root
+      self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+      self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+      if self._fd < 0:
+          raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+      self._get_errno = ctypes.get_errno
+      self._watches = {}
+      self.ignore = IgnoreRules(root)
+      self._add_tree(root, "")
+
+  def _add_tree(self, path, rel_path):
+      wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+      if wd < 0:
+          error = self._get_errno()
+          raise OSError(error, f"inotify_add_watch failed for {path}: {os.strerror(error)}")
+      self._watches[wd] = rel_path
+      try:
+          with os.scandir(path) as it:
+              subdirs = [item for item in it if item.is_dir(follow_symlinks=False)]
+      except OSError:
+          return
+      self.ignore.load(rel_path)
+      for item in subdirs:
+          sub_path = f"{rel_path}/{item.name}" if rel_path else item.name
+          if (not rel_path and item.name == REPO_DIR) or self.ignore.is_ignored(sub_path, True):
+              continue
+          self._add_tree(item.path, sub_path)
+
+  def wait(self, timeout):
+      """Waits up to timeout seconds and returns the set of paths that changed."""
+      import select
+      import struct
+      dirty = set()
+      ready, _, _ = select.select([self._fd], [], [], timeout)
+      if not ready:
+          return dirty
+      while True:
+          try:
+              data = os.read(self._fd, 64 * 1024)
+          except BlockingIOError:
+              break
+          offset = 0
+          while offset < len(data):
+              wd, mask, _, length = struct.unpack_from("iIII", data, offset)
+              name = os.fsdecode(data[offset + 16:offset + 16 + length].rstrip(b"\0"))
+              offset += 16 + length
+              if mask & IN_Q_OVERFLOW:
+                  dirty.add(FULL_RESCAN)
+                  continue
+              if mask & IN_IGNORED:
+                  self._watches.pop(wd, None)
+                  continue
+              rel_dir = self._watches.get(wd)
+              if rel_dir is None or not name:
+                  continue
+              rel_path = f"{rel_dir}/{name}" if rel_dir else name
+              if rel_path == REPO_DIR or rel_path.startswith(REPO_DIR + "/"):
+                  continue
+              if name == IGNORE_FILE:
+                  self.ignore = IgnoreRules(self.root)
+                  dirty.add(FULL_RESCAN)
+                  continue
+              if self.ignore.is_path_ignored(rel_path, bool(mask & IN_ISDIR)):
+                  continue
+              dirty.add(rel_path)
+              if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                  try:
+                      self._add_tree(os.path.join(self.root, rel_path), rel_path)
+                  except OSError:
+                      dirty.add(FULL_RESCAN)
+      return dirty
+
+  def close(self):
+      os.close(self._fd)
+
+class PollWatcher:
+  """Reports changed paths by comparing stat data between polls."""
+
+  def __init__(self, root, period):
+      self.root = root
+      self.period = period
+      self._snapshot = self._scan()
+
+  def _scan(self):
+      snapshot = {}
+      ignore = IgnoreRules(self.root)
+      pending = [(self.root, "")]
+      while pending:
+          dir_path, prefix = pending.pop()
+          try:
+              ignore.load(prefix)
+              with os.scandir(dir_path) as it:
+                  for item in it:
+                      if not prefix and item.name == REPO_DIR:
+                          continue
+                      rel_path = f"{prefix}/{item.name}" if prefix else item.name
+                      st = item.stat(follow_symlinks=False)
+                      if ignore.is_ignored(rel_path, stat.S_ISDIR(st.st_mode)):
+                          continue
+                      snapshot[rel_path] = (st.st_mode, st.st_size, st.st_mtime_ns, st.st_ino)
+                      if stat.S_ISDIR(st.st_mode):
+                          pending.append((item.path, rel_path))
+          except OSError:
+              continue
+      return snapshot
+
+  def wait(self, timeout):
+      """Sleeps for up to timeout seconds, then returns the set of paths whose stat data changed."""
+      time.sleep(min(timeout, self.period))
+      snapshot = self._scan()
+      old = self._snapshot
+      self._snapshot = snapshot
+      return {path for path in old.keys() | snapshot.keys() if old.get(path) != snapshot.get(path)}
+
+  def close(self):
+      pass
+
+def make_watcher(root, poll=False, period=POLL_SECONDS):
+  """Returns an inotify watcher on Linux, falling back to stat polling."""
+  if not poll and sys.platform.startswith("linux"):
+      try:
+          return InotifyWatcher(root)
+      except (OSError, AttributeError) as e:
+          log(f"inotify unavailable, falling back to polling: {e}")
+  return PollWatcher(root, period)
+
+def backup_changes(args):
+  """Automatically commits changes, at most x seconds after they happen."""
+  import argparse
+  interval = args.time
+  debounce = min(args.debounce, interval)
+  repo = current_repository()
+  watcher = make_watcher(repo.root, poll=args.poll, period=min(interval, POLL_SECONDS))
+  mode = "polling" if isinstance(watcher, PollWatcher) else "watching"
+  print(f"Starting automatic backup ({mode}), at most {interval} seconds after each change. Press Ctrl+C to stop.")
+  dirty = {FULL_RESCAN}
+  first_change = last_change = time.monotonic() - interval
+  try:
+      while True:
+          now = time.monotonic()
+          if dirty:
+              due = min(last_change + debounce, first_change + interval)
+              timeout = max(0.0, due - now)
+          else:
+              timeout = interval
+          changed = watcher.wait(timeout)
+          now = time.monotonic()
+          if changed:
+              if not dirty:
+                  first_change = now
+              last_change = now
+              dirty |= changed
+          if dirty and (now - last_change >= debounce or now - first_change >= interval):
+              repo.reload()
+              commit_args = argparse.Namespace(
+                  title=f"{args.title} {time.strftime('%Y-%m-%d %H_%M_%S')}",
+                  description=AUTOMATIC_BACKUP_DESCRIPTION,
+                  paths=None if FULL_RESCAN in dirty else dirty
+              )
+              dirty = set()
+              try:
+                  commit_changes(commit_args)
+              except SimpleGitError as e:
+                  print(e)
+              flush_log()
+  except KeyboardInterrupt:
+      print("\nBackup stopped by user.")
+      log("Automatic backup process terminated by user.")
+  finally:
+      watcher.close()
+
+class WorkingTreeState:
+  """The working tree's hashes, kept up to date in memory by 'serve'."""
+
+  def __init__(self, watcher):
+      self.watcher = watcher
+      self.rescan()
+
+  def rescan(self):
+      """Hashes the whole working tree again."""
+      self.index = load_index()
+      self.tree, self.trees = scan_working_tree(self.index)
+      self._scanned_trees = len(self.trees)
+      save_index(self.index, prune=True)
+
+  def refresh(self):
+      """Re-reads the paths that changed since the last call."""
+      dirty = self.watcher.wait(0)
+      if not dirty:
+          return
+      if (FULL_RESCAN in dirty or any(path.rpartition("/")[2] == IGNORE_FILE for path in dirty)
+              or len(self.trees) > 2 * self._scanned_trees + 1000):
+          self.rescan()
+          return
+      self.tree = update_tree(self.tree, dirty, self.index, dry_run=True, trees=self.trees)
+
+  def head_tree(self):
+      """Returns the tree of the current branch's latest commit, or None."""
+      config = load_config()
+      logs_dir = config.get("logs_directory", get_logs_path())
+      latest_commit_path = get_latest_commit_path(logs_dir, config.get("current_branch", MASTER_BRANCH))
+      return get_commit_tree(latest_commit_path) if latest_commit_path else None
+
+  def working_changes(self):
+      self.refresh()
+      return list(diff_trees(self.head_tree(), self.tree, self.trees))
+
+  def commit_paths(self):
+      """Returns the paths a commit has to re-read, or None if it needs a full walk."""
+      changes = self.working_changes()
+      if not changes and self.tree != self.head_tree():
+          return None
+      return [path for _, path in changes]
+
+def get_serve_socket_path():
+  """Returns the path of the serve socket, relative when that is shorter."""
+  path = os.path.join(get_repo_path(), SERVE_SOCKET)
+  relative = os.path.relpath(path)
+  return relative if len(relative) < len(path) else path
+
+def _read_message(conn):
+  chunks = []
+  while True:
+      data = conn.recv(64 * 1024)
+      if not data:
+          return json.loads(b"".join(chunks) or b"{}")
+      chunks.append(data)
+
+def _send_message(sock, message):
+  import socket
+  sock.sendall(json.dumps(message).encode())
+  sock.shutdown(socket.SHUT_WR)
+
+def request_server(message):
+  """Sends a request to the server of the repository in the working directory."""
+  path = get_serve_socket_path()
+  if not os.path.exists(path):
+      return None
+  import socket
+  if not hasattr(socket, "AF_UNIX"):
+      return None
+  try:
+      with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+          sock.connect(path)
+          _send_message(sock, message)
+          response = _read_message(sock)
+  except (OSError, ValueError):
+      return None
+  return response if "exit_code" in response else None
+
+def run_on_server(argv):
+  """Runs a command line on a running 'simplegit serve' and prints its output."""
+  response = request_server({"argv": argv})
+  if response is None:
+      return None
+  sys.stdout.write(response.get("stdout", ""))
+  sys.stderr.write(response.get("stderr", ""))
+  return response["exit_code"]
+
+def _serve_request(parser, request, state):
+  """Runs one client's command line with its output captured. Returns the response."""
+  from contextlib import redirect_stdout, redirect_stderr
+  stdout, stderr = io.StringIO(), io.StringIO()
+  exit_code = 0
+  with redirect_stdout(stdout), redirect_stderr(stderr):
+      try:
+          args = parse_command_line(parser, request.get("argv", []))
+          if args.command not in SERVED_COMMANDS:
+              print(f"The server does not run '{args.command}'.", file=sys.stderr)
+              exit_code = 2
+          else:
+              current_repository().reload()
+              if args.command in ("commit", "c"):
+                  args.paths = state.commit_paths()
+              run_command(args, parser)
+      except SimpleGitError as e:
+          print(e)
+          exit_code = 1
+      except SystemExit as e:
+          exit_code = e.code if isinstance(e.code, int) else int(e.code is not None)
+      except Exception as e:
+          print(f"Server error: {e}", file=sys.stderr)
+          log(f"Error serving {request.get('argv')}: {e}")
+          exit_code = 1
+  return {"stdout": stdout.getvalue(), "stderr": stderr.getvalue(), "exit_code": exit_code}
+
+def serve_repository(args):
+  """Keeps the repository's state in memory and answers commands over a Unix socket."""
+  import select
+  import socket
+  if not hasattr(socket, "AF_UNIX"):
+      print("The server needs Unix domain sockets, which this system does not have.")
+      return
+  repo = current_repository()
+  load_config()
+  path = get_serve_socket_path()
+  if args.stop:
+      response = request_server({"stop": True})
+      print(response["stdout"].rstrip() if response else "No server is running for this repository.")
+      return
+  if os.path.exists(path):
+      try:
+          with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+              probe.connect(path)
+          print("A server is already running for this repository.")
+          return
+      except OSError:
+          os.remove(path)
+
+  import signal
+  signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+  watcher = make_watcher(repo.root, poll=args.poll)
+  server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  try:
+      # Only the owner may connect: the server runs commands as its own user.
+      umask = os.umask(0o177)
+      try:
+          server.bind(path)
+      finally:
+          os.umask(umask)
+      os.chmod(path, stat.S_IRUSR | stat.S_IWUSR)
+      server.listen(16)
+      started = time.perf_counter()
+      state = WorkingTreeState(watcher)
+      repo.working_state = state
+      print(f"Serving {repo.root} (working tree loaded in {time.perf_counter() - started:.2f}s). Press Ctrl+C to stop.")
+      sys.stdout.flush()
+      log("Server started.")
+      parser = build_parser()
+      while True:
+          ready, _, _ = select.select([server], [], [], SERVE_IDLE_SECONDS)
+          if not ready:
+              state.refresh()
+              flush_log()
+              continue
+          conn, _ = server.accept()
+          with conn:
+              try:
+                  conn.settimeout(SERVE_REQUEST_TIMEOUT)
+                  request = _read_message(conn)
+                  if request.get("stop"):
+                      _send_message(conn, {"stdout": "Server stopped.\n", "exit_code": 0})
+                      break
+                  conn.settimeout(None)
+                  _send_message(conn, _serve_request(parser, request, state))
+              except (OSError, ValueError) as e:
+                  log(f"Error answering a client: {e}")
+          flush_log()
+  except KeyboardInterrupt:
+      print("\nServer stopped.")
+  finally:
+      repo.working_state = None
+      server.close()
+      if os.path.exists(path):
+          os.remove(path)
+      watcher.close()
+      log("Server stopped.")
+
+def add_backup_location(args):
+  """Adds a new backup location."""
+  backup_dir = os.path.abspath(args.location)
+  if not os.path.exists(backup_dir):
+      try:
+          os.makedirs(backup_dir)
+          print(f"Created backup directory at {backup_dir}")
+          log(f"Created backup directory at {backup_dir}")
+      except Exception as e:
+          print(f"Failed to create backup directory {backup_dir}: {e}")
+          log(f"Error creating backup directory {backup_dir}: {e}")
+          return
+  with current_repository().transaction() as config:
+      if backup_dir in config.get("backup_locations", []):
+          print("Backup location already exists.")
+          return
+      config.setdefault("backup_locations", []).append(backup_dir)
+  print(f"Added backup location: {backup_dir}")
+  log(f"Added backup location: {backup_dir}")
+
+def remove_backup_location(args):
+  """Removes an existing backup location."""
+  backup_dir = os.path.abspath(args.location)
+  with current_repository().transaction() as config:
+      if backup_dir not in config.get("backup_locations", []):
+          print("Backup location not found in configuration.")
+          return
+      config["backup_locations"].remove(backup_dir)
+  print(f"Removed backup location: {backup_dir}")
+  log(f"Removed backup location: {backup_dir}")
+
+def sync_backup_locations(args):
+  """Copies any commits the backup locations are missing, resuming interrupted backups."""
+  config = load_config()
+  if not config.get("backup_locations"):
+      if not args.quiet:
+          print("No backup locations configured.")
+      return
+  failed = sync_backups(config, quiet=args.quiet)
+  if failed:
+      raise SimpleGitError(f"{len(failed)} backup location(s) could not be updated; run 'backup-loc sync' again to retry.")
+  if not args.quiet:
+      print("Backup locations are up to date.")
+
+def set_async_backups(args):
+  """Turns background backups after each commit on or off."""
+  with current_repository().transaction() as config:
+      config["async_backups"] = args.state == "on"
+  print(f"Background backups turned {args.state}.")
+  log(f"Background backups turned {args.state}.")
+
+def list_backup_locations(args):
+  """Lists all configured backup locations."""
+  config = load_config()
+  backup_locations = config.get("backup_locations", [])
+  if not backup_locations:
+      print("No backup locations configured.")
+      return
+  print("--- Backup Locations ---")
+  for idx, loc in enumerate(backup_locations, start=1):
+      print(f"{idx}. {loc}")
+
+def get_store_size():
+  """Returns the bytes used on disk by the .simplegit folder."""
+  total = 0
+  for dir_path, _, file_names in os.walk(get_repo_path()):
+      for name in file_names:
+          try:
+              st = os.stat(os.path.join(dir_path, name), follow_symlinks=False)
+          except OSError:
+              continue
+          total += st.st_blocks * 512 if hasattr(st, "st_blocks") else st.st_size
+  return total
+
+def measure_read_latency(obj_hashes):
+  """Returns the average seconds taken to read the given objects, with caches cleared."""
+  if not obj_hashes:
+      return 0.0
+  _delta_bases.clear()
+  started = time.perf_counter()
+  for obj_hash in obj_hashes:
+      read_object(obj_hash)
+  return (time.perf_counter() - started) / len(obj_hashes)
+
+def select_pruned_backups(commits, keep_hourly, keep_daily, now):
+  """Picks the automatic backup commits a retention policy drops."""
+  from datetime import datetime
+  kept_buckets = set()
+  pruned = []
+  for commit in reversed(commits):
+      made = datetime.strptime(commit["timestamp"][:14], "%Y%m%d%H%M%S")
+      age_hours = (now - made).total_seconds() / 3600
+      if age_hours < keep_hourly:
+          bucket = ("hour", made.strftime("%Y%m%d%H"))
+      elif age_hours < keep_daily * 24:
+          bucket = ("day", made.strftime("%Y%m%d"))
+      else:
+          bucket = None
+      if bucket is not None and bucket not in kept_buckets:
+          kept_buckets.add(bucket)
+      else:
+          pruned.append(commit)
+  return list(reversed(pruned))
+
+def prune_commit(commit, logs_dir):
+  """Deletes a commit, linking its children (and merges of it) to its parent so history stays connected."""
+  db = open_commit_db()
+  parent = db.execute("SELECT parent FROM commits WHERE id = ?", (commit["id"],)).fetchone()["parent"]
+  children = db.execute("SELECT * FROM commits WHERE parent = ?", (commit["id"],)).fetchall()
+  for child in children:
+      child_path = os.path.join(logs_dir, child["dir"])
+      child_info = load_commit_info(child_path)
+      child_info["parent"] = parent
+      write_json_atomic(os.path.join(child_path, COMMIT_INFO_FILE), child_info)
+      db.execute("UPDATE commits SET parent = ? WHERE id = ?", (parent, child["id"]))
+  for child in db.execute("SELECT * FROM commits WHERE merge_parent = ?", (commit["id"],)).fetchall():
+      child_path = os.path.join(logs_dir, child["dir"])
+      child_info = load_commit_info(child_path)
+      child_info["merge_parent"] = parent
+      write_json_atomic(os.path.join(child_path, COMMIT_INFO_FILE), child_info)
+      db.execute("UPDATE commits SET merge_parent = ? WHERE id = ?", (parent, child["id"]))
+  # Children now change more relative to their new parent; they are indexed again on the next path query.
+  for commit_id in [commit["id"]] + [child["id"] for child in children]:
+      db.execute("DELETE FROM path_changes WHERE commit_id = ?", (commit_id,))
+      db.execute("UPDATE commits SET paths_indexed = 0 WHERE id = ?", (commit_id,))
+  db.execute("DELETE FROM commits WHERE id = ?", (commit["id"],))
+  db.commit()
+  import shutil
+  shutil.rmtree(os.path.join(logs_dir, commit["dir"]), ignore_errors=True)
+
+def apply_retention(config, keep_hourly, keep_daily):
+  """Prunes automatic backup commits by the retention policy. Returns how many were removed."""
+  from datetime import datetime
+  logs_dir = config.get("logs_directory", get_logs_path())
+  protected = {read_branch_head(branch) for branch in list_branches()}
+  protected.update(commit_id for _, commit_id in list_tag_refs())
+  backups = [
+      commit for commit in open_commit_db().execute(
+          "SELECT * FROM commits WHERE description = ? ORDER BY seq", (AUTOMATIC_BACKUP_DESCRIPTION,)
+      ).fetchall()
+      if commit["id"] not in protected
+  ]
+  pruned = select_pruned_backups(backups, keep_hourly, keep_daily, datetime.now())
+  for commit in pruned:
+      prune_commit(commit, logs_dir)
+      log(f"Pruned automatic backup {commit['id']}")
+  return len(pruned)
+
+def collect_pack_objects(logs_dir):
+  """Finds every object the commits reference and a delta base for changed files."""
+  order, seen, bases = [], set(), {}
+
+  def add_tree(tree_hash):
+      if tree_hash in seen:
+          return
+      seen.add(tree_hash)
+      for entry in read_tree(tree_hash):
+          if entry["type"] == "tree":
+              add_tree(entry["hash"])
+          elif entry["type"] == "blob" and entry["hash"] not in seen:
+              seen.add(entry["hash"])
+              if entry.get("chunked"):
+                  for chunk_hash, _ in read_chunk_list(entry["hash"]):
+                      if chunk_hash not in seen:
+                          seen.add(chunk_hash)
+                          order.append(chunk_hash)
+              order.append(entry["hash"])
+      order.append(tree_hash)
+
+  trees = {}
+  for commit in open_commit_db().execute("SELECT * FROM commits ORDER BY seq").fetchall():
+      tree_hash = commit["tree"] or get_commit_tree(os.path.join(logs_dir, commit["dir"]))
+      trees[commit["id"]] = tree_hash
+      parent_tree = trees.get(commit["parent"])
+      for change, _, old_entry, new_entry in diff_tree_entries(parent_tree, tree_hash):
+          if (change == "Modified" and old_entry["type"] == new_entry["type"] == "blob"
+                  and not old_entry.get("chunked") and not new_entry.get("chunked")
+                  and new_entry["hash"] not in seen and new_entry["hash"] not in bases):
+              bases[new_entry["hash"]] = old_entry["hash"]
+      add_tree(tree_hash)
+  return order, bases
+
+def write_pack(obj_hashes, bases, compression):
+  """Writes the objects into a new pack and its index. Returns (pack path, deltas used)."""
+  import struct
+  record = struct.Struct(PACK_RECORD)
+  packs_dir = get_packs_path()
+  os.makedirs(packs_dir, exist_ok=True)
+  fd, tmp_pack = make_temp_file(packs_dir, ".tmp_pack_")
+  offsets = {}
+  depths = {}
+  deltas = 0
+  try:
+      with os.fdopen(fd, 'wb') as pack_file:
+          pack_file.write(PACK_MAGIC)
+          offset = len(PACK_MAGIC)
+          for obj_hash in obj_hashes:
+              data = read_object(obj_hash)
+              kind, base, body = 0, b"\0" * 32, data
+              base_hash = bases.get(obj_hash)
+              if (base_hash in offsets and depths.get(base_hash, 0) < DELTA_MAX_DEPTH
+                      and len(data) <= DELTA_MAX_SIZE):
+                  delta = make_delta(read_object(base_hash), data)
+                  if delta is not None and len(delta) * 2 <= len(data):
+                      kind, base, body = 1, bytes.fromhex(base_hash), delta
+                      depths[obj_hash] = depths.get(base_hash, 0) + 1
+                      deltas += 1
+              codec, payload = compress_payload(body, compression)
+              pack_file.write(record.pack(kind, codec, base, len(body), len(payload)))
+              pack_file.write(payload)
+              offsets[obj_hash] = offset
+              offset += record.size + len(payload)
+          pack_file.flush()
+          os.fsync(pack_file.fileno())
+      name = "pack-" + hashlib.sha256("".join(sorted(offsets)).encode()).hexdigest()
+      pack_path = os.path.join(packs_dir, name + ".pack")
+      os.replace(tmp_pack, pack_path)
+  except BaseException:
+      if os.path.exists(tmp_pack):
+          os.remove(tmp_pack)
+      raise
+  index = bytearray(PACK_INDEX_MAGIC + struct.pack(">Q", len(offsets)))
+  for obj_hash in sorted(offsets):
+      index += struct.pack(PACK_INDEX_RECORD, bytes.fromhex(obj_hash), offsets[obj_hash])
+  fd, tmp_index = make_temp_file(packs_dir, ".tmp_pack_")
+  with os.fdopen(fd, 'wb') as index_file:
+      index_file.write(index)
+      index_file.flush()
+      os.fsync(index_file.fileno())
+  os.replace(tmp_index, pack_path[:-len(".pack")] + ".idx")
+  return pack_path, deltas
+
+def remove_loose_objects(packed):
+  """Deletes loose objects that are now packed, and unreferenced ones older than GC_GRACE_SECONDS."""
+  objects_dir = get_objects_path()
+  cutoff = time.time() - GC_GRACE_SECONDS
+  removed = 0
+  for prefix in os.listdir(objects_dir):
+      prefix_dir = os.path.join(objects_dir, prefix)
+      if not os.path.isdir(prefix_dir):
+          continue
+      for name in os.listdir(prefix_dir):
+          path = os.path.join(prefix_dir, name)
+          if prefix + name in packed or os.stat(path).st_mtime < cutoff:
+              os.remove(path)
+              removed += 1
+      if not os.listdir(prefix_dir):
+          os.rmdir(prefix_dir)
+  return removed
+
+def remove_legacy_snapshots(logs_dir):
+  """Deletes the file copies left in commit folders made before the object store. Returns how many folders were cleaned."""
+  cleaned = 0
+  for commit in open_commit_db().execute("SELECT * FROM commits").fetchall():
+      commit_path = os.path.join(logs_dir, commit["dir"])
+      try:
+          names = [name for name in os.listdir(commit_path) if name != COMMIT_INFO_FILE]
+      except OSError:
+          continue
+      if not names:
+          continue
+      get_commit_tree(commit_path)
+      for name in names:
+          remove_path(os.path.join(commit_path, name))
+      cleaned += 1
+  return cleaned
+
+def gc_repository(args):
+  """Packs the object store, prunes old automatic backups and reports what it saved."""
+  config = load_config()
+  compression = args.compression or config.get("pack_compression", DEFAULT_PACK_COMPRESSION)
+  if compression == "zstd":
+      _zstd_module()
+  retention = config.get("backup_retention", {})
+  keep_hourly = args.keep_hourly if args.keep_hourly is not None else retention.get("hourly")
+  keep_daily = args.keep_daily if args.keep_daily is not None else retention.get("daily")
+  logs_dir = config.get("logs_directory", get_logs_path())
+
+  with current_repository().lock():
+      size_before = get_store_size()
+      order, bases = collect_pack_objects(logs_dir)
+      step = max(1, len(order) // GC_LATENCY_SAMPLE)
+      sample = order[::step][:GC_LATENCY_SAMPLE]
+      latency_before = measure_read_latency(sample)
+
+      pruned = 0
+      if keep_hourly is not None or keep_daily is not None:
+          pruned = apply_retention(config, keep_hourly or 0, keep_daily or 0)
+          if pruned:
+              order, bases = collect_pack_objects(logs_dir)
+      cleaned = remove_legacy_snapshots(logs_dir)
+
+      old_packs = list_packs()
+      pack_path, deltas = write_pack(order, bases, compression)
+      _packs.clear()
+      for pack in old_packs:
+          pack.close()
+          if pack.pack_path != pack_path:
+              os.remove(pack.index_path)
+              os.remove(pack.pack_path)
+      removed = remove_loose_objects(set(order))
+
+      open_commit_db().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+      sample = [obj_hash for obj_hash in sample if has_object(obj_hash)]
+      latency_after = measure_read_latency(sample)
+      size_after = get_store_size()
+
+  reclaimed = (size_before - size_after) / (1024 * 1024)
+  print(f"Packed {len(order)} objects ({deltas} as deltas) into {os.path.basename(pack_path)} using {compression}.")
+  if pruned:
+      print(f"Pruned {pruned} automatic backup commit(s).")
+  if cleaned:
+      print(f"Removed old snapshot copies from {cleaned} commit folder(s).")
+  print(f"Removed {removed} loose object(s). Repository size: {size_before / (1024 * 1024):.1f} MB -> "
+        f"{size_after / (1024 * 1024):.1f} MB ({reclaimed:.1f} MB reclaimed).")
+  print(f"Average object read: {latency_before * 1000:.3f} ms before, {latency_after * 1000:.3f} ms after.")
+  log(f"Garbage collected: {len(order)} objects packed, {pruned} commits pruned, {reclaimed:.1f} MB reclaimed.")
+
+def _hash_object_files(paths):
+  """Hashes a batch of object files. Returns (path, hash) pairs, with None for files that cannot be read."""
+  results = []
+  for path in paths:
+      try:
+          results.append((path, hash_file(path)))
+      except OSError:
+          results.append((path, None))
+  return results
+
+def _verify_pack_records(task):
+  """Reads a run of pack records in file order and checks each object's hash."""
+  root, index_path, records = task
+  problems = []
+  with Repository(root):
+      pack = Pack(index_path)
+      try:
+          for obj_hash, offset in records:
+              try:
+                  kind, base, data = pack.read_record(offset)
+                  if kind:
+                      data = apply_delta(read_object(base), data)
+              except Exception as e:
+                  problems.append((obj_hash, f"cannot be read ({e})"))
+                  continue
+              if hashlib.sha256(data).hexdigest() != obj_hash:
+                  problems.append((obj_hash, "contents do not match the hash"))
+      finally:
+          pack.close()
+  return problems
+
+def scan_object_files(objects_dir):
+  """Lists the loose objects under an objects folder."""
+  found, leftovers = [], []
+  try:
+      prefixes = sorted(os.scandir(objects_dir), key=lambda item: item.name)
+  except FileNotFoundError:
+      return {}, leftovers
+  for prefix in prefixes:
+      if len(prefix.name) != 2 or not prefix.is_dir():
+          continue
+      for item in os.scandir(prefix.path):
+          if item.name.startswith(".tmp_"):
+              leftovers.append(item.path)
+              continue
+          st = item.stat()
+          found.append((item.inode(), prefix.name + item.name, item.path, st.st_size, st.st_mtime_ns))
+  found.sort()
+  return {obj_hash: (path, size, mtime_ns) for _, obj_hash, path, size, mtime_ns in found}, leftovers
+
+def _batch_files(files):
+  """Groups (path, size) pairs into tasks of at most VERIFY_BATCH_FILES files or VERIFY_BATCH_BYTES."""
+  batch, batch_bytes = [], 0
+  for path, size in files:
+      batch.append(path)
+      batch_bytes += size
+      if len(batch) >= VERIFY_BATCH_FILES or batch_bytes >= VERIFY_BATCH_BYTES:
+          yield batch
+          batch, batch_bytes = [], 0
+  if batch:
+      yield batch
+
+def collect_reachable(roots, load, exists):
+  """Walks commit trees down to every blob and chunk they use."""
+  reachable, missing, unreadable = set(), {}, {}
+
+  def visit(obj_hash, where, parse):
+      if obj_hash in reachable:
+          return None
+      reachable.add(obj_hash)
+      if not exists(obj_hash):
+          missing[obj_hash] = where
+          return None
+      if not parse:
+          return None
+      try:
+          return load(obj_hash)
+      except Exception:
+          unreadable[obj_hash] = where
+          return None
+
+  stack = [(tree_hash, commit_id, "") for commit_id, tree_hash in roots]
+  while stack:
+      tree_hash, commit_id, prefix = stack.pop()
+      for entry in visit(tree_hash, f"{commit_id}:{prefix or '/'}", True) or []:
+          entry_path = f"{prefix}/{entry['name']}" if prefix else entry["name"]
+          rel_path = f"{commit_id}:{entry_path}"
+          if entry["type"] == "tree":
+              stack.append((entry["hash"], commit_id, entry_path))
+          elif entry["type"] == "blob" and entry.get("chunked"):
+              chunk_list = visit(entry["hash"], rel_path, True)
+              for chunk_hash, _ in (chunk_list or {}).get("chunks", []):
+                  visit(chunk_hash, rel_path, False)
+          elif entry["type"] == "blob":
+              visit(entry["hash"], rel_path, False)
+  return reachable, missing, unreadable
+
+def _run_tasks(pool, function, tasks):
+  """Maps function over tasks on the pool, or in this process without one."""
+  if pool is None:
+      return map(function, tasks)
+  return pool.map(function, tasks)
+
+def verify_local(pool, jobs, report):
+  """Checks the repository's commits, loose objects and packs. Adds what it finds to report."""
+  logs_dir = get_logs_path()
+  commits = open_commit_db().execute("SELECT * FROM commits ORDER BY seq").fetchall()
+  roots = []
+  for commit in commits:
+      try:
+          commit_info = load_commit_info(os.path.join(logs_dir, commit["dir"]))
+      except FileNotFoundError:
+          report["missing"].append(f"{LOGS_DIR}/{commit['dir']}/{COMMIT_INFO_FILE}")
+          continue
+      except (OSError, ValueError) as e:
+          report["corrupt"].append(f"{LOGS_DIR}/{commit['dir']}/{COMMIT_INFO_FILE} ({e})")
+          continue
+      if "tree" not in commit_info:
+          continue
+      if commit["tree"] and commit_info["tree"] != commit["tree"]:
+          report["corrupt"].append(f"{LOGS_DIR}/{commit['dir']}/{COMMIT_INFO_FILE} (tree does not match the commit index)")
+      roots.append((commit["id"], commit_info["tree"]))
+  known_dirs = {commit["dir"] for commit in commits}
+  if os.path.isdir(logs_dir):
+      report["orphaned_commits"] += sum(1 for name in os.listdir(logs_dir) if name not in known_dirs)
+  report["commits"] += len(commits)
+
+  reachable, missing, unreadable = collect_reachable(roots, lambda obj_hash: json.loads(read_object(obj_hash)), has_object)
+
+  loose, leftovers = scan_object_files(get_objects_path())
+  files = [(path, size) for path, size, _ in loose.values()]
+  for results in _run_tasks(pool, _hash_object_files, list(_batch_files(files))):
+      for path, actual in results:
+          obj_hash = os.path.basename(os.path.dirname(path)) + os.path.basename(path)
+          if actual != obj_hash:
+              report["corrupt"].append(f"{os.path.relpath(path, get_repo_path())} "
+                                       f"({'cannot be read' if actual is None else 'contents do not match the hash'})")
+  report["objects"] += len(loose)
+  report["bytes"] += sum(size for _, size in files)
+
+  packed = set()
+  tasks = []
+  root = current_repository().root
+  for pack in list_packs():
+      records = sorted(((obj_hash, pack.find(obj_hash)) for obj_hash in pack.hashes()), key=lambda record: record[1])
+      packed.update(obj_hash for obj_hash, _ in records)
+      report["objects"] += len(records)
+      report["bytes"] += os.path.getsize(pack.pack_path)
+      batch_records = max(1, -(-len(records) // jobs))
+      for start in range(0, len(records), batch_records):
+          tasks.append((root, pack.index_path, records[start:start + batch_records]))
+  for problems in _run_tasks(pool, _verify_pack_records, tasks):
+      for obj_hash, problem in problems:
+          report["corrupt"].append(f"packed object {obj_hash} ({problem})")
+
+  for obj_hash, where in sorted(missing.items(), key=lambda item: item[1]):
+      report["missing"].append(f"object {obj_hash} used by {where}")
+  for obj_hash, where in sorted(unreadable.items(), key=lambda item: item[1]):
+      report["corrupt"].append(f"object {obj_hash} used by {where} (cannot be parsed)")
+  # Whatever an unreadable tree uses cannot be told apart from orphans.
+  orphans = (loose.keys() | packed) - reachable if not unreadable else set()
+  report["orphaned"] += len(orphans)
+  report["orphaned_bytes"] += sum(loose[obj_hash][1] for obj_hash in orphans if obj_hash in loose)
+  report["leftovers"] += len(leftovers)
+
+def verify_backup_location(backup_dir, pool, report, full=False):
+  """Checks a backup location on its own, without relying on the local store."""
+  location = os.path.abspath(backup_dir)
+  label = f"{backup_dir}: "
+  if not os.path.isdir(backup_dir):
+      report["missing"].append(f"{backup_dir} (backup location not found)")
+      return
+  objects_dir = os.path.join(backup_dir, OBJECTS_DIR)
+  loose, leftovers = scan_object_files(objects_dir)
+
+  def load(obj_hash):
+      with open(loose[obj_hash][0], 'rb') as obj_file:
+          return json.load(obj_file)
+
+  roots = []
+  manifest = read_backup_manifest(backup_dir)
+  for commit_id, record in manifest.items():
+      info_path = os.path.join(backup_dir, LOGS_DIR, record["dir"], COMMIT_INFO_FILE)
+      try:
+          with open(info_path, 'r') as info_file:
+              commit_info = json.load(info_file)
+      except FileNotFoundError:
+          report["missing"].append(label + os.path.relpath(info_path, backup_dir))
+      except (OSError, ValueError) as e:
+          report["corrupt"].append(f"{label}{os.path.relpath(info_path, backup_dir)} ({e})")
+      else:
+          if commit_info.get("tree") != record["tree"]:
+              report["corrupt"].append(f"{label}{os.path.relpath(info_path, backup_dir)} (tree does not match the manifest)")
+      roots.append((commit_id, record["tree"]))
+  report["commits"] += len(manifest)
+
+  reachable, missing, unreadable = collect_reachable(roots, load, lambda obj_hash: obj_hash in loose)
+
+  db = open_commit_db()
+  cached = {}
+  if not full:
+      cached = {row["hash"]: (row["size"], row["mtime_ns"])
+                for row in db.execute("SELECT hash, size, mtime_ns FROM verified_objects WHERE location = ?", (location,))}
+  files = [(path, size) for obj_hash, (path, size, mtime_ns) in loose.items() if cached.get(obj_hash) != (size, mtime_ns)]
+  verified = []
+  for results in _run_tasks(pool, _hash_object_files, list(_batch_files(files))):
+      for path, actual in results:
+          obj_hash = os.path.basename(os.path.dirname(path)) + os.path.basename(path)
+          if actual == obj_hash:
+              verified.append((location, obj_hash, loose[obj_hash][1], loose[obj_hash][2]))
+          else:
+              report["corrupt"].append(f"{label}{os.path.relpath(path, backup_dir)} "
+                                       f"({'cannot be read' if actual is None else 'contents do not match the hash'})")
+  if full:
+      db.execute("DELETE FROM verified_objects WHERE location = ?", (location,))
+  db.executemany("INSERT OR REPLACE INTO verified_objects (location, hash, size, mtime_ns) VALUES (?, ?, ?, ?)", verified)
+  db.commit()
+  report["objects"] += len(loose)
+  report["skipped"] += len(loose) - len(files)
+  report["bytes"] += sum(size for _, size in files)
+
+  for obj_hash, where in sorted(missing.items(), key=lambda item: item[1]):
+      report["missing"].append(f"{label}object {obj_hash} used by {where}")
+  for obj_hash, where in sorted(unreadable.items(), key=lambda item: item[1]):
+      report["corrupt"].append(f"{label}object {obj_hash} used by {where} (cannot be parsed)")
+  orphans = loose.keys() - reachable if not unreadable else set()
+  report["orphaned"] += len(orphans)
+  report["orphaned_bytes"] += sum(loose[obj_hash][1] for obj_hash in orphans)
+  report["leftovers"] += len(leftovers)
+
+def verify_repository(args):
+  """Checks that every stored object still matches its hash and that nothing commits need is missing."""
+  config = load_config()
+  jobs = args.jobs or os.cpu_count() or 1
+  report = {"corrupt": [], "missing": [], "orphaned": 0, "orphaned_bytes": 0, "orphaned_commits": 0,
+            "leftovers": 0, "objects": 0, "skipped": 0, "bytes": 0, "commits": 0}
+  started = time.perf_counter()
+  from concurrent.futures import ProcessPoolExecutor
+  pool = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+  try:
+      with metrics.span("verify"):
+          verify_local(pool, jobs, report)
+          if args.backups:
+              for backup_dir in config.get("backup_locations", []):
+                  verify_backup_location(backup_dir, pool, report, args.full)
+  finally:
+      if pool is not None:
+          pool.shutdown()
+  elapsed = time.perf_counter() - started
+  megabytes = report["bytes"] / (1024 * 1024)
+  metrics.add("verify", files=report["objects"] - report["skipped"], size=report["bytes"])
+
+  print(f"Checked {report['commits']} commit(s) and {report['objects']} object(s), reading {megabytes:.1f} MB "
+        f"in {elapsed:.2f}s ({megabytes / max(elapsed, 1e-9):.1f} MB/s) with {jobs} job(s).")
+  if report["skipped"]:
+      print(f"Skipped {report['skipped']} backup object(s) verified before (use --full to read them again).")
+  for problem in report["corrupt"]:
+      print(f"Corrupt: {problem}")
+  for problem in report["missing"]:
+      print(f"Missing: {problem}")
+  if report["orphaned"]:
+      print(f"Orphaned: {report['orphaned']} object(s) not used by any commit "
+            f"({report['orphaned_bytes'] / (1024 * 1024):.1f} MB). 'gc' removes them.")
+  if report["orphaned_commits"]:
+      print(f"Orphaned: {report['orphaned_commits']} folder(s) in the logs folder that are not commits.")
+  if report["leftovers"]:
+      print(f"Orphaned: {report['leftovers']} temp file(s) left by interrupted writes.")
+  log("Verified the repository.", objects=report["objects"], corrupt=len(report["corrupt"]),
+      missing=len(report["missing"]), orphaned=report["orphaned"], seconds=round(elapsed, 3))
+  if report["corrupt"] or report["missing"]:
+      raise SimpleGitError(f"Verification failed: {len(report['corrupt'])} corrupt and {len(report['missing'])} missing.")
+  print("Everything checked is intact.")
+
+def _new_objects(old_hash, new_hash, sent):
+  """Yields the hashes of the objects a tree needs that an older tree does not have."""
+  if new_hash == old_hash or new_hash in sent:
+      return
+  old = {entry["name"]: entry for entry in read_tree(old_hash)} if old_hash else {}
+  for entry in read_tree(new_hash):
+      old_entry = old.get(entry["name"])
+      if entry == old_entry:
+          continue
+      if entry["type"] == "tree":
+          old_sub = old_entry["hash"] if old_entry is not None and old_entry["type"] == "tree" else None
+          yield from _new_objects(old_sub, entry["hash"], sent)
+      elif entry["type"] == "blob" and entry["hash"] not in sent and entry["hash"] != (old_entry or {}).get("hash"):
+          if entry.get("chunked"):
+              old_chunks = set()
+              if old_entry is not None and old_entry.get("chunked"):
+                  old_chunks = {chunk_hash for chunk_hash, _ in read_chunk_list(old_entry["hash"])}
+              for chunk_hash, _ in read_chunk_list(entry["hash"]):
+                  if chunk_hash not in old_chunks and chunk_hash not in sent:
+                      sent.add(chunk_hash)
+                      yield chunk_hash
+          sent.add(entry["hash"])
+          yield entry["hash"]
+  sent.add(new_hash)
+  yield new_hash
+
+def _json_record(kind, data):
+  import struct
+  payload = json.dumps(data, separators=(',', ':')).encode()
+  return struct.pack(BUNDLE_RECORD, kind, b"\0" * 32, len(payload)) + payload
+
+def _object_record(obj_hash):
+  """Yields an object as a bundle record, streaming loose objects from disk a block at a time."""
+  import struct
+  try:
+      obj_file = open(get_object_path(obj_hash), 'rb')
+  except FileNotFoundError:
+      data = read_object(obj_hash)
+      yield struct.pack(BUNDLE_RECORD, b"O", bytes.fromhex(obj_hash), len(data))
+      yield data
+      return
+  with obj_file:
+      yield struct.pack(BUNDLE_RECORD, b"O", bytes.fromhex(obj_hash), os.fstat(obj_file.fileno()).st_size)
+      yield from iter(lambda: obj_file.read(BUNDLE_BLOCK_SIZE), b'')
+
+def iter_bundle_records(commits, since, counts):
+  """Yields the uncompressed bundle for commits, oldest first."""
+  yield _json_record(b"H", {"version": 1, "requires": since, "commits": len(commits)})
+  logs_dir = get_logs_path()
+  sent = set()
+  for commit in commits:
+      commit_path = os.path.join(logs_dir, commit["dir"])
+      tree_hash = commit["tree"] or get_commit_tree(commit_path)
+      parent = find_commit(commit["parent"], exact=True) if commit["parent"] else None
+      parent_tree = None
+      if parent is not None:
+          parent_tree = parent["tree"] or get_commit_tree(os.path.join(logs_dir, parent["dir"]))
+      for obj_hash in _new_objects(parent_tree, tree_hash, sent):
+          counts["objects"] += 1
+          yield from _object_record(obj_hash)
+      counts["commits"] += 1
+      yield _json_record(b"C", {"dir": commit["dir"], "info": load_commit_info(commit_path)})
+  commit_ids = {commit["id"] for commit in commits}
+  heads = {branch: read_branch_head(branch) for branch in list_branches()}
+  yield _json_record(b"R", {
+      "branches": {branch: head for branch, head in heads.items() if head in commit_ids},
+      "tags": {tag: commit_id for tag, commit_id in list_tag_refs() if commit_id in commit_ids}
+  })
+  import struct
+  yield struct.pack(BUNDLE_RECORD, b"E", b"\0" * 32, 0)
+
+def compress_stream(blocks, codec):
+  """Compresses a stream of byte blocks as it goes, yielding the compressed blocks."""
+  if codec == 0:
+      yield from blocks
+      return
+  if codec == 2:
+      import lzma
+      compressor = lzma.LZMACompressor(preset=6)
+  else:
+      import zlib
+      compressor = zlib.compressobj(6)
+  for block in blocks:
+      out = compressor.compress(block)
+      if out:
+          yield out
+  yield compressor.flush()
+
+def decompress_stream(bundle_file, codec):
+  """Yields the decompressed contents of a bundle file in blocks of at most BUNDLE_BLOCK_SIZE."""
+  read_block = lambda: bundle_file.read(BUNDLE_BLOCK_SIZE)
+  if codec == 0:
+      yield from iter(read_block, b'')
+      return
+  if codec == 2:
+      import lzma
+      decompressor = lzma.LZMADecompressor()
+  else:
+      import zlib
+      decompressor = zlib.decompressobj()
+  for data in iter(read_block, b''):
+      while True:
+          out = decompressor.decompress(data, BUNDLE_BLOCK_SIZE)
+          if out:
+              yield out
+          if codec == 2:
+              data = b""
+              if decompressor.needs_input or decompressor.eof:
+                  break
+          else:
+              data = decompressor.unconsumed_tail
+              if not data and len(out) < BUNDLE_BLOCK_SIZE:
+                  break
+  if codec == 1:
+      yield decompressor.flush()
+
+class BundleReader:
+  """Reads records from a stream of decompressed blocks, holding about a block in memory."""
+
+  def __init__(self, blocks):
+      import struct
+      self._blocks = blocks
+      self._record = struct.Struct(BUNDLE_RECORD)
+      self._buffer = b""
+
+  def _fill(self):
+      block = next(self._blocks, None)
+      if block is None:
+          raise SimpleGitError("The bundle is truncated.")
+      self._buffer += block
+
+  def read(self, size):
+      """Returns the next size bytes, raising SimpleGitError if the bundle ends first."""
+      while len(self._buffer) < size:
+          self._fill()
+      data, self._buffer = self._buffer[:size], self._buffer[size:]
+      return data
+
+  def read_blocks(self, size):
+      """Yields the next size bytes in the blocks they were decompressed in."""
+      while size:
+          if not self._buffer:
+              self._fill()
+              continue
+          data, self._buffer = self._buffer[:size], self._buffer[size:]
+          size -= len(data)
+          yield data
+
+  def read_record(self):
+      """Returns (kind, object hash, length) of the next record."""
+      kind, obj_hash, length = self._record.unpack(self.read(self._record.size))
+      return kind, obj_hash.hex(), length
+
+  def read_json(self, length):
+      return json.loads(self.read(length))
+
+def receive_object(obj_hash, blocks):
+  """Streams an object into the store through a temp file, checking it against its hash."""
+  fd, tmp_path = _new_object_temp(obj_hash)
+  try:
+      digest = hashlib.sha256()
+      with os.fdopen(fd, 'wb') as tmp_file:
+          for block in blocks:
+              digest.update(block)
+              tmp_file.write(block)
+      if digest.hexdigest() != obj_hash:
+          raise SimpleGitError(f"The bundle is damaged: object {obj_hash} does not match its hash.")
+      os.replace(tmp_path, get_object_path(obj_hash))
+  except BaseException:
+      if os.path.exists(tmp_path):
+          os.remove(tmp_path)
+      raise
+
+def create_bundle(args):
+  """Writes commits and the objects they need into one compressed file."""
+  since = None
+  if args.since:
+      since_commit = find_commit(args.since)
+      if since_commit is None:
+          print(f"No commit found with ID '{args.since}'.")
+          return
+      since = since_commit["id"]
+  codec = BUNDLE_CODECS[args.compression]
+  counts = {"commits": 0, "objects": 0}
+  with current_repository().lock():
+      db = open_commit_db()
+      if since is None:
+          commits = db.execute("SELECT * FROM commits ORDER BY seq").fetchall()
+      else:
+          commits = db.execute("SELECT * FROM commits WHERE seq > ? ORDER BY seq", (since_commit["seq"],)).fetchall()
+      if not commits:
+          print("No commits to bundle.")
+          return
+      dest_dir = os.path.dirname(os.path.abspath(args.file))
+      fd, tmp_path = make_temp_file(dest_dir, ".tmp_bundle_")
+      try:
+          with os.fdopen(fd, 'wb') as bundle_file, metrics.span("copy"):
+              bundle_file.write(BUNDLE_MAGIC + bytes([codec]))
+              for block in compress_stream(iter_bundle_records(commits, since, counts), codec):
+                  bundle_file.write(block)
+          os.replace(tmp_path, args.file)
+      except BaseException:
+          if os.path.exists(tmp_path):
+              os.remove(tmp_path)
+          raise
+  metrics.add("copy", files=counts["objects"], size=os.path.getsize(args.file))
+  size = os.path.getsize(args.file) / (1024 * 1024)
+  print(f"Bundled {counts['commits']} commit(s) and {counts['objects']} object(s) into {args.file} ({size:.1f} MB).")
+  if since is not None:
+      print(f"Import it into a repository that already has commit {since}.")
+  log(f"Created bundle {args.file}", commits=counts["commits"], objects=counts["objects"], since=since)
+
+def _import_refs(refs):
+  """Points branches and tags at imported commits, fast-forwarding branches that have not diverged."""
+  for branch, head in sorted(refs.get("branches", {}).items()):
+      local = read_branch_head(branch)
+      if local == head:
+          continue
+      if local is None or find_merge_base(local, head) == local:
+          write_branch_head(branch, head)
+          print(f"Branch '{branch}' is now at {head}.")
+          if branch == load_config().get("current_branch", MASTER_BRANCH):
+              print(f"Your files are unchanged. Run 'pull -c {head}' to bring them up to date.")
+      else:
+          write_branch_head(f"{branch}-bundle", head)
+          print(f"Branch '{branch}' has diverged from the bundle. Its version was saved as '{branch}-bundle'; "
+                f"merge it with 'branch merge {branch}-bundle'.")
+  for tag, commit_id in sorted(refs.get("tags", {}).items()):
+      existing = read_tag(tag)
+      if existing is None:
+          write_tag(tag, commit_id)
+      elif existing != commit_id:
+          print(f"Tag '{tag}' already points at {existing}; kept it.")
+
+def import_bundle(args):
+  """Adds the commits and objects of a bundle to this repository."""
+  try:
+      bundle_file = open(args.file, 'rb')
+  except OSError as e:
+      print(f"Cannot open bundle {args.file}: {e}")
+      return
+  counts = {"commits": 0, "objects": 0, "skipped": 0, "bytes": 0}
+  last_commit_path = None
+  with bundle_file, current_repository().lock():
+      prefix = bundle_file.read(len(BUNDLE_MAGIC) + 1)
+      if len(prefix) <= len(BUNDLE_MAGIC) or not prefix.startswith(BUNDLE_MAGIC) or prefix[-1] not in BUNDLE_CODECS.values():
+          raise SimpleGitError(f"{args.file} is not a SimpleGit bundle.")
+      reader = BundleReader(decompress_stream(bundle_file, prefix[-1]))
+      kind, _, length = reader.read_record()
+      header = reader.read_json(length)
+      if kind != b"H" or header.get("version") != 1:
+          raise SimpleGitError(f"{args.file} was made by a newer SimpleGit.")
+      if header["requires"] and find_commit(header["requires"], exact=True) is None:
+          raise SimpleGitError(f"This bundle continues from commit {header['requires']}, which this repository "
+                               "does not have. Import the bundle with the earlier commits first.")
+      logs_dir = get_logs_path()
+      db = open_commit_db()
+      with metrics.span("copy"):
+          while True:
+              kind, obj_hash, length = reader.read_record()
+              if kind == b"O":
+                  if has_object(obj_hash):
+                      counts["skipped"] += 1
+                      for _ in reader.read_blocks(length):
+                          pass
+                  else:
+                      receive_object(obj_hash, reader.read_blocks(length))
+                      counts["objects"] += 1
+                      counts["bytes"] += length
+              elif kind == b"C":
+                  record = reader.read_json(length)
+                  commit_info = record["info"]
+                  if find_commit(commit_info["id"], exact=True) is not None:
+                      continue
+                  last_commit_path = os.path.join(logs_dir, record["dir"])
+                  os.makedirs(last_commit_path, exist_ok=True)
+                  write_json_atomic(os.path.join(last_commit_path, COMMIT_INFO_FILE), commit_info)
+                  index_commit(db, commit_info, record["dir"])
+                  counts["commits"] += 1
+              elif kind == b"R":
+                  _import_refs(reader.read_json(length))
+              elif kind == b"E":
+                  break
+              else:
+                  raise SimpleGitError(f"{args.file} is damaged: unknown record {kind!r}.")
+  metrics.add("copy", files=counts["objects"], size=counts["bytes"])
+  print(f"Imported {counts['commits']} commit(s) and {counts['objects']} object(s) "
+        f"({counts['bytes'] / (1024 * 1024):.1f} MB); {counts['skipped']} object(s) were already here.")
+  log(f"Imported bundle {args.file}", commits=counts["commits"], objects=counts["objects"], skipped=counts["skipped"])
+  if last_commit_path is not None:
+      handle_backups(current_repository().config, os.path.basename(last_commit_path))
+
+def branch_init(args):
+  """Creates a new branch starting at the current branch's latest commit."""
+  branch_name = args.name
+  with current_repository().lock():
+      if branch_exists(branch_name):
+          print(f"Branch '{branch_name}' already exists.")
+          return
+      write_branch_head(branch_name, read_branch_head(load_config().get("current_branch", MASTER_BRANCH)))
+  print(f"Created new branch '{branch_name}'.")
+  log(f"Created new branch '{branch_name}'.")
+
+def branch_switch(args):
+  """Switches to an existing branch."""
+  branch_name = args.name
+  with current_repository().transaction() as config:
+      if not branch_exists(branch_name):
+          print(f"Branch '{branch_name}' does not exist.")
+          return
+      config["current_branch"] = branch_name
+  print(f"Switched to branch '{branch_name}'.")
+  log(f"Switched to branch '{branch_name}'.")
+
+def view_branches(args):
+  """Lists all branches."""
+  config = load_config()
+  current_branch = config.get("current_branch", MASTER_BRANCH)
+  print("--- Branches ---")
+  for branch in list_branches():
+      if branch == current_branch:
+          print(f"* {branch}")
+      else:
+          print(f"  {branch}")
+
+def _myers_matches(a, b, alo, ahi, blo, bhi, matches):
+  """Appends the matching line pairs of a shortest edit script for a[alo:ahi] and b[blo:bhi]."""
+  n, m = ahi - alo, bhi - blo
+  max_cost = min(n + m, DIFF_MAX_EDIT_COST)
+  offset = max_cost + 1
+  v = [0] * (2 * max_cost + 3)
+  trace = []
+  for d in range(max_cost + 1):
+      trace.append(v[offset - d - 1:offset + d + 2])
+      for k in range(-d, d + 1, 2):
+          if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+              x = v[offset + k + 1]
+          else:
+              x = v[offset + k - 1] + 1
+          y = x - k
+          while x < n and y < m and a[alo + x] == b[blo + y]:
+              x += 1
+              y += 1
+          v[offset + k] = x
+          if x >= n and y >= m:
+              found = []
+              for step in range(d, 0, -1):
+                  previous = trace[step]
+                  k = x - y
+                  if k == -step or (k != step and previous[k - 1 + step + 1] < previous[k + 1 + step + 1]):
+                      prev_k = k + 1
+                  else:
+                      prev_k = k - 1
+                  prev_x = previous[prev_k + step + 1]
+                  prev_y = prev_x - prev_k
+                  while x > prev_x and y > prev_y:
+                      x -= 1
+                      y -= 1
+                      found.append((alo + x, blo + y))
+                  x, y = prev_x, prev_y
+              while x > 0 and y > 0:
+                  x -= 1
+                  y -= 1
+                  found.append((alo + x, blo + y))
+              matches.extend(reversed(found))
+              return True
+  return False
+
+def _match_lines(a, b, alo, ahi, blo, bhi, matches):
+  """Appends matching (i, j) line pairs for a[alo:ahi] and b[blo:bhi], in order."""
+  import bisect
+  while alo < ahi and blo < bhi and a[alo] == b[blo]:
+      matches.append((alo, blo))
+      alo += 1
+      blo += 1
+  suffix = 0
+  while ahi - suffix > alo and bhi - suffix > blo and a[ahi - suffix - 1] == b[bhi - suffix - 1]:
+      suffix += 1
+  if alo < ahi - suffix and blo < bhi - suffix:
+      seen = {}
+      for i in range(alo, ahi - suffix):
+          seen[a[i]] = -1 if a[i] in seen else i
+      in_b = {}
+      for j in range(blo, bhi - suffix):
+          if seen.get(b[j], -1) >= 0:
+              in_b[b[j]] = -1 if b[j] in in_b else j
+      anchors = sorted((seen[line], j) for line, j in in_b.items() if j >= 0)
+      # Longest run of anchors that is increasing on both sides.
+      tails, tail_at, links = [], [], []
+      for position, (i, j) in enumerate(anchors):
+          slot = bisect.bisect_left(tails, j)
+          links.append(tail_at[slot - 1] if slot else -1)
+          if slot == len(tails):
+              tails.append(j)
+              tail_at.append(position)
+          else:
+              tails[slot] = j
+              tail_at[slot] = position
+      chain = []
+      position = tail_at[-1] if tail_at else -1
+      while position >= 0:
+          chain.append(anchors[position])
+          position = links[position]
+      if chain:
+          i0, j0 = alo, blo
+          for i, j in reversed(chain):
+              if i0 < i and j0 < j:
+                  _match_lines(a, b, i0, i, j0, j, matches)
+              matches.append((i, j))
+              i0, j0 = i + 1, j + 1
+          _match_lines(a, b, i0, ahi - suffix, j0, bhi - suffix, matches)
+      else:
+          _myers_matches(a, b, alo, ahi - suffix, blo, bhi - suffix, matches)
+  for offset in range(suffix, 0, -1):
+      matches.append((ahi - offset, bhi - offset))
+
+def diff_lines(a, b):
+  """Returns difflib-style opcodes (tag, i1, i2, j1, j2) turning line list a into b."""
+  n, m = len(a), len(b)
+  prefix = 0
+  while prefix < n and prefix < m and a[prefix] == b[prefix]:
+      prefix += 1
+  suffix = 0
+  while suffix < n - prefix and suffix < m - prefix and a[n - suffix - 1] == b[m - suffix - 1]:
+      suffix += 1
+  ids = {}
+  a_ids = [ids.setdefault(line, len(ids)) for line in a[prefix:n - suffix]]
+  b_ids = [ids.setdefault(line, len(ids)) for line in b[prefix:m - suffix]]
+  matches = []
+  _match_lines(a_ids, b_ids, 0, len(a_ids), 0, len(b_ids), matches)
+  opcodes = [("equal", 0, prefix, 0, prefix)] if prefix else []
+  i = j = 0
+  for mi, mj in matches + [(len(a_ids), len(b_ids))]:
+      if i < mi or j < mj:
+          tag = "replace" if i < mi and j < mj else "delete" if i < mi else "insert"
+          opcodes.append((tag, prefix + i, prefix + mi, prefix + j, prefix + mj))
+      if mi < len(a_ids):
+          if opcodes and opcodes[-1][0] == "equal":
+              opcodes[-1] = ("equal", opcodes[-1][1], prefix + mi + 1, opcodes[-1][3], prefix + mj + 1)
+          else:
+              opcodes.append(("equal", prefix + mi, prefix + mi + 1, prefix + mj, prefix + mj + 1))
+      i, j = mi + 1, mj + 1
+  if suffix:
+      if opcodes and opcodes[-1][0] == "equal":
+          opcodes[-1] = ("equal", opcodes[-1][1], n, opcodes[-1][3], m)
+      else:
+          opcodes.append(("equal", n - suffix, n, m - suffix, m))
+  return opcodes
+
+def _group_opcodes(opcodes, context):
+  """Splits opcodes into hunks with context lines around each change."""
+  if not opcodes:
+      return
+  codes = list(opcodes)
+  if codes[0][0] == "equal":
+      tag, i1, i2, j1, j2 = codes[0]
+      codes[0] = tag, max(i1, i2 - context), i2, max(j1, j2 - context), j2
+  if codes[-1][0] == "equal":
+      tag, i1, i2, j1, j2 = codes[-1]
+      codes[-1] = tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)
+  group = []
+  for tag, i1, i2, j1, j2 in codes:
+      if tag == "equal" and i2 - i1 > 2 * context:
+          group.append((tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)))
+          yield group
+          group = []
+          i1, j1 = max(i1, i2 - context), max(j1, j2 - context)
+      group.append((tag, i1, i2, j1, j2))
+  if group and not (len(group) == 1 and group[0][0] == "equal"):
+      yield group
+
+def _format_range(start, stop):
+  length = stop - start
+  if length == 1:
+      return str(start + 1)
+  return f"{start + 1 if length else start},{length}"
+
+def _diff_line(prefix, line):
+  text = line.decode(errors="replace")
+  if text.endswith("\n"):
+      return [prefix + text[:-1]]
+  return [prefix + text, "\\ No newline at end of file"]
+
+def unified_diff(a, b, fromfile, tofile, context=DIFF_CONTEXT_LINES):
+  """Returns the unified diff of two lists of byte lines as a list of output lines."""
+  output = []
+  for group in _group_opcodes(diff_lines(a, b), context):
+      if not output:
+          output += [f"--- {fromfile}", f"+++ {tofile}"]
+      first, last = group[0], group[-1]
+      output.append(f"@@ -{_format_range(first[1], last[2])} +{_format_range(first[3], last[4])} @@")
+      for tag, i1, i2, j1, j2 in group:
+          if tag == "equal":
+              for line in a[i1:i2]:
+                  output += _diff_line(" ", line)
+              continue
+          for line in a[i1:i2]:
+              output += _diff_line("-", line)
+          for line in b[j1:j2]:
+              output += _diff_line("+", line)
+  return output
+
+def is_binary(data):
+  """Guesses whether file contents are binary by looking for a NUL byte near the start."""
+  return b"\0" in data[:DIFF_BINARY_PROBE]
+
+def diff_file(task):
+  """Diffs one changed file. Returns (output lines, lines added, lines removed, binary)."""
+  root, rel_path, old_entry, new_entry, fromfile, tofile, stat_only = task
+  with Repository(root):
+      if (old_entry or {}).get("chunked") or (new_entry or {}).get("chunked"):
+          return _diff_chunked_file(old_entry, new_entry, fromfile, tofile)
+      old_data = read_blob(old_entry) if old_entry and old_entry["type"] == "blob" else None
+      new_data = read_blob(new_entry) if new_entry and new_entry["type"] == "blob" else None
+  if (old_data is not None and is_binary(old_data)) or (new_data is not None and is_binary(new_data)):
+      return [f"Binary files {fromfile} and {tofile} differ"], 0, 0, True
+  a = old_data.splitlines(keepends=True) if old_data is not None else []
+  b = new_data.splitlines(keepends=True) if new_data is not None else []
+  if old_data is None or new_data is None:
+      return [], len(b), len(a), False
+  if stat_only:
+      added = removed = 0
+      for tag, i1, i2, j1, j2 in diff_lines(a, b):
+          if tag != "equal":
+              removed += i2 - i1
+              added += j2 - j1
+      return [], added, removed, False
+  output = unified_diff(a, b, fromfile, tofile)
+  added = sum(1 for line in output if line.startswith("+")) - (1 if output else 0)
+  removed = sum(1 for line in output if line.startswith("-")) - (1 if output else 0)
+  return output, added, removed, False
+
+def _diff_chunked_file(old_entry, new_entry, fromfile, tofile):
+  """Compares large files by their chunk lists instead of reading them."""
+  old_chunks = read_chunk_list(old_entry["hash"]) if old_entry and old_entry.get("chunked") else []
+  new_chunks = read_chunk_list(new_entry["hash"]) if new_entry and new_entry.get("chunked") else []
+  if not old_entry or not new_entry or not old_entry.get("chunked") or not new_entry.get("chunked"):
+      return [f"Large files {fromfile} and {tofile} differ"], 0, 0, True
+  old_hashes = {chunk_hash for chunk_hash, _ in old_chunks}
+  changed = [length for chunk_hash, length in new_chunks if chunk_hash not in old_hashes]
+  megabytes = sum(changed) / (1024 * 1024)
+  return [f"Large files {fromfile} and {tofile} differ: {len(changed)} of {len(new_chunks)} chunks "
+          f"changed ({megabytes:.1f} MB)"], 0, 0, True
+
+def _describe_change(change, rel_path, old_entry, new_entry, commit2, source=None):
+  """Returns the message shown for a change whose contents are not diffed line by line."""
+  if change == "Renamed":
+      alike = f" ({source[1]}% alike)" if source[1] < 100 else ""
+      return f"File '{source[0]}' renamed to '{rel_path}' in commit '{commit2}'{alike}."
+  if change == "Copied":
+      return f"File '{rel_path}' copied from '{source[0]}' in commit '{commit2}'."
+  if change == "Added":
+      return f"File '{rel_path}' added in commit '{commit2}'."
+  if change == "Deleted":
+      return f"File '{rel_path}' removed in commit '{commit2}'."
+  if old_entry["type"] == "link" and new_entry["type"] == "link":
+      return f"Link '{rel_path}' changed from '{old_entry['target']}' to '{new_entry['target']}'."
+  if old_entry["type"] != new_entry["type"]:
+      return f"'{rel_path}' changed from a {old_entry['type']} to a {new_entry['type']}."
+  if old_entry["hash"] == new_entry["hash"]:
+      return f"Mode of '{rel_path}' changed from {old_entry['mode']:o} to {new_entry['mode']:o}."
+  return None
+
+def _print_diff_stat(rows):
+  """Prints a per-file summary of lines added and removed."""
+  if not rows:
+      return
+  width = max(len(rel_path) for rel_path, _, _, _ in rows)
+  biggest = max(added + removed for _, added, removed, _ in rows) or 1
+  scale = min(1.0, 50 / biggest)
+  total_added = total_removed = 0
+  for rel_path, added, removed, binary in rows:
+      total_added += added
+      total_removed += removed
+      if binary:
+          print(f" {rel_path.ljust(width)} | Bin")
+          continue
+      bar = "+" * int(round(added * scale)) + "-" * int(round(removed * scale))
+      print(f" {rel_path.ljust(width)} | {added + removed:>5} {bar}")
+  print(f" {len(rows)} file(s) changed, {total_added} insertion(s)(+), {total_removed} deletion(s)(-)")
+
+def diff_commits(args):
+  """Shows differences between two commits."""
+  config = load_config()
+  logs_dir = config.get("logs_directory", get_logs_path())
+  commit1 = args.commit1
+  commit2 = args.commit2
+
+  path1 = find_commit_path(logs_dir, commit1)
+  path2 = find_commit_path(logs_dir, commit2)
+  if path1 is None:
+      print(f"No commit found with ID '{commit1}'.")
+      return
+  if path2 is None:
+      print(f"No commit found with ID '{commit2}'.")
+      return
+
+  with metrics.span("compare"):
+      changes = find_renames(args, diff_tree_entries(get_commit_tree(path1), get_commit_tree(path2), pathspecs=args.paths))
+  metrics.add("compare", files=len(changes))
+  if args.name_only:
+      for _, rel_path, _, _, _ in changes:
+          print(rel_path)
+      return
+
+  root = current_repository().root
+  items, tasks = [], []
+  for change, rel_path, old_entry, new_entry, source in changes:
+      old_path = source[0] if source else rel_path
+      message = _describe_change(change, rel_path, old_entry, new_entry, commit2, source)
+      if source is not None:
+          needs_read = old_entry["hash"] != new_entry["hash"]
+      else:
+          needs_read = message is None or (args.stat and (old_entry or new_entry)["type"] == "blob")
+      label = rel_path if source is None else f"{old_path} => {rel_path}"
+      items.append((label, message, needs_read))
+      if needs_read:
+          tasks.append((root, rel_path, old_entry, new_entry, f"{commit1}/{old_path}", f"{commit2}/{rel_path}", args.stat))
+
+  jobs = args.jobs or os.cpu_count() or 1
+  if jobs > 1 and len(tasks) >= DIFF_POOL_MIN_FILES:
+      from concurrent.futures import ProcessPoolExecutor
+      pool = ProcessPoolExecutor(max_workers=jobs)
+      results = pool.map(diff_file, tasks, chunksize=8)
+  else:
+      pool = None
+      results = map(diff_file, tasks)
+  diff_bytes = sum(entry.get("size", 0) for task in tasks for entry in task[2:4] if entry)
+  diff_start = time.perf_counter()
+  try:
+      rows = []
+      for rel_path, message, needs_read in items:
+          output, added, removed, binary = next(results) if needs_read else ([], 0, 0, False)
+          rows.append((rel_path, added, removed, binary))
+          if args.stat:
+              continue
+          if message is not None:
+              print(message)
+          for line in output:
+              print(line)
+      if args.stat:
+          _print_diff_stat(rows)
+  finally:
+      if pool is not None:
+          pool.shutdown()
+      metrics.add("diff", time.perf_counter() - diff_start, 1, len(tasks), diff_bytes)
+
+def tag_commit(args):
+  """Tags a specific commit."""
+  commit_id = args.commit
+  tag_name = args.tag
+
+  commit = find_commit(commit_id)
+  if commit is None:
+      print(f"No commit found with ID '{commit_id}'.")
+      return
+  # Tags hold the full id: gc and bundles compare them with commit ids as they are.
+  commit_id = commit["id"]
+
+  with current_repository().lock():
+      if read_tag(tag_name) is not None:
+          print(f"Tag '{tag_name}' already exists.")
+          return
+      write_tag(tag_name, commit_id)
+
+  print(f"Tagged commit '{commit_id}' as '{tag_name}'.")
+  log(f"Tagged commit '{commit_id}' as '{tag_name}'.")
+
+def list_tags(args):
+  """Lists all tags."""
+  load_config()
+  tags = list_tag_refs()
+  if not tags:
+      print("No tags have been created.")
+      return
+  print("--- Tags ---")
+  for tag, commit in tags:
+      print(f"{tag}: {commit}")
+
+def read_pending_merge():
+  """Returns the state of a merge waiting for its conflicts to be resolved, or None."""
+  try:
+      with open(os.path.join(get_repo_path(), MERGE_FILE), 'r') as merge_file:
+          return json.load(merge_file)
+  except (OSError, ValueError):
+      return None
+
+def clear_pending_merge():
+  """Forgets a pending merge."""
+  try:
+      os.remove(os.path.join(get_repo_path(), MERGE_FILE))
+  except FileNotFoundError:
+      pass
+
+def has_conflict_markers(path):
+  """Checks whether a file still holds the conflict markers a merge wrote into it."""
+  try:
+      with open(path, 'rb') as f:
+          data = f.read()
+  except OSError:
+      return False
+  starts = (b"<" * CONFLICT_MARKER_SIZE + b" ", b">" * CONFLICT_MARKER_SIZE + b" ")
+  return any(line.startswith(starts) for line in data.splitlines())
+
+def commit_parents(commit_id):
+  """Returns the ids of a commit's parents."""
+  commit = find_commit(commit_id, exact=True)
+  if commit is None:
+      return []
+  return [parent for parent in (commit["parent"], commit["merge_parent"]) if parent]
+
+def find_merge_base(ours, theirs):
+  """Returns the closest commit that both commits descend from, or None."""
+  theirs_ancestors = set()
+  pending = [theirs]
+  while pending:
+      commit_id = pending.pop()
+      if commit_id not in theirs_ancestors:
+          theirs_ancestors.add(commit_id)
+          pending.extend(commit_parents(commit_id))
+  queue = [ours]
+  seen = {ours}
+  for commit_id in queue:
+      if commit_id in theirs_ancestors:
+          return commit_id
+      for parent in commit_parents(commit_id):
+          if parent not in seen:
+              seen.add(parent)
+              queue.append(parent)
+  return None
+
+def _matching_blocks(a, b):
+  """Returns (a start, b start, length) for the runs of equal lines diff_lines finds."""
+  return [(i1, j1, i2 - i1) for tag, i1, i2, j1, j2 in diff_lines(a, b) if tag == "equal" and i2 > i1]
+
+def _sync_regions(base, ours, theirs):
+  """Yields the regions of base that neither side changed, as (base, ours, theirs) start and end pairs."""
+  ours_blocks = _matching_blocks(base, ours)
+  theirs_blocks = _matching_blocks(base, theirs)
+  i = j = 0
+  while i < len(ours_blocks) and j < len(theirs_blocks):
+      ours_base, ours_start, ours_length = ours_blocks[i]
+      theirs_base, theirs_start, theirs_length = theirs_blocks[j]
+      start = max(ours_base, theirs_base)
+      end = min(ours_base + ours_length, theirs_base + theirs_length)
+      if start < end:
+          ours_at = ours_start + start - ours_base
+          theirs_at = theirs_start + start - theirs_base
+          yield start, end, ours_at, ours_at + end - start, theirs_at, theirs_at + end - start
+      if ours_base + ours_length < theirs_base + theirs_length:
+          i += 1
+      else:
+          j += 1
+  yield len(base), len(base), len(ours), len(ours), len(theirs), len(theirs)
+
+def _with_newline(lines):
+  if lines and not lines[-1].endswith(b"\n"):
+      return lines[:-1] + [lines[-1] + b"\n"]
+  return lines
+
+def merge_lines(base, ours, theirs, ours_label, theirs_label):
+  """Merges two edited versions of a list of lines. Returns (merged lines, number of conflicts)."""
+  merged = []
+  conflicts = 0
+  base_at = ours_at = theirs_at = 0
+  for base_start, base_end, ours_start, ours_end, theirs_start, theirs_end in _sync_regions(base, ours, theirs):
+      base_part = base[base_at:base_start]
+      ours_part = ours[ours_at:ours_start]
+      theirs_part = theirs[theirs_at:theirs_start]
+      if ours_part == theirs_part or theirs_part == base_part:
+          merged.extend(ours_part)
+      elif ours_part == base_part:
+          merged.extend(theirs_part)
+      else:
+          conflicts += 1
+          merged.append(b"<" * CONFLICT_MARKER_SIZE + f" {ours_label}\n".encode())
+          merged.extend(_with_newline(ours_part))
+          merged.append(b"=" * CONFLICT_MARKER_SIZE + b"\n")
+          merged.extend(_with_newline(theirs_part))
+          merged.append(b">" * CONFLICT_MARKER_SIZE + f" {theirs_label}\n".encode())
+      merged.extend(base[base_start:base_end])
+      base_at, ours_at, theirs_at = base_end, ours_end, theirs_end
+  return merged, conflicts
+
+def _merge_mode(base, ours, theirs):
+  if base is not None and ours["mode"] == base.get("mode"):
+      return theirs["mode"]
+  return ours["mode"]
+
+def _merge_blobs(base, ours, theirs, rel_path, conflicts, labels):
+  """Merges two versions of a file line by line. Returns the merged entry."""
+  if ours["hash"] == theirs["hash"]:
+      return dict(ours, mode=_merge_mode(base, ours, theirs))
+  if ours.get("chunked") or theirs.get("chunked") or (base and base.get("chunked")):
+      conflicts.append((rel_path, "large file changed on both branches, kept the current branch's version"))
+      return ours
+  base_data = read_blob(base) if base is not None and base["type"] == "blob" else b""
+  ours_data = read_blob(ours)
+  theirs_data = read_blob(theirs)
+  if is_binary(base_data) or is_binary(ours_data) or is_binary(theirs_data):
+      conflicts.append((rel_path, "binary file changed on both branches, kept the current branch's version"))
+      return ours
+  merged, conflict_count = merge_lines(base_data.splitlines(keepends=True), ours_data.splitlines(keepends=True),
+                                       theirs_data.splitlines(keepends=True), *labels)
+  data = b"".join(merged)
+  if is_chunked_size(len(data)):
+      conflicts.append((rel_path, "merged file is too large to merge line by line, kept the current branch's version"))
+      return ours
+  if conflict_count:
+      conflicts.append((rel_path, f"{conflict_count} conflicting change(s)"))
+  return {"name": ours["name"], "type": "blob", "hash": store_bytes(data),
+          "mode": _merge_mode(base, ours, theirs), "size": len(data)}
+
+def _merge_entries(base, ours, theirs, rel_path, conflicts, labels):
+  """Merges one name of three trees. Returns the merged entry, or None if it is deleted."""
+  if ours == theirs or base == theirs:
+      return ours
+  if base == ours:
+      return theirs
+  if ours is None or theirs is None:
+      kept = ours if ours is not None else theirs
+      side = labels[1] if ours is None else labels[0]
+      conflicts.append((rel_path, f"deleted on '{side}' but changed on the other branch, kept the changed version"))
+      return kept
+  if ours["type"] == theirs["type"] == "tree":
+      base_hash = base["hash"] if base is not None and base["type"] == "tree" else None
+      tree_hash = merge_trees(base_hash, ours["hash"], theirs["hash"], conflicts, labels, rel_path)
+      return dict(ours, hash=tree_hash, mode=_merge_mode(base, ours, theirs))
+  if ours["type"] == theirs["type"] == "blob":
+      if base is not None and base["type"] != "blob":
+          base = None
+      return _merge_blobs(base, ours, theirs, rel_path, conflicts, labels)
+  conflicts.append((rel_path, "changed differently on both branches, kept the current branch's version"))
+  return ours
+
+def merge_trees(base_hash, ours_hash, theirs_hash, conflicts, labels, prefix=""):
+  """Three-way merges two trees against their merge base and returns the stored result."""
+  if ours_hash == theirs_hash or base_hash == theirs_hash:
+      return ours_hash
+  if base_hash == ours_hash:
+      return theirs_hash
+  base = {entry["name"]: entry for entry in read_tree(base_hash)} if base_hash else {}
+  ours = {entry["name"]: entry for entry in read_tree(ours_hash)} if ours_hash else {}
+  theirs = {entry["name"]: entry for entry in read_tree(theirs_hash)} if theirs_hash else {}
+  entries = []
+  for name in sorted(base.keys() | ours.keys() | theirs.keys()):
+      rel_path = f"{prefix}/{name}" if prefix else name
+      entry = _merge_entries(base.get(name), ours.get(name), theirs.get(name), rel_path, conflicts, labels)
+      if entry is not None:
+          entries.append(entry)
+  return store_tree(entries)
+
+def abort_merge():
+  """Puts the working tree back the way it was before a merge with conflicts."""
+  pending_merge = read_pending_merge()
+  if pending_merge is None:
+      print("No merge in progress.")
+      return
+  with current_repository().lock():
+      head = find_commit(pending_merge["head"], exact=True)
+      if head is not None:
+          # Merges only start from a clean working tree, so new top-level files came from the merge.
+          index = load_index()
+          working_tree, trees = scan_working_tree(index)
+          counts = {"written": 0, "deleted": 0, "chmod": 0}
+          _checkout_diff(working_tree, get_commit_tree(os.path.join(get_logs_path(), head["dir"])), trees,
+                         get_work_path(), "", index, counts, delete_top_level=True)
+          save_index(index)
+      clear_pending_merge()
+  print(f"Merge of branch '{pending_merge['branch']}' aborted.")
+  log(f"Aborted merge of branch '{pending_merge['branch']}'.")
+
+def branch_merge(args):
+  """Merges a specified branch into the current branch."""
+  if getattr(args, "abort", False):
+      abort_merge()
+      return
+  config = load_config()
+  current_branch = config.get("current_branch", MASTER_BRANCH)
+  target_branch = args.name
+
+  if target_branch is None:
+      print("Name the branch to merge.")
+      return
+  if not branch_exists(target_branch):
+      print(f"Branch '{target_branch}' does not exist.")
+      return
+  if target_branch == current_branch:
+      print("Cannot merge a branch into itself.")
+      return
+
+  logs_dir = config.get("logs_directory", get_logs_path())
+  target_commit_path = get_latest_commit_path(logs_dir, target_branch)
+  if target_commit_path is None:
+      print(f"Branch '{target_branch}' has no commits to merge.")
+      return
+  if not os.path.exists(target_commit_path):
+      print(f"Commit data missing for '{os.path.basename(target_commit_path)}'.")
+      return
+
+  print(f"Merging branch '{target_branch}' into '{current_branch}'...")
+  with current_repository().lock():
+      if read_pending_merge() is not None:
+          print("A merge is already in progress. Commit it or run 'branch merge --abort' first.")
+          return
+      ours = read_branch_head(current_branch)
+      theirs = read_branch_head(target_branch)
+      if ours is None:
+          print(f"Branch '{current_branch}' has no commits yet. Commit your work before merging.")
+          return
+      ours_tree = get_commit_tree(get_latest_commit_path(logs_dir, current_branch))
+      theirs_tree = get_commit_tree(target_commit_path)
+      index = load_index()
+      working_tree, trees = scan_working_tree(index)
+      if working_tree != ours_tree:
+          print("You have uncommitted changes. Commit them before merging.")
+          return
+
+      base = find_merge_base(ours, theirs)
+      if base == theirs:
+          print(f"Already up to date with '{target_branch}'.")
+          return
+      counts = {"written": 0, "deleted": 0, "chmod": 0}
+      if base == ours:
+          _checkout_diff(ours_tree, theirs_tree, trees, get_work_path(), "", index, counts, delete_top_level=True)
+          save_index(index)
+          write_branch_head(current_branch, theirs)
+          print(f"Fast-forwarded '{current_branch}' to {theirs} ({counts['written']} written, {counts['deleted']} removed).")
+          log(f"Fast-forwarded '{current_branch}' to '{target_branch}'.", commit=theirs)
+          return
+
+      base_tree = None
+      if base is not None:
+          base_tree = get_commit_tree(os.path.join(logs_dir, find_commit(base, exact=True)["dir"]))
+      conflicts = []
+      merged_tree = merge_trees(base_tree, ours_tree, theirs_tree, conflicts, (current_branch, target_branch))
+      changed = [rel_path for _, rel_path in diff_trees(ours_tree, merged_tree)]
+      _checkout_diff(ours_tree, merged_tree, trees, get_work_path(), "", index, counts, delete_top_level=True)
+      save_index(index)
+
+      if conflicts:
+          write_json_atomic(os.path.join(get_repo_path(), MERGE_FILE), {
+              "branch": target_branch,
+              "commit": theirs,
+              "head": ours,
+              "conflicts": [rel_path for rel_path, _ in conflicts]
+          })
+          print(f"Merged {len(changed)} file(s) with {len(conflicts)} conflict(s):")
+          for rel_path, reason in conflicts:
+              print(f"  {rel_path}: {reason}")
+          print("Fix the conflicts, then commit to finish the merge, or run 'branch merge --abort'.")
+          log(f"Merge of '{target_branch}' into '{current_branch}' stopped on conflicts.", conflicts=len(conflicts))
+          return
+
+      merge_commit_title = f"Merge branch '{target_branch}' into '{current_branch}'"
+      commit_info, _ = create_commit(merge_commit_title, f"Merged branch '{target_branch}' into '{current_branch}'",
+                                     paths=changed, merge_parent=theirs)
+  print(f"Committed the merge as {commit_info['id']} ({len(changed)} file(s) changed).")
+  print(f"Successfully merged '{target_branch}' into '{current_branch}'.")
+  log(f"Merged branch '{target_branch}' into '{current_branch}'.", files=len(changed))
+  handle_backups(current_repository().config, commit_info["id"])
+
+def _commit_arguments(parser):
+  parser.add_argument('-m', '--title', required=True, help='Commit title')
+  parser.add_argument('-d', '--description', help='Commit description')
+  parser.add_argument('-j', '--jobs', type=int, default=1, help='Number of worker threads used to hash and store files')
+
+def _rename_arguments(parser):
+  parser.add_argument('-M', '--find-renames', type=int, default=RENAME_THRESHOLD, metavar='PERCENT',
+                      help=f'Report a deleted and an added file this similar as a rename (default: {RENAME_THRESHOLD}, 100 for identical files only)')
+  parser.add_argument('--no-renames', dest='find_renames', action='store_const', const=None, help='Report renamed files as deleted and added')
+  parser.add_argument('--rename-limit', type=int, default=RENAME_LIMIT, metavar='FILES',
+                      help=f'Skip looking for similar renames when more files than this were deleted or added (default: {RENAME_LIMIT})')
+
+def _log_arguments(parser):
+  parser.usage = '%(prog)s [options] [-- path ...]'
+  parser.add_argument('-n', '--limit', type=int, help='Show at most this many commits')
+  parser.add_argument('--since', type=parse_log_date, help='Show commits made on or after this date (YYYY-MM-DD[ HH:MM:SS]) or commit')
+  parser.add_argument('--until', type=lambda value: parse_log_date(value, end_of_range=True), help='Show commits made on or before this date or commit')
+  parser.add_argument('--grep', help='Show commits whose title or description contains this text')
+  parser.set_defaults(paths=[])
+
+def _show_arguments(parser):
+  parser.usage = '%(prog)s [-c COMMIT] path'
+  parser.add_argument('path', help='Path of the file relative to the project folder')
+  parser.add_argument('-c', '--commit', help='Commit ID (default: the last commit that changed the file)')
+
+def _pull_arguments(parser):
+  parser.usage = '%(prog)s -c COMMIT [--dry-run] [--to DIR] [-- path ...]'
+  parser.add_argument('-c', '--commit', required=True, help='Commit ID to pull from')
+  parser.add_argument('--dry-run', action='store_true', help='List what would change without writing anything')
+  parser.add_argument('--to', metavar='DIR', help='Write the files into DIR instead of the working directory')
+  parser.set_defaults(paths=[])
+
+def _backup_arguments(parser):
+  parser.add_argument('-t', '--time', type=int, required=True, help='Maximum seconds between a change and its backup')
+  parser.add_argument('-m', '--title', default="Auto backup", help='Commit title for backups')
+  parser.add_argument('--debounce', type=float, default=BACKUP_DEBOUNCE_SECONDS, help='Seconds without edits before a backup is made')
+  parser.add_argument('--poll', action='store_true', help='Poll file stats instead of using inotify')
+
+def _backup_loc_arguments(parser):
+  import argparse
+  commands = parser.add_subparsers(title="Backup Location Commands", dest="backup_command")
+  backup_add = commands.add_parser('add', help='Add a new backup location')
+  backup_add.add_argument('location', help='Path to the backup directory')
+  backup_add.set_defaults(handler=add_backup_location)
+  backup_remove = commands.add_parser('remove', help='Remove an existing backup location')
+  backup_remove.add_argument('location', help='Path to the backup directory to remove')
+  backup_remove.set_defaults(handler=remove_backup_location)
+  commands.add_parser('list', help='List all backup locations').set_defaults(handler=list_backup_locations)
+  backup_sync = commands.add_parser('sync', help='Copy missing commits to all backup locations')
+  backup_sync.add_argument('--quiet', action='store_true', help=argparse.SUPPRESS)
+  backup_sync.set_defaults(handler=sync_backup_locations)
+  backup_async = commands.add_parser('async', help='Run backups in the background after each commit')
+  backup_async.add_argument('state', choices=['on', 'off'], help='Turn background backups on or off')
+  backup_async.set_defaults(handler=set_async_backups)
+
+def _merge_arguments(parser):
+  parser.add_argument('name', nargs='?', help='Name of the branch to merge into the current branch')
+  parser.add_argument('--abort', action='store_true', help='Undo a merge that stopped on conflicts')
+
+def _branch_arguments(parser):
+  commands = parser.add_subparsers(title="Branch Commands", dest="branch_command")
+  branch_create = commands.add_parser('create', help='Create a new branch')
+  branch_create.add_argument('name', help='Name of the new branch')
+  branch_create.set_defaults(handler=branch_init)
+  branch_switch_cmd = commands.add_parser('switch', help='Switch to an existing branch')
+  branch_switch_cmd.add_argument('name', help='Name of the branch to switch to')
+  branch_switch_cmd.set_defaults(handler=branch_switch)
+  commands.add_parser('list', help='List all branches').set_defaults(handler=view_branches)
+  branch_merge_cmd = commands.add_parser('merge', help='Merge a branch into the current branch')
+  _merge_arguments(branch_merge_cmd)
+  branch_merge_cmd.set_defaults(handler=branch_merge)
+
+def _diff_arguments(parser):
+  parser.usage = '%(prog)s [options] commit1 commit2 [-- path ...]'
+  parser.add_argument('commit1', help='First commit ID')
+  parser.add_argument('commit2', help='Second commit ID')
+  parser.set_defaults(paths=[])
+  parser.add_argument('--stat', action='store_true', help='Show the number of changed lines per file')
+  parser.add_argument('--name-only', action='store_true', help='Only show the names of changed files')
+  parser.add_argument('-j', '--jobs', type=int, default=None, help='Worker processes for diffing files (default: CPU count)')
+  _rename_arguments(parser)
+
+def _tag_arguments(parser):
+  commands = parser.add_subparsers(title="Tag Commands", dest="tag_command")
+  tag_add = commands.add_parser('add', help='Tag a specific commit')
+  tag_add.add_argument('commit', help='Commit ID to tag')
+  tag_add.add_argument('tag', help='Tag name')
+  tag_add.set_defaults(handler=tag_commit)
+  commands.add_parser('list', help='List all tags').set_defaults(handler=list_tags)
+
+def _gc_arguments(parser):
+  parser.add_argument('--compression', choices=sorted(PACK_CODECS), help=f'Pack compression (default: {DEFAULT_PACK_COMPRESSION})')
+  parser.add_argument('--keep-hourly', type=int, metavar='HOURS', help='Keep one automatic backup per hour for this many hours')
+  parser.add_argument('--keep-daily', type=int, metavar='DAYS', help='Keep one automatic backup per day for this many days')
+
+def _verify_arguments(parser):
+  parser.add_argument('--backups', action='store_true', help='Also check every backup location')
+  parser.add_argument('--full', action='store_true', help='Read backup objects again even if they were verified before')
+  parser.add_argument('-j', '--jobs', type=int, default=None, help='Worker processes for hashing (default: CPU count)')
+
+def _bundle_arguments(parser):
+  commands = parser.add_subparsers(title="Bundle Commands", dest="bundle_command")
+  bundle_create = commands.add_parser('create', help='Write commits and their files into a bundle')
+  bundle_create.add_argument('file', help='Path of the bundle to write')
+  bundle_create.add_argument('--since', metavar='COMMIT', help='Only include commits made after this one')
+  bundle_create.add_argument('--compression', choices=sorted(BUNDLE_CODECS), default='zlib', help='Bundle compression (default: zlib)')
+  bundle_create.set_defaults(handler=create_bundle)
+  bundle_import = commands.add_parser('import', help='Add the commits in a bundle to this repository')
+  bundle_import.add_argument('file', help='Path of the bundle to read')
+  bundle_import.set_defaults(handler=import_bundle)
+
+def _serve_arguments(parser):
+  parser.add_argument('--stop', action='store_true', help='Stop the running server')
+  parser.add_argument('--poll', action='store_true', help='Poll file stats instead of using inotify')
+
+def command_table():
+  """Returns the subcommands as (name, aliases, help, handler, add_arguments) rows."""
+  return [
+      ('init', ['i'], 'Initialize a new repository', init_repository, None),
+      ('commit', ['c'], 'Commit current changes', commit_changes, _commit_arguments),
+      ('log', ['lg'], 'Show commit logs', view_logs, _log_arguments),
+      ('show', [], 'Print a file as it was in a commit', show_file, _show_arguments),
+      ('status', ['st'], 'Show status of repository', check_status, _rename_arguments),
+      ('pull', ['p'], 'Pull code from a specific commit', pull_commit, _pull_arguments),
+      ('backup', ['b'], 'Automatically commit changes within x seconds', backup_changes, _backup_arguments),
+      ('backup-loc', ['bl'], 'Manage backup locations', lambda args: print_help_backup_loc(), _backup_loc_arguments),
+      ('branch', [], 'Manage branches', lambda args: print_help_branch(), _branch_arguments),
+      ('merge', [], 'Merge a branch into the current branch (same as branch merge)', branch_merge, _merge_arguments),
+      ('diff', [], 'Show differences between two commits', diff_commits, _diff_arguments),
+      ('tag', [], 'Manage tags', lambda args: print_help_tag(), _tag_arguments),
+      ('gc', ['repack'], 'Pack objects and prune old automatic backups', gc_repository, _gc_arguments),
+      ('verify', ['fsck'], 'Check stored files and backups for damage', verify_repository, _verify_arguments),
+      ('bundle', [], 'Move history between machines in a single file', lambda args: print_help_bundle(), _bundle_arguments),
+      ('serve', [], 'Keep the repository loaded and answer status, log, diff and commit quickly', serve_repository, _serve_arguments),
+  ]
+
+def find_command_name(argv):
+  """Returns the subcommand named in argv, skipping the global options, or None."""
+  position = 0
+  while position < len(argv):
+      if argv[position] == '--':
+          return None
+      elif argv[position] == '--profile-out':
+          position += 2
+      elif argv[position].startswith('-'):
+          position += 1
+      else:
+          return argv[position]
+  return None
+
+def build_parser(command=None):
+  """Builds the command line parser."""
+  import argparse
+  parser = argparse.ArgumentParser(
+      description="SimpleGit: An Advanced Beginner-Friendly Local Version Control System",
+      formatter_class=argparse.RawTextHelpFormatter
+  )
+  """
+  The below is just evil, i dont apologise
+  """
+  parser.add_argument('--profile', action='store_true', help='Print how long each phase took, and its file and byte counts, to stderr')
+  parser.add_argument('--profile-out', metavar='FILE', help='Also run under cProfile and write the stats to FILE')
+  parser.add_argument('--metrics-json', action='store_true', help='Print a JSON summary of the phases when the command ends')
+  subparsers = parser.add_subparsers(title="Commands", dest="command")
+  for name, aliases, help_text, handler, add_arguments in command_table():
+      subparser = subparsers.add_parser(name, aliases=aliases, help=help_text)
+      if add_arguments is not None and (command is None or command == name or command in aliases):
+          add_arguments(subparser)
+      subparser.set_defaults(handler=handler)
+  return parser
+
+def parse_command_line(parser, argv):
+  """Parses argv. Anything after '--' becomes args.paths, for the commands that take paths."""
+  pathspecs = []
+  if "--" in argv:
+      argv, pathspecs = argv[:argv.index("--")], argv[argv.index("--") + 1:]
+  args = parser.parse_args(argv)
+  if pathspecs:
+      if not hasattr(args, "paths"):
+          parser.error("this command does not take paths after '--'")
+      args.paths = pathspecs
+  return args
+
+def run_command(args, parser):
+  """Runs a parsed command against the current repository."""
+  if args.command is None:
+      parser.print_help()
+  else:
+      args.handler(args)
+
+def main():
+  # A command line that starts with a served command has no global options,
+  # so it is handed to a running server before argparse is even loaded.
+  if sys.argv[1:2] and sys.argv[1] in SERVED_COMMANDS:
+      exit_code = run_on_server(sys.argv[1:])
+      if exit_code is not None:
+          sys.exit(exit_code)
+  parser = build_parser(find_command_name(sys.argv[1:]))
+  args = parse_command_line(parser, sys.argv[1:])
+
+  metrics.enabled = bool(args.profile or args.profile_out or args.metrics_json)
+  profiler = None
+  if args.profile_out:
+      import cProfile
+      profiler = cProfile.Profile()
+      profiler.enable()
+  try:
+      with Repository(), metrics.span("total"):
+          run_command(args, parser)
+  except SimpleGitError as e:
+      print(e)
+      sys.exit(1)
+  finally:
+      if profiler is not None:
+          profiler.disable()
+          profiler.dump_stats(args.profile_out)
+      if metrics.enabled:
+          report_metrics(args)
+
+def print_help_backup_loc():
+  """Prints help for backup location management."""
+  help_text = """
+Backup Location Management Commands:
+
+backup-loc add <location>        Add a new backup location.
+backup-loc remove <location>     Remove an existing backup location.
+backup-loc list                  List all configured backup locations.
+backup-loc sync                  Copy missing commits to all backup locations.
+backup-loc async <on|off>        Run backups in the background after each commit.
+"""
+  print(help_text)
+
+def print_help_branch():
+  """Prints help for branch management."""
+  help_text = """
+Branch Management Commands:
+
+branch create <name>             Create a new branch.
+branch switch <name>             Switch to an existing branch.
+branch list                      List all branches.
+branch merge <name>              Merge a branch into the current branch.
+branch merge --abort             Undo a merge that stopped on conflicts.
+"""
+  print(help_text)
+
+def print_help_tag():
+  """Prints help for tag management."""
+  help_text = """
+Tag Management Commands:
+
+tag add <commit> <tag>           Tag a specific commit.
+tag list                         List all tags.
+"""
+  print(help_text)
+
+def print_help_bundle():
+  """Prints help for bundles."""
+  help_text = """
+Bundle Commands:
+
+bundle create <file> [--since <commit>]   Write commits into a bundle file.
+bundle import <file>                      Add the commits in a bundle to this repository.
+"""
+  print(help_text)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,79 @@
+"""Helpers for the behaviour tests, which drive the command line in scratch
+repositories."""
+import json
+import os
+import py_compile
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+SIMPLEGIT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "simplegit")
+# Importing the module instead of running the script lets each command load
+# the compiled file rather than compile simplegit.py again.
+py_compile.compile(os.path.join(SIMPLEGIT_DIR, "simplegit.py"), doraise=True)
+SIMPLEGIT = [sys.executable, "-c", f"import sys; sys.path.insert(0, {SIMPLEGIT_DIR!r}); import simplegit; simplegit.main()"]
+
+
+class RepositoryTestCase(unittest.TestCase):
+  """Runs each test in a freshly initialized repository at self.work."""
+
+  def setUp(self):
+    self.work = self.make_repository()
+
+  def make_repository(self):
+    work = tempfile.mkdtemp(prefix="simplegit-test-")
+    self.addCleanup(shutil.rmtree, work, ignore_errors=True)
+    self.run_simplegit("init", cwd=work)
+    return work
+
+  def run_simplegit(self, *argv, stdin=None, cwd=None):
+    result = subprocess.run([*SIMPLEGIT, *argv], cwd=cwd or self.work, input=stdin,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+      self.fail(f"simplegit {' '.join(argv)} exited with {result.returncode}:\n{result.stdout}{result.stderr}")
+    return result.stdout
+
+  def run_failing(self, *argv, cwd=None):
+    result = subprocess.run([*SIMPLEGIT, *argv], cwd=cwd or self.work, capture_output=True, text=True)
+    self.assertNotEqual(result.returncode, 0, f"simplegit {' '.join(argv)} succeeded:\n{result.stdout}")
+    return result.stdout + result.stderr
+
+  def path(self, rel_path):
+    return os.path.join(self.work, rel_path)
+
+  def write(self, rel_path, data):
+    os.makedirs(os.path.dirname(self.path(rel_path)), exist_ok=True)
+    with open(self.path(rel_path), "wb" if isinstance(data, bytes) else "w") as file:
+      file.write(data)
+
+  def read(self, rel_path, mode="r"):
+    with open(self.path(rel_path), mode) as file:
+      return file.read()
+
+  def commit(self, title, cwd=None):
+    output = self.run_simplegit("commit", "-m", title, cwd=cwd)
+    return re.search(r"with ID (\S+) on branch", output).group(1)
+
+  def pull(self, commit_id, *argv, cwd=None):
+    return self.run_simplegit("pull", "-c", commit_id, *argv, stdin="y\n", cwd=cwd)
+
+  def log_ids(self, *argv, cwd=None):
+    return re.findall(r"^Commit ID : (\S+)$", self.run_simplegit("log", *argv, cwd=cwd), re.MULTILINE)
+
+  def remove(self, rel_path):
+    os.remove(self.path(rel_path))
+
+  def status(self, *argv):
+    return [line.strip() for line in self.run_simplegit("status", *argv).splitlines()]
+
+  def metrics(self, *argv):
+    """Runs a command with --metrics-json and returns its phases."""
+    output = self.run_simplegit("--metrics-json", *argv)
+    return json.loads(output.splitlines()[-1])["phases"]
+
+  def object_files(self, work=None):
+    objects = os.path.join(work or self.work, ".simplegit", "objects")
+    return {os.path.join(root, name) for root, _, names in os.walk(objects) for name in names}
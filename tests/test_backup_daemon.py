@@ -0,0 +1,56 @@
+"""Behaviour checks for the backup daemon, which watches the working tree
+and commits changed paths."""
+import os
+import signal
+import subprocess
+import time
+import unittest
+
+from support import SIMPLEGIT, RepositoryTestCase
+
+
+class BackupDaemonTest(RepositoryTestCase):
+
+  def start_backup(self, *argv):
+    daemon = subprocess.Popen([*SIMPLEGIT, "backup", "-t", "3", "--debounce", "0.2", *argv], cwd=self.work,
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    self.addCleanup(daemon.kill)
+    return daemon
+
+  def wait_for_commits(self, count, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+      ids = self.log_ids()
+      if len(ids) >= count:
+        return ids
+      time.sleep(0.1)
+    self.fail(f"expected {count} commit(s), found {len(self.log_ids())}")
+
+  def check_backups(self, *argv):
+    self.write(os.path.join("src", "a.txt"), "a\n")
+    self.commit("first")
+    daemon = self.start_backup(*argv)
+    time.sleep(1)
+    self.assertEqual(len(self.log_ids()), 1, "the daemon committed without a change")
+    self.write(os.path.join("src", "a.txt"), "edited\n")
+    self.write(os.path.join("src", "new", "b.txt"), "b\n")
+    latest = self.wait_for_commits(2)[0]
+    self.assertEqual(self.run_simplegit("show", "-c", latest, os.path.join("src", "a.txt")), "edited\n")
+    self.assertEqual(self.run_simplegit("show", "-c", latest, os.path.join("src", "new", "b.txt")), "b\n")
+    self.assertIn("Automatic backup", self.run_simplegit("log", "-n", "1"))
+    time.sleep(1)
+    self.assertEqual(len(self.log_ids()), 2, "the daemon committed again without a change")
+    daemon.send_signal(signal.SIGINT)
+    output, _ = daemon.communicate(timeout=10)
+    self.assertIn("Backup stopped by user.", output)
+    return output
+
+  def test_watching_commits_edits_once(self):
+    self.assertIn("Starting automatic backup", self.check_backups())
+
+  def test_polling_commits_edits_once(self):
+    self.assertIn("Starting automatic backup (polling)", self.check_backups("--poll"))
+
+
+if __name__ == "__main__":
+  unittest.main()
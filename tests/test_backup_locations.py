@@ -0,0 +1,58 @@
+"""Behaviour checks for copying commits to backup locations when committing."""
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from support import RepositoryTestCase
+
+
+class BackupOnCommitTest(RepositoryTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.backups = tempfile.mkdtemp(prefix="simplegit-backups-")
+    self.addCleanup(shutil.rmtree, self.backups, ignore_errors=True)
+    self.location = os.path.join(self.backups, "location")
+    self.run_simplegit("backup-loc", "add", self.location)
+    self.write("a.txt", "a\n")
+
+  def backed_up_ids(self):
+    try:
+      with open(os.path.join(self.location, "manifest.jsonl")) as manifest:
+        return [json.loads(line)["id"] for line in manifest]
+    except FileNotFoundError:
+      return []
+
+  def test_sync_backup_is_reported_after_the_commit(self):
+    output = self.run_simplegit("commit", "-m", "first")
+    first = self.log_ids()[0]
+    self.assertLess(output.index(f"with ID {first}"), output.index(f"Backed up 1 commit(s) to {self.location}"))
+    self.assertEqual(self.backed_up_ids(), [first])
+
+  def test_failed_location_fails_the_command_after_committing(self):
+    broken = os.path.join(self.backups, "not-a-folder")
+    with open(broken, "w") as blocker:
+      blocker.write("in the way\n")
+    self.run_simplegit("backup-loc", "add", broken)
+    output = self.run_failing("commit", "-m", "first")
+    first = self.log_ids()[0]
+    self.assertLess(output.index(f"with ID {first}"), output.index(f"Failed to backup to {broken}"))
+    self.assertIn("1 backup location(s) could not be updated", output)
+    self.assertEqual(self.backed_up_ids(), [first])
+
+  def test_async_backup_runs_in_the_background(self):
+    self.run_simplegit("backup-loc", "async", "on")
+    output = self.run_simplegit("commit", "-m", "first")
+    self.assertNotIn("Backed up", output)
+    first = self.log_ids()[0]
+    deadline = time.monotonic() + 10
+    while self.backed_up_ids() != [first]:
+      self.assertLess(time.monotonic(), deadline, "the background backup did not finish")
+      time.sleep(0.1)
+
+
+if __name__ == "__main__":
+  unittest.main()
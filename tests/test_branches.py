@@ -0,0 +1,123 @@
+"""Behaviour checks for branches and merges, run through the command line in
+a scratch repository."""
+import json
+import os
+import unittest
+
+from support import RepositoryTestCase
+
+LINES = "".join(f"{n}\n" for n in range(1, 6))
+
+
+class BranchTestCase(RepositoryTestCase):
+  """Starts a 'feature' branch from a first commit on 'main'."""
+
+  def setUp(self):
+    super().setUp()
+    self.write("lines.txt", LINES)
+    self.write("shared.txt", "base\n")
+    self.first = self.commit("first")
+    self.run_simplegit("branch", "create", "feature")
+
+  def commit_on(self, branch, title, files, remove=()):
+    """Switches to branch, makes the working tree match its head plus files, and commits."""
+    self.run_simplegit("branch", "switch", branch)
+    for name in os.listdir(self.work):
+      if name != ".simplegit":
+        self.remove(name)
+    self.pull(self.log_ids()[0])
+    for rel_path in remove:
+      self.remove(rel_path)
+    for rel_path, text in files.items():
+      self.write(rel_path, text)
+    return self.commit(title)
+
+
+class FastForwardTest(BranchTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.second = self.commit_on("feature", "second", {"b.txt": "b\n"})
+    self.run_simplegit("branch", "switch", "main")
+    self.remove("b.txt")
+    self.assertIn("Fast-forwarded 'main'", self.run_simplegit("merge", "feature"))
+
+  def test_log_lists_the_commits_fast_forwarded_to(self):
+    self.assertEqual(self.log_ids(), [self.second, self.first])
+    self.assertEqual(self.log_ids("--grep", "second"), [self.second])
+
+  def test_pull_finds_the_commits_fast_forwarded_to(self):
+    self.write("b.txt", "changed\n")
+    self.assertIn("Pull complete", self.pull(self.second))
+    self.assertEqual(self.read("b.txt"), "b\n")
+
+
+class ThreeWayMergeTest(BranchTestCase):
+
+  def test_changes_from_both_sides_are_combined(self):
+    theirs = self.commit_on("feature", "feature edits", {"lines.txt": LINES.replace("2\n", "two\n"), "new.txt": "new\n"})
+    ours = self.commit_on("main", "main edits", {"lines.txt": LINES.replace("5\n", "five\n")}, remove=["shared.txt"])
+    output = self.run_simplegit("merge", "feature")
+    self.assertIn("Successfully merged 'feature' into 'main'", output)
+    self.assertEqual(self.read("lines.txt"), "1\ntwo\n3\n4\nfive\n")
+    self.assertEqual(self.read("new.txt"), "new\n")
+    self.assertFalse(os.path.exists(self.path("shared.txt")))
+    self.assertEqual(self.status(), ["No changes since the last commit."])
+    merge = self.log_ids("-n", "1")[0]
+    self.assertIn(f"Merge     : {ours} {theirs}", self.run_simplegit("log", "-n", "1"))
+    self.assertEqual(sorted(self.log_ids()[1:]), sorted([ours, theirs, self.first]))
+    self.assertIn("Already up to date", self.run_simplegit("merge", "feature"))
+    self.assertEqual(self.log_ids("-n", "1"), [merge])
+
+  def test_uncommitted_changes_stop_the_merge(self):
+    self.commit_on("feature", "feature edits", {"new.txt": "new\n"})
+    self.commit_on("main", "main edits", {"shared.txt": "main\n"})
+    self.write("shared.txt", "unsaved\n")
+    self.assertIn("uncommitted changes", self.run_simplegit("merge", "feature"))
+    self.assertFalse(os.path.exists(self.path("new.txt")))
+
+
+class ConflictTest(BranchTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.theirs = self.commit_on("feature", "feature edits", {"shared.txt": "feature\n", "new.txt": "new\n"})
+    self.ours = self.commit_on("main", "main edits", {"shared.txt": "main\n"})
+    output = self.run_simplegit("merge", "feature")
+    self.assertIn("1 conflict(s)", output)
+    self.assertIn("shared.txt", output)
+
+  def merge_file(self):
+    return self.path(os.path.join(".simplegit", "merge.json"))
+
+  def test_conflicts_are_marked_and_recorded(self):
+    self.assertEqual(self.read("shared.txt"), "<<<<<<< main\nmain\n=======\nfeature\n>>>>>>> feature\n")
+    self.assertEqual(self.read("new.txt"), "new\n")
+    with open(self.merge_file()) as merge_file:
+      pending = json.load(merge_file)
+    self.assertEqual((pending["branch"], pending["commit"], pending["head"], pending["conflicts"]),
+                     ("feature", self.theirs, self.ours, ["shared.txt"]))
+    self.assertIn("Conflict: shared.txt", self.status())
+    self.assertIn("A merge is already in progress", self.run_simplegit("merge", "feature"))
+
+  def test_commit_finishes_the_merge_once_resolved(self):
+    self.assertIn("Resolve the merge conflicts", self.run_failing("commit", "-m", "too early"))
+    self.assertEqual(self.log_ids("-n", "1"), [self.ours])
+    self.write("shared.txt", "resolved\n")
+    merge = self.commit("resolved")
+    self.assertFalse(os.path.exists(self.merge_file()))
+    self.assertIn(f"Merge     : {self.ours} {self.theirs}", self.run_simplegit("log", "-n", "1"))
+    self.assertEqual(self.log_ids()[0], merge)
+    self.assertIn(self.theirs, self.log_ids())
+
+  def test_abort_restores_the_previous_head(self):
+    self.assertIn("aborted", self.run_simplegit("merge", "--abort"))
+    self.assertEqual(self.read("shared.txt"), "main\n")
+    self.assertFalse(os.path.exists(self.path("new.txt")))
+    self.assertFalse(os.path.exists(self.merge_file()))
+    self.assertEqual(self.status(), ["No changes since the last commit."])
+    self.assertIn("No merge in progress", self.run_simplegit("merge", "--abort"))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,63 @@
+"""Behaviour checks for moving history between repositories with bundles."""
+import os
+import shutil
+import tempfile
+import unittest
+
+from support import RepositoryTestCase
+
+
+class BundleTest(RepositoryTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.commits = []
+    for count in (10, 20, 30):
+      self.write("text.txt", "".join(f"{n}\n" for n in range(count)))
+      self.write(os.path.join("docs", f"note{count}.md"), f"note {count}\n")
+      self.commits.append(self.commit(f"{count} lines"))
+    self.run_simplegit("tag", "add", self.commits[0], "first")
+    # Bundles are written outside the working tree so later commits do not pick them up.
+    self.bundles = tempfile.mkdtemp(prefix="simplegit-bundles-")
+    self.addCleanup(shutil.rmtree, self.bundles, ignore_errors=True)
+    self.bundle = os.path.join(self.bundles, "history.sgb")
+    self.other = self.make_repository()
+
+  def test_full_bundle_round_trip(self):
+    self.assertIn("Bundled 3 commit(s)", self.run_simplegit("bundle", "create", self.bundle))
+    output = self.run_simplegit("bundle", "import", self.bundle, cwd=self.other)
+    self.assertIn("Imported 3 commit(s)", output)
+    self.assertIn(f"Branch 'main' is now at {self.commits[-1]}", output)
+    self.assertEqual(self.log_ids(cwd=self.other), self.commits[::-1])
+    self.assertIn(f"first: {self.commits[0]}", self.run_simplegit("tag", "list", cwd=self.other))
+    self.pull(self.commits[1], cwd=self.other)
+    with open(os.path.join(self.other, "text.txt")) as text_file:
+      self.assertEqual(text_file.read(), "".join(f"{n}\n" for n in range(20)))
+    self.assertFalse(os.path.exists(os.path.join(self.other, "docs", "note30.md")))
+    self.assertIn("Everything checked is intact", self.run_simplegit("verify", cwd=self.other))
+    again = self.run_simplegit("bundle", "import", self.bundle, cwd=self.other)
+    self.assertIn("Imported 0 commit(s)", again)
+
+  def test_incremental_bundle_needs_its_base(self):
+    update = os.path.join(self.bundles, "update.sgb")
+    self.run_simplegit("bundle", "create", self.bundle, "--since", self.commits[0])
+    self.run_simplegit("bundle", "create", update, "--since", self.commits[1], "--compression", "lzma")
+    self.assertIn(f"continues from commit {self.commits[1]}",
+                  self.run_failing("bundle", "import", update, cwd=self.other))
+    self.assertIn(f"continues from commit {self.commits[0]}",
+                  self.run_failing("bundle", "import", self.bundle, cwd=self.other))
+
+    full = os.path.join(self.bundles, "full.sgb")
+    self.run_simplegit("bundle", "create", full)
+    self.run_simplegit("bundle", "import", full, cwd=self.other)
+    self.write("text.txt", "changed\n")
+    fourth = self.commit("fourth")
+    self.run_simplegit("bundle", "create", update, "--since", self.commits[-1])
+    output = self.run_simplegit("bundle", "import", update, cwd=self.other)
+    self.assertIn("Imported 1 commit(s)", output)
+    self.assertEqual(self.log_ids(cwd=self.other)[0], fourth)
+    self.assertEqual(self.run_simplegit("show", "-c", fourth, "text.txt", cwd=self.other), "changed\n")
+
+
+if __name__ == "__main__":
+  unittest.main()
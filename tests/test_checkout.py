@@ -0,0 +1,66 @@
+"""Behaviour checks for pull, which only touches paths that differ."""
+import os
+import stat
+import unittest
+
+from support import RepositoryTestCase
+
+
+class CheckoutTest(RepositoryTestCase):
+
+  def setUp(self):
+    super().setUp()
+    for number in range(10):
+      self.write(os.path.join("src", f"f{number}.txt"), f"{number}\n")
+    self.write("run.sh", "echo hi\n")
+    os.chmod(self.path("run.sh"), 0o755)
+    self.first = self.commit("first")
+
+  def mtimes(self):
+    return {name: os.stat(self.path(os.path.join("src", name))).st_mtime_ns for name in os.listdir(self.path("src"))}
+
+  def test_only_differing_files_are_written(self):
+    self.write(os.path.join("src", "f3.txt"), "changed\n")
+    self.commit("second")
+    before = self.mtimes()
+    output = self.pull(self.first)
+    self.assertIn("(1 written, 0 removed, 0 mode changes)", output)
+    self.assertEqual(self.read(os.path.join("src", "f3.txt")), "3\n")
+    after = self.mtimes()
+    self.assertNotEqual(before.pop("f3.txt"), after.pop("f3.txt"))
+    self.assertEqual(before, after)
+    self.assertIn("(0 written, 0 removed, 0 mode changes)", self.pull(self.first))
+
+  def test_added_files_are_removed_and_modes_restored(self):
+    self.write(os.path.join("src", "extra", "e.txt"), "extra\n")
+    self.remove(os.path.join("src", "f5.txt"))
+    os.chmod(self.path("run.sh"), 0o644)
+    output = self.pull(self.first)
+    self.assertIn("(1 written, 1 removed, 1 mode changes)", output)
+    self.assertFalse(os.path.exists(self.path(os.path.join("src", "extra"))))
+    self.assertEqual(self.read(os.path.join("src", "f5.txt")), "5\n")
+    self.assertTrue(os.stat(self.path("run.sh")).st_mode & stat.S_IXUSR)
+    self.assertEqual(self.status(), ["No changes since the last commit."])
+
+  def test_ignored_files_survive_folder_removal(self):
+    self.write(".simplegitignore", "*.log\n")
+    self.write("out", "a file\n")
+    as_file = self.commit("out is a file")
+    self.remove("out")
+    self.write(os.path.join("out", "data.txt"), "data\n")
+    self.write(os.path.join("out", "debug.log"), "debug\n")
+    self.write(os.path.join("src", "gen", "made.txt"), "made\n")
+    self.write(os.path.join("src", "gen", "build.log"), "build\n")
+    self.commit("out is a folder")
+
+    output = self.pull(as_file)
+    self.assertIn(f"Kept the folder {self.path('out')} instead of restoring 'out'", output)
+    self.assertEqual(sorted(os.listdir(self.path("out"))), ["debug.log"])
+    self.assertEqual(os.listdir(self.path(os.path.join("src", "gen"))), ["build.log"])
+    self.remove(os.path.join("out", "debug.log"))
+    self.pull(as_file)
+    self.assertEqual(self.read("out"), "a file\n")
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,38 @@
+"""Behaviour checks for large files stored as content-defined chunks."""
+import random
+import unittest
+
+from support import RepositoryTestCase
+
+
+class ChunkingTest(RepositoryTestCase):
+
+  def setUp(self):
+    super().setUp()
+    # Large enough to be chunked (CHUNKED_FILE_SIZE is 16 MB).
+    self.data = random.Random(0).randbytes(20 * 1024 * 1024)
+    self.write("big.bin", self.data)
+    self.first = self.commit("first")
+
+  def test_an_edit_only_stores_the_chunks_it_touches(self):
+    stored = self.object_files()
+    # At least a chunk list, its chunks and the tree.
+    self.assertGreater(len(stored), 4)
+    edited = bytearray(self.data)
+    edited[10 * 1024 * 1024:10 * 1024 * 1024 + 100] = b"x" * 100
+    self.write("big.bin", bytes(edited))
+    self.assertEqual(self.status()[1:], ["Modified: big.bin"])
+    second = self.commit("second")
+    added = self.object_files() - stored
+    # The changed chunk (two if the edit moved a boundary), the chunk list and the tree.
+    self.assertLessEqual(len(added), 4)
+
+    self.pull(self.first)
+    self.assertEqual(self.read("big.bin", "rb"), self.data)
+    self.pull(second)
+    self.assertEqual(self.read("big.bin", "rb"), bytes(edited))
+    self.assertIn("Everything checked is intact", self.run_simplegit("verify"))
+
+
+if __name__ == "__main__":
+  unittest.main()
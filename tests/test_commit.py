@@ -0,0 +1,43 @@
+"""Behaviour checks for committing with a pool of hashing jobs."""
+import os
+import unittest
+
+from support import RepositoryTestCase
+
+
+class ParallelCommitTest(RepositoryTestCase):
+
+  def fill(self, work):
+    for folder in range(5):
+      for number in range(20):
+        rel_path = os.path.join(work, f"dir{folder}", f"file{number}.txt")
+        os.makedirs(os.path.dirname(rel_path), exist_ok=True)
+        with open(rel_path, "w") as file:
+          file.write(f"{folder} {number}\n" * (number + 1))
+
+  def test_jobs_do_not_change_what_is_stored(self):
+    other = self.make_repository()
+    self.fill(self.work)
+    self.fill(other)
+    output = self.run_simplegit("commit", "-m", "parallel", "-j", "4")
+    self.assertRegex(output, r"Read 100 changed files \(.*\) in .* with 4 job\(s\): \d+ files/s")
+    self.run_simplegit("commit", "-m", "serial", "-j", "1", cwd=other)
+
+    def stored(work):
+      return {os.path.relpath(path, work) for path in self.object_files(work)}
+    self.assertEqual(stored(self.work), stored(other))
+    self.assertEqual(self.run_simplegit("show", "-c", self.log_ids()[0], "dir3"),
+                     self.run_simplegit("show", "-c", self.log_ids(cwd=other)[0], "dir3", cwd=other))
+
+  def test_a_parallel_commit_only_reads_changed_files(self):
+    self.fill(self.work)
+    self.run_simplegit("commit", "-m", "first", "-j", "4")
+    self.write(os.path.join("dir2", "file7.txt"), "changed\n")
+    output = self.run_simplegit("commit", "-m", "second", "-j", "4")
+    self.assertIn("Read 1 changed files", output)
+    self.assertEqual(self.status(), ["No changes since the last commit."])
+    self.assertEqual(self.run_simplegit("show", os.path.join("dir2", "file7.txt")), "changed\n")
+
+
+if __name__ == "__main__":
+  unittest.main()
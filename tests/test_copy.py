@@ -0,0 +1,67 @@
+"""Behaviour checks for the copy strategies used for backups and pulls."""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from support import RepositoryTestCase
+
+
+class CopyStrategyTest(RepositoryTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.backup = tempfile.mkdtemp(prefix="simplegit-backup-")
+    self.addCleanup(shutil.rmtree, self.backup, ignore_errors=True)
+    self.write(os.path.join("src", "a.txt"), "a\n" * 1000)
+    self.write("b.txt", "b\n")
+    self.first = self.commit("first")
+    self.run_simplegit("backup-loc", "add", self.backup)
+
+  def set_copy_strategy(self, strategy):
+    config_path = self.path(os.path.join(".simplegit", "config.json"))
+    with open(config_path) as config_file:
+      config = json.load(config_file)
+    config["copy_strategy"] = strategy
+    with open(config_path, "w") as config_file:
+      json.dump(config, config_file)
+
+  def shared_inodes(self):
+    """Returns how many backed up objects are the same file as the stored one."""
+    shared = 0
+    for path in self.object_files():
+      backup_path = os.path.join(self.backup, os.path.relpath(path, self.path(".simplegit")))
+      self.assertTrue(os.path.exists(backup_path), backup_path)
+      shared += os.path.samefile(path, backup_path)
+    return shared
+
+  def log_text(self):
+    return self.read(os.path.join(".simplegit", "simplegit.log"))
+
+  def test_backups_are_copies_by_default(self):
+    self.run_simplegit("backup-loc", "sync")
+    self.assertEqual(self.shared_inodes(), 0)
+    self.assertRegex(self.log_text(), r"Backup: copied files \d+ with (reflink|copy_file_range|sendfile|copy)")
+    self.assertNotIn("hardlink", self.log_text())
+
+  def test_backups_are_hard_linked_only_when_asked(self):
+    self.set_copy_strategy("hardlink")
+    self.run_simplegit("backup-loc", "sync")
+    self.assertEqual(self.shared_inodes(), len(self.object_files()))
+    self.assertIn("with hardlink", self.log_text())
+
+  def test_pulled_files_never_share_the_stored_object(self):
+    self.set_copy_strategy("hardlink")
+    self.remove("b.txt")
+    self.remove(os.path.join("src", "a.txt"))
+    self.pull(self.first)
+    for rel_path in ("b.txt", os.path.join("src", "a.txt")):
+      self.assertEqual(os.stat(self.path(rel_path)).st_nlink, 1)
+    self.write("b.txt", "edited\n")
+    self.assertIn("Modified: b.txt", self.status())
+    self.assertEqual(self.run_simplegit("show", "-c", self.first, "b.txt"), "b\n")
+
+
+if __name__ == "__main__":
+  unittest.main()
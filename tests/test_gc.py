@@ -0,0 +1,46 @@
+"""Behaviour checks for gc: packs with deltas and their readability."""
+import os
+import re
+import unittest
+
+from support import RepositoryTestCase
+
+
+class GcTest(RepositoryTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.versions = {}
+    for count in (2000, 2001, 2002):
+      text = "".join(f"line {n}\n" for n in range(count))
+      self.write("text.txt", text)
+      self.versions[self.commit(f"{count} lines")] = text
+
+  def packs(self):
+    return [name for name in os.listdir(self.path(os.path.join(".simplegit", "packs"))) if name.endswith(".pack")]
+
+  def test_gc_packs_versions_as_deltas_and_keeps_them_readable(self):
+    output = self.run_simplegit("gc")
+    packed, deltas = map(int, re.search(r"Packed (\d+) objects \((\d+) as deltas\)", output).groups())
+    self.assertEqual(deltas, len(self.versions) - 1)
+    self.assertEqual(self.object_files(), set())
+    self.assertEqual(len(self.packs()), 1)
+    for commit_id, text in self.versions.items():
+      self.pull(commit_id)
+      self.assertEqual(self.read("text.txt"), text)
+    self.assertIn("Everything checked is intact", self.run_simplegit("verify"))
+
+  def test_commits_after_gc_are_packed_again(self):
+    self.run_simplegit("gc", "--compression", "lzma")
+    self.write("text.txt", "short\n")
+    third = self.commit("short")
+    self.assertNotEqual(self.object_files(), set())
+    self.assertIn("using zlib", self.run_simplegit("repack"))
+    self.assertEqual(self.object_files(), set())
+    self.assertEqual(len(self.packs()), 1)
+    self.assertEqual(self.run_simplegit("show", "-c", third, "text.txt"), "short\n")
+    self.assertEqual(self.status(), ["No changes since the last commit."])
+
+
+if __name__ == "__main__":
+  unittest.main()
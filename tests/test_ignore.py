@@ -0,0 +1,51 @@
+"""Behaviour checks for .simplegitignore files."""
+import os
+import unittest
+
+from support import RepositoryTestCase
+
+
+class IgnoreTest(RepositoryTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.write(".simplegitignore", "# build output\nbuild/\n*.log\n!keep.log\n/top-only.txt\n")
+    self.write(os.path.join("sub", ".simplegitignore"), "secret.txt\n")
+    for rel_path in ("app.py", "debug.log", "keep.log", "top-only.txt", os.path.join("build", "out.bin"),
+                     os.path.join("sub", "secret.txt"), os.path.join("sub", "top-only.txt"),
+                     os.path.join("sub", "deeper", "secret.txt"), os.path.join("other", "secret.txt")):
+      self.write(rel_path, f"{rel_path}\n")
+    self.first = self.commit("first")
+
+  def listing(self, rel_path):
+    return self.run_simplegit("show", "-c", self.first, rel_path).split()
+
+  def test_ignored_files_are_not_committed(self):
+    self.assertEqual(self.listing("."), [".simplegitignore", "app.py", "keep.log", "other/", "sub/"])
+    self.assertEqual(self.listing("sub"), [".simplegitignore", "deeper/", "top-only.txt"])
+    self.assertEqual(self.listing(os.path.join("sub", "deeper")), [])
+    self.assertEqual(self.listing("other"), ["secret.txt"])
+
+  def test_status_skips_ignored_changes(self):
+    self.write("debug.log", "more output\n")
+    self.write(os.path.join("build", "new.bin"), "new\n")
+    self.write(os.path.join("sub", "secret.txt"), "changed\n")
+    self.assertEqual(self.status(), ["No changes since the last commit."])
+    self.write("keep.log", "changed\n")
+    self.assertEqual(self.status(), ["Changes since last commit:", "Modified: keep.log"])
+
+  def test_changing_an_ignore_file_changes_what_is_tracked(self):
+    self.write(os.path.join("sub", ".simplegitignore"), "")
+    self.assertEqual(self.status(), ["Changes since last commit:", "Modified: sub/.simplegitignore",
+                                     "Added: sub/deeper/secret.txt", "Added: sub/secret.txt"])
+
+  def test_pull_leaves_ignored_files_alone(self):
+    self.write("app.py", "changed\n")
+    self.pull(self.first)
+    self.assertEqual(self.read("app.py"), "app.py\n")
+    self.assertEqual(self.read("debug.log"), "debug.log\n")
+    self.assertEqual(self.read(os.path.join("build", "out.bin")), os.path.join("build", "out.bin") + "\n")
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,53 @@
+"""Behaviour checks for the stat-cache index that lets status skip reading
+unchanged files."""
+import json
+import os
+import unittest
+
+from support import RepositoryTestCase
+
+
+class IndexTest(RepositoryTestCase):
+
+  def setUp(self):
+    super().setUp()
+    for name in ("a.txt", "b.txt", os.path.join("sub", "c.txt")):
+      self.write(name, f"contents of {name}\n")
+    self.commit("first")
+
+  def hashed_files(self):
+    return self.metrics("status")["hash"]["files"]
+
+  def test_unchanged_files_are_not_read(self):
+    self.assertEqual(self.hashed_files(), 0)
+    self.assertEqual(self.status(), ["No changes since the last commit."])
+
+  def test_a_touched_file_is_read_once(self):
+    st = os.stat(self.path("a.txt"))
+    os.utime(self.path("a.txt"), ns=(st.st_atime_ns, st.st_mtime_ns - 10 ** 9))
+    self.assertEqual(self.hashed_files(), 1)
+    self.assertEqual(self.status(), ["No changes since the last commit."])
+    self.assertEqual(self.hashed_files(), 0)
+
+  def test_a_same_size_edit_in_the_index_timestamp_tick_is_detected(self):
+    # a.txt was written in the same tick as the index, so matching stat
+    # data cannot prove it is unchanged.
+    index_path = self.path(os.path.join(".simplegit", "index.json"))
+    with open(index_path) as index_file:
+      index = json.load(index_file)
+    racy_ns = os.stat(index_path).st_mtime_ns
+    index["entries"]["a.txt"][1] = racy_ns
+    with open(index_path, "w") as index_file:
+      json.dump(index, index_file)
+    self.write("a.txt", "CONTENTS of a.txt\n")
+    os.utime(self.path("a.txt"), ns=(racy_ns, racy_ns))
+    os.utime(index_path, ns=(racy_ns, racy_ns))
+    self.assertEqual(self.status(), ["Changes since last commit:", "Modified: a.txt"])
+
+  def test_a_same_size_edit_with_a_new_mtime_is_detected(self):
+    self.write(os.path.join("sub", "c.txt"), "CONTENTS of sub/c.txt\n")
+    self.assertEqual(self.status(), ["Changes since last commit:", "Modified: sub/c.txt"])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,53 @@
+"""Behaviour checks for the history of paths: log -- <path> and show."""
+import os
+import subprocess
+import unittest
+
+from support import SIMPLEGIT, RepositoryTestCase
+
+
+class PathHistoryTest(RepositoryTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.write(os.path.join("src", "a.txt"), "a\n")
+    self.write(os.path.join("src", "b.txt"), "b\n")
+    self.write("top.txt", "top\n")
+    self.added = self.commit("add")
+    self.write(os.path.join("src", "a.txt"), "a edited\n")
+    self.edited = self.commit("edit a")
+    self.write(os.path.join("src", "moved.txt"), self.read(os.path.join("src", "a.txt")))
+    self.remove(os.path.join("src", "a.txt"))
+    self.renamed = self.commit("rename a")
+    self.remove(os.path.join("src", "b.txt"))
+    self.deleted = self.commit("delete b")
+    self.write("top.txt", "top edited\n")
+    self.latest = self.commit("edit top")
+
+  def test_log_of_a_file_includes_its_rename_and_deletion(self):
+    self.assertEqual(self.log_ids("--", "src/a.txt"), [self.renamed, self.edited, self.added])
+    self.assertEqual(self.log_ids("--", "src/moved.txt"), [self.renamed])
+    self.assertEqual(self.log_ids("--", "src/b.txt"), [self.deleted, self.added])
+    self.assertEqual(self.log_ids("-n", "1", "--", "src/b.txt"), [self.deleted])
+
+  def test_log_of_a_folder_or_pattern(self):
+    self.assertEqual(self.log_ids("--", "src"), [self.deleted, self.renamed, self.edited, self.added])
+    self.assertEqual(self.log_ids("--", "top.*"), [self.latest, self.added])
+    self.assertEqual(self.log_ids("--", "missing.txt"), [])
+
+  def test_show_lists_a_folder_and_the_root(self):
+    self.assertEqual(self.run_simplegit("show", "-c", self.added, "src"), "a.txt\nb.txt\n")
+    self.assertEqual(self.run_simplegit("show", "-c", self.added, "src/"), "a.txt\nb.txt\n")
+    self.assertEqual(self.run_simplegit("show", "-c", self.added, "."), "src/\ntop.txt\n")
+    self.assertEqual(self.run_simplegit("show", "-c", self.latest, "."), "src/\ntop.txt\n")
+
+  def test_show_without_a_commit_uses_the_last_change(self):
+    result = subprocess.run([*SIMPLEGIT, "show", "src"], cwd=self.work, capture_output=True, text=True)
+    self.assertEqual(result.stdout, "moved.txt\n")
+    self.assertIn(f"Last changed in {self.deleted}", result.stderr)
+    self.assertEqual(self.run_simplegit("show", "src/moved.txt"), "a edited\n")
+    self.assertIn(f"does not exist in commit {self.deleted}", self.run_simplegit("show", "src/b.txt"))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,50 @@
+"""Behaviour checks for --profile, --profile-out and --metrics-json."""
+import os
+import pstats
+import subprocess
+import unittest
+
+from support import SIMPLEGIT, RepositoryTestCase
+
+
+class ProfileTest(RepositoryTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.write("a.txt", "a" * 1000)
+    self.write(os.path.join("sub", "b.txt"), "b\n")
+    self.first = self.commit("first")
+
+  def test_metrics_count_the_files_and_bytes_of_each_phase(self):
+    self.write("a.txt", "c" * 2000)
+    phases = self.metrics("commit", "-m", "second")
+    self.assertEqual(phases["walk"]["files"], 2)
+    self.assertEqual((phases["hash"]["files"], phases["hash"]["bytes"]), (1, 2000))
+    self.assertEqual(phases["copy"]["files"], 1)
+    for phase in ("config", "walk", "hash", "compare", "total"):
+      self.assertGreaterEqual(phases[phase]["seconds"], 0)
+      self.assertGreaterEqual(phases[phase]["calls"], 1)
+    second = self.log_ids()[0]
+    self.assertIn("diff", self.metrics("diff", self.first, second))
+    self.assertEqual(self.metrics("status")["hash"]["files"], 0)
+
+  def test_profile_prints_phases_and_writes_cprofile_stats(self):
+    stats_path = self.path(os.path.join(".simplegit", "status.prof"))
+    result = subprocess.run([*SIMPLEGIT, "--profile", "--profile-out", stats_path, "status"], cwd=self.work,
+                            capture_output=True, text=True, check=True)
+    self.assertEqual(result.stdout.splitlines()[0], "No changes since the last commit.")
+    self.assertRegex(result.stderr, r"(?m)^Phase\s+Seconds\s+Calls\s+Files\s+MB$")
+    self.assertRegex(result.stderr, r"(?m)^walk\s")
+    self.assertGreater(pstats.Stats(stats_path).total_calls, 0)
+
+  def test_log_file_gets_one_line_per_event(self):
+    self.write("a.txt", "changed")
+    second = self.commit("second")
+    lines = self.read(os.path.join(".simplegit", "simplegit.log")).splitlines()
+    self.assertTrue(all(line.startswith("[") for line in lines))
+    self.assertTrue(any(f"Committed changes: {second}" in line for line in lines))
+    self.assertTrue(any("Commit read changed files files=1 bytes=7" in line for line in lines))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,100 @@
+"""Behaviour checks for branch heads and tags, including repositories made
+before they moved out of config.json."""
+import json
+import os
+import unittest
+
+from os.path import commonprefix
+
+from support import RepositoryTestCase
+
+
+class LegacyRefsTest(RepositoryTestCase):
+  """Rewrites a repository the way older versions stored its refs: every
+  branch's commit list and every tag in config.json, and each tag also in
+  tags/<name>.json with the id exactly as it was typed."""
+
+  def make_legacy(self, branches, tags):
+    repo = self.path(".simplegit")
+    with open(os.path.join(repo, "config.json")) as config_file:
+      config = json.load(config_file)
+    config["branches"] = branches
+    config["tags"] = tags
+    with open(os.path.join(repo, "config.json"), "w") as config_file:
+      json.dump(config, config_file)
+    for name in os.listdir(os.path.join(repo, "branches")):
+      os.remove(os.path.join(repo, "branches", name))
+    for tag_name, commit_id in tags.items():
+      with open(os.path.join(repo, "tags", f"{tag_name}.json"), "w") as tag_file:
+        json.dump({"commit_id": commit_id}, tag_file)
+
+  def tag_file(self, tag_name):
+    with open(self.path(os.path.join(".simplegit", "tags", f"{tag_name}.json"))) as tag_file:
+      return json.load(tag_file)["commit_id"]
+
+  def test_upgrade_resolves_tags_stored_as_a_prefix(self):
+    self.write("a.txt", "a\n")
+    first = self.commit("first")
+    self.make_legacy({"main": [first]}, {"first": first[:8]})
+    self.assertEqual(self.run_simplegit("tag", "list"), f"--- Tags ---\nfirst: {first}\n")
+    self.assertEqual(self.tag_file("first"), first)
+    with open(self.path(os.path.join(".simplegit", "config.json"))) as config_file:
+      self.assertNotIn("tags", json.load(config_file))
+    self.assertEqual(self.log_ids(), [first])
+
+  def test_upgrade_resolves_a_prefix_later_commits_share_to_the_oldest(self):
+    self.write("a.txt", "a\n")
+    first = self.commit("first")
+    self.write("a.txt", "b\n")
+    second = self.commit("second")
+    self.make_legacy({"main": [first, second]}, {"first": first[:8]})
+    self.assertEqual(self.run_simplegit("tag", "list"), f"--- Tags ---\nfirst: {first}\n")
+
+  def test_gc_and_bundles_use_the_full_id_of_an_upgraded_tag(self):
+    self.write("a.txt", "kept\n")
+    self.run_simplegit("commit", "-m", "tagged backup", "-d", "Automatic backup")
+    tagged = self.log_ids()[0]
+    self.make_legacy({"main": [tagged]}, {"keep": tagged[:8]})
+    backups = []
+    for text in ("second\n", "third\n"):
+      self.write("a.txt", text)
+      self.run_simplegit("commit", "-m", "backup", "-d", "Automatic backup")
+      backups.append(self.log_ids()[0])
+    output = self.run_simplegit("gc", "--keep-hourly", "0", "--keep-daily", "0")
+    self.assertIn("Pruned 1 automatic backup commit(s).", output)
+    self.assertEqual(self.log_ids(), [backups[1], tagged])
+    self.pull(tagged)
+    self.assertEqual(self.read("a.txt"), "kept\n")
+
+    bundle = self.path(os.path.join(".simplegit", "all.sgb"))
+    self.run_simplegit("bundle", "create", bundle)
+    other = self.make_repository()
+    self.run_simplegit("bundle", "import", bundle, cwd=other)
+    self.assertEqual(self.run_simplegit("tag", "list", cwd=other), f"--- Tags ---\nkeep: {tagged}\n")
+
+  def test_tag_add_stores_the_full_id(self):
+    self.write("a.txt", "a\n")
+    first = self.commit("first")
+    self.assertIn("Tagged commit", self.run_simplegit("tag", "add", first[:8], "first"))
+    self.assertEqual(self.tag_file("first"), first)
+
+
+class CommitPrefixTest(RepositoryTestCase):
+
+  def test_pull_takes_a_unique_prefix_and_refuses_an_ambiguous_one(self):
+    self.write("a.txt", "first\n")
+    first = self.commit("first")
+    self.write("a.txt", "second\n")
+    second = self.commit("second")
+    # Ids made in the same second differ only by a -N suffix, so first may be a prefix of second.
+    shared = commonprefix([first, second])[:len(first) - 1]
+    self.assertIn("is ambiguous", self.run_failing("pull", "-c", shared))
+    self.pull(first)
+    self.assertEqual(self.read("a.txt"), "first\n")
+    unique = second[:len(commonprefix([first, second])) + 1]
+    self.assertIn(f"Pulling code from commit '{second}'", self.pull(unique))
+    self.assertEqual(self.read("a.txt"), "second\n")
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,51 @@
+"""Behaviour checks for rename and copy detection in status and diff."""
+import unittest
+
+from support import RepositoryTestCase
+
+NUMBERS = "".join(f"{n}\n" for n in range(1, 201))
+OTHER_NUMBERS = "".join(f"{n}\n" for n in range(300, 501))
+
+
+class RenameTest(RepositoryTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.write("a.txt", NUMBERS)
+    self.write("b.txt", OTHER_NUMBERS)
+    self.first = self.commit("first")
+
+  def test_identical_rename(self):
+    self.write("moved.txt", self.read("a.txt"))
+    self.remove("a.txt")
+    self.assertEqual(self.status(), ["Changes since last commit:", "Renamed: a.txt -> moved.txt"])
+    self.assertEqual(self.status("--no-renames"), ["Changes since last commit:", "Deleted: a.txt", "Added: moved.txt"])
+
+  def test_similar_rename_and_copy_of_a_modified_file(self):
+    self.write("moved.txt", NUMBERS + "extra\n")
+    self.remove("a.txt")
+    self.write("copy.txt", OTHER_NUMBERS)
+    self.write("b.txt", OTHER_NUMBERS + "more\n")
+    expected = ["Modified: b.txt", "Copied: b.txt -> copy.txt", "Renamed: a.txt -> moved.txt (99% alike)"]
+    self.assertEqual(self.status()[1:], expected)
+    self.assertIn("Added: moved.txt", self.status("-M", "100"))
+    second = self.commit("second")
+
+    output = self.run_simplegit("diff", self.first, second)
+    self.assertIn(f"File 'copy.txt' copied from 'b.txt' in commit '{second}'.", output)
+    self.assertIn(f"File 'a.txt' renamed to 'moved.txt' in commit '{second}' (99% alike).", output)
+    self.assertIn(f"--- {self.first}/a.txt\n+++ {second}/moved.txt\n", output)
+    self.assertIn("+extra\n", output)
+    stat = self.run_simplegit("diff", self.first, second, "--stat")
+    self.assertRegex(stat, r"a\.txt => moved\.txt \|\s+1 \+")
+    self.assertEqual(self.run_simplegit("diff", self.first, second, "--no-renames", "--name-only").split(),
+                     ["a.txt", "b.txt", "copy.txt", "moved.txt"])
+
+  def test_rename_limit_skips_similarity(self):
+    self.write("moved.txt", NUMBERS + "extra\n")
+    self.remove("a.txt")
+    self.assertEqual(self.status("--rename-limit", "0")[1:], ["Deleted: a.txt", "Added: moved.txt"])
+
+
+if __name__ == "__main__":
+  unittest.main()
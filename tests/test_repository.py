@@ -0,0 +1,50 @@
+"""Behaviour checks for the Repository session and library API."""
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+from support import SIMPLEGIT_DIR, RepositoryTestCase
+
+sys.path.insert(0, SIMPLEGIT_DIR)
+
+import simplegit
+
+
+class LibraryTest(RepositoryTestCase):
+
+  def test_commit_status_log_and_checkout_in_process(self):
+    self.write("a.txt", "one\n")
+    with simplegit.Repository(self.work) as repo:
+      first = repo.commit("first")
+      self.assertEqual(repo.status(), [])
+      self.write("a.txt", "two\n")
+      self.write("b.txt", "b\n")
+      self.assertTrue(repo.has_changes())
+      self.assertEqual(sorted(repo.status()), [("Added", "b.txt"), ("Modified", "a.txt")])
+      second = repo.commit("second", "more")
+      self.assertIsNone(repo.commit("nothing"))
+      self.assertEqual([commit["id"] for commit in repo.log()], [second["id"], first["id"]])
+      self.assertEqual(repo.log(grep="more")[0]["id"], second["id"])
+      repo.checkout(first["id"])
+      self.assertEqual(self.read("a.txt"), "one\n")
+      with self.assertRaises(simplegit.SimpleGitError):
+        repo.checkout("no-such-commit")
+    self.assertEqual(self.log_ids(), [second["id"], first["id"]])
+
+  def test_concurrent_transactions_do_not_lose_updates(self):
+    script = (f"import sys; sys.path.insert(0, {SIMPLEGIT_DIR!r}); import simplegit\n"
+              f"for _ in range(20):\n"
+              f"  with simplegit.Repository({self.work!r}).transaction() as config:\n"
+              f"    config['counter'] = config.get('counter', 0) + 1\n")
+    workers = [subprocess.Popen([sys.executable, "-c", script]) for _ in range(4)]
+    for worker in workers:
+      self.assertEqual(worker.wait(), 0)
+    with open(self.path(os.path.join(".simplegit", "config.json"))) as config_file:
+      self.assertEqual(json.load(config_file)["counter"], 80)
+    self.assertEqual([name for name in os.listdir(self.path(".simplegit")) if name.startswith(".tmp")], [])
+
+
+if __name__ == "__main__":
+  unittest.main()
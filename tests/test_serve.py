@@ -0,0 +1,42 @@
+"""Behaviour checks for 'simplegit serve', which answers commands over a
+Unix socket in the repository."""
+import os
+import socket
+import stat
+import subprocess
+import time
+import unittest
+
+from support import SIMPLEGIT, RepositoryTestCase
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "the server needs Unix domain sockets")
+class ServeTest(RepositoryTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.write("a.txt", "a\n")
+    self.commit("first")
+    self.socket_path = self.path(os.path.join(".simplegit", "serve.sock"))
+    self.server = subprocess.Popen([*SIMPLEGIT, "serve", "--poll"], cwd=self.work,
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    self.addCleanup(self.server.kill)
+    deadline = time.monotonic() + 10
+    while not os.path.exists(self.socket_path):
+      self.assertLess(time.monotonic(), deadline, "the server did not start")
+      time.sleep(0.05)
+
+  def test_only_the_owner_can_connect(self):
+    self.assertEqual(stat.S_IMODE(os.stat(self.socket_path).st_mode), 0o600)
+
+  def test_commands_are_answered_until_stopped(self):
+    self.write("a.txt", "changed\n")
+    self.assertEqual(self.status(), ["Changes since last commit:", "Modified: a.txt"])
+    self.assertIn("Server stopped.", self.run_simplegit("serve", "--stop"))
+    self.server.communicate(timeout=10)
+    self.assertFalse(os.path.exists(self.socket_path))
+    self.assertIn("No server is running", self.run_simplegit("serve", "--stop"))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,59 @@
+"""Behaviour checks for pulling selected paths with pull -- <paths>."""
+import os
+import shutil
+import tempfile
+import unittest
+
+from support import RepositoryTestCase
+
+
+class SparsePullTest(RepositoryTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.write(os.path.join("conf", "app.ini"), "old setting\n")
+    self.write(os.path.join("conf", "db.ini"), "old db\n")
+    self.write(os.path.join("src", "main.py"), "old code\n")
+    self.write(os.path.join("src", "util.py"), "old util\n")
+    self.first = self.commit("first")
+    self.write(os.path.join("conf", "app.ini"), "new setting\n")
+    self.write(os.path.join("conf", "db.ini"), "new db\n")
+    self.write(os.path.join("src", "main.py"), "new code\n")
+    self.remove(os.path.join("src", "util.py"))
+
+  def test_only_matching_paths_are_restored(self):
+    output = self.pull(self.first, "--", os.path.join("conf", "app.ini"), "src/*.py")
+    self.assertIn("Restored 3 file(s)", output)
+    self.assertEqual(self.read(os.path.join("conf", "app.ini")), "old setting\n")
+    self.assertEqual(self.read(os.path.join("src", "main.py")), "old code\n")
+    self.assertEqual(self.read(os.path.join("src", "util.py")), "old util\n")
+    self.assertEqual(self.read(os.path.join("conf", "db.ini")), "new db\n")
+    self.assertEqual(self.status(), ["Changes since last commit:", "Modified: conf/db.ini"])
+
+  def test_dry_run_lists_changes_without_writing(self):
+    output = self.run_simplegit("pull", "-c", self.first, "--dry-run", "--", "src")
+    self.assertIn("Modified: src/main.py", output)
+    self.assertIn("Added: src/util.py", output)
+    self.assertIn("2 path(s) would change.", output)
+    self.assertNotIn("conf", output)
+    self.assertEqual(self.read(os.path.join("src", "main.py")), "new code\n")
+    self.assertFalse(os.path.exists(self.path(os.path.join("src", "util.py"))))
+
+  def test_to_extracts_into_another_folder(self):
+    target = tempfile.mkdtemp(prefix="simplegit-extract-")
+    self.addCleanup(shutil.rmtree, target, ignore_errors=True)
+    output = self.run_simplegit("pull", "-c", self.first, "--to", target, "--", "conf")
+    self.assertIn(f"Restored 2 file(s) from commit '{self.first}' into {target}", output)
+    with open(os.path.join(target, "conf", "db.ini")) as extracted:
+      self.assertEqual(extracted.read(), "old db\n")
+    self.assertFalse(os.path.exists(os.path.join(target, "src")))
+    self.assertEqual(self.read(os.path.join("conf", "db.ini")), "new db\n")
+
+  def test_a_path_that_matches_nothing_is_reported(self):
+    output = self.pull(self.first, "--", "missing.txt")
+    self.assertIn(f"No file in commit '{self.first}' matches 'missing.txt'.", output)
+    self.assertEqual(self.read(os.path.join("src", "main.py")), "new code\n")
+
+
+if __name__ == "__main__":
+  unittest.main()
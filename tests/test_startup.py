@@ -0,0 +1,91 @@
+"""Startup cost checks: 'simplegit status' runs thousands of times a day, so
+importing the module and dispatching a command must stay cheap."""
+import contextlib
+import io
+import os
+import py_compile
+import subprocess
+import sys
+import time
+import unittest
+
+SIMPLEGIT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "simplegit")
+sys.path.insert(0, SIMPLEGIT_DIR)
+
+import simplegit
+
+# Loading simplegit may add at most this many times the startup time of a
+# bare interpreter. It adds about 3 times; importing the modules below
+# eagerly again brings it past 5. Measuring against the bare interpreter on
+# the same machine keeps the check meaningful on slow and fast machines.
+IMPORT_BUDGET_RATIO = 5
+
+# Modules only some commands need, so they are imported where they are used.
+LAZY_MODULES = ["concurrent.futures", "subprocess", "socket", "sqlite3", "tempfile",
+                "pathlib", "readline", "difflib", "filecmp", "lzma", "cProfile",
+                "datetime", "select", "struct", "fnmatch", "bisect", "zlib", "threading", "argparse"]
+
+
+def import_in_subprocess(code, *flags):
+  return subprocess.run([sys.executable, *flags, "-c", f"import sys; sys.path.insert(0, {SIMPLEGIT_DIR!r}); import simplegit; {code}"],
+                        capture_output=True, text=True, check=True)
+
+
+def run_seconds(argv):
+  start = time.perf_counter()
+  subprocess.run(argv, capture_output=True, check=True)
+  return time.perf_counter() - start
+
+
+class ImportTest(unittest.TestCase):
+
+  def test_import_leaves_command_modules_unloaded(self):
+    result = import_in_subprocess(f"print([name for name in {LAZY_MODULES!r} if name in sys.modules])")
+    self.assertEqual(result.stdout.strip(), "[]")
+
+  def test_import_time_budget(self):
+    # The budget is for loading the module, not compiling it, which only
+    # happens once per change (or on every run with PYTHONDONTWRITEBYTECODE).
+    py_compile.compile(os.path.join(SIMPLEGIT_DIR, "simplegit.py"), doraise=True)
+    bare = min(run_seconds([sys.executable, "-c", "pass"]) for _ in range(5))
+    loaded = min(run_seconds([sys.executable, "-c", f"import sys; sys.path.insert(0, {SIMPLEGIT_DIR!r}); import simplegit"])
+                 for _ in range(5))
+    self.assertLess(loaded - bare, bare * IMPORT_BUDGET_RATIO,
+                    f"importing simplegit took {loaded - bare:.3f} s on top of a {bare:.3f} s interpreter start")
+
+
+class DispatchTest(unittest.TestCase):
+
+  def handler(self, argv, parser=None):
+    parser = parser or simplegit.build_parser()
+    return simplegit.parse_command_line(parser, argv).handler
+
+  def test_command_name_skips_global_options(self):
+    self.assertEqual(simplegit.find_command_name(["--profile-out", "st", "--metrics-json", "log", "-n", "1"]), "log")
+    self.assertEqual(simplegit.find_command_name(["--profile"]), None)
+    self.assertEqual(simplegit.find_command_name(["--", "status"]), None)
+
+  def test_only_the_chosen_command_gets_arguments(self):
+    parser = simplegit.build_parser("st")
+    self.assertIs(self.handler(["status"], parser), simplegit.check_status)
+    with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+      parser.parse_args(["log", "--grep", "x"])
+
+  def test_aliases_and_subcommands_reach_their_handlers(self):
+    self.assertIs(self.handler(["bl", "list"]), simplegit.list_backup_locations)
+    self.assertIs(self.handler(["backup-loc", "sync"]), simplegit.sync_backup_locations)
+    self.assertIs(self.handler(["branch", "merge", "feature"]), simplegit.branch_merge)
+    self.assertIs(self.handler(["merge", "feature"]), simplegit.branch_merge)
+    self.assertIs(self.handler(["repack"]), simplegit.gc_repository)
+    self.assertIs(self.handler(["bundle", "import", "history.bundle"]), simplegit.import_bundle)
+    self.assertIs(self.handler(["lg", "--", "src"]), simplegit.view_logs)
+
+  def test_group_without_subcommand_prints_its_help(self):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+      self.handler(["tag"])(None)
+    self.assertIn("tag add", output.getvalue())
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,44 @@
+"""Behaviour checks for change detection in nested folders."""
+import os
+import unittest
+
+from support import RepositoryTestCase
+
+
+class NestedChangesTest(RepositoryTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.write(os.path.join("src", "deep", "er", "x.txt"), "x\n")
+    self.write(os.path.join("src", "y.txt"), "y\n")
+    self.write(os.path.join("docs", "old.md"), "old\n")
+    self.write(os.path.join("same", "z.txt"), "z\n")
+    self.write("top.txt", "top\n")
+    self.first = self.commit("first")
+
+  def change_tree(self):
+    self.write(os.path.join("src", "deep", "er", "x.txt"), "x changed\n")
+    self.write(os.path.join("src", "new", "n.txt"), "n\n")
+    self.remove(os.path.join("docs", "old.md"))
+
+  def test_status_reports_every_changed_path_below_the_top_level(self):
+    self.change_tree()
+    self.assertEqual(self.status(), ["Changes since last commit:", "Deleted: docs/old.md",
+                                     "Modified: src/deep/er/x.txt", "Added: src/new/n.txt"])
+
+  def test_an_emptied_folder_and_a_folder_replaced_by_a_file(self):
+    self.remove(os.path.join("same", "z.txt"))
+    os.rmdir(self.path("same"))
+    self.write("same", "now a file\n")
+    self.assertEqual(self.status(), ["Changes since last commit:", "Deleted: same/z.txt", "Added: same"])
+
+  def test_diff_names_only_what_changed_between_commits(self):
+    self.change_tree()
+    second = self.commit("second")
+    self.assertEqual(self.run_simplegit("diff", self.first, second, "--name-only").split(),
+                     ["docs/old.md", "src/deep/er/x.txt", "src/new/n.txt"])
+    self.assertEqual(self.status(), ["No changes since the last commit."])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,71 @@
+"""Behaviour checks for verify, which checks stored objects and backups."""
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+
+from support import RepositoryTestCase
+
+
+def object_name(data):
+  obj_hash = hashlib.sha256(data).hexdigest()
+  return f"objects/{obj_hash[:2]}/{obj_hash[2:]}"
+
+
+def object_path(root, data):
+  return os.path.join(root, *object_name(data).split("/"))
+
+
+class VerifyTest(RepositoryTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.write("a.txt", "a\n")
+    self.write(os.path.join("sub", "b.txt"), "b\n")
+    self.first = self.commit("first")
+    self.backup = tempfile.mkdtemp(prefix="simplegit-backup-")
+    self.addCleanup(shutil.rmtree, self.backup, ignore_errors=True)
+    self.run_simplegit("backup-loc", "add", self.backup)
+    self.run_simplegit("backup-loc", "sync")
+
+  def overwrite(self, path, data):
+    os.chmod(path, 0o600)
+    with open(path, "wb") as obj_file:
+      obj_file.write(data)
+
+  def test_an_intact_repository_and_its_backups_pass(self):
+    output = self.run_simplegit("verify", "--backups")
+    self.assertIn("Checked 2 commit(s)", output)
+    self.assertIn("Everything checked is intact.", output)
+    again = self.run_simplegit("verify", "--backups", "-j", "2")
+    self.assertRegex(again, r"Skipped [1-9]\d* backup object\(s\) verified before")
+    self.assertNotIn("Skipped", self.run_simplegit("verify", "--backups", "--full"))
+
+  def test_a_damaged_object_fails_verification(self):
+    damaged = object_name(b"a\n")
+    self.overwrite(object_path(self.path(".simplegit"), b"a\n"), b"A\n")
+    output = self.run_failing("verify")
+    self.assertIn(f"Corrupt: {damaged} (contents do not match the hash)", output)
+    self.assertIn("Verification failed: 1 corrupt and 0 missing.", output)
+
+  def test_a_missing_backup_object_is_reported(self):
+    os.remove(object_path(self.backup, b"b\n"))
+    output = self.run_failing("verify", "--backups")
+    missing = hashlib.sha256(b"b\n").hexdigest()
+    self.assertIn(f"Missing: {self.backup}: object {missing} used by {self.first}:sub/b.txt", output)
+    self.assertIn("0 corrupt and 1 missing", output)
+    self.assertIn("Everything checked is intact.", self.run_simplegit("verify"))
+
+  def test_objects_no_commit_uses_are_reported_as_orphaned(self):
+    stray = object_path(self.path(".simplegit"), b"stray\n")
+    os.makedirs(os.path.dirname(stray), exist_ok=True)
+    with open(stray, "wb") as obj_file:
+      obj_file.write(b"stray\n")
+    output = self.run_simplegit("verify")
+    self.assertIn("Orphaned: 1 object(s) not used by any commit", output)
+    self.assertIn("Everything checked is intact.", output)
+
+
+if __name__ == "__main__":
+  unittest.main()